@@ -1,92 +1,88 @@
 import gc
-import pandas as pd
+import math
+import os
 import streamlit as st
-from streamlit.components.v1 import html as components_html
-from utils import PREFECTURE_MAP, convert_prefecture_to_roman, GENRE_MAP, convert_genre_to_roman
-from scraper import scrape_tabelog_range
-
-DISPLAY_LIMIT = 1000  # 表示負荷軽減のための最大表示行数
-RELOAD_DELAY_MS = 2500  # ダウンロード後にリロードするまでの遅延（ミリ秒）
-
-
-def collect_range(prefecture_jp: str, genre_jp: str, start_page: int, end_page: int, status_placeholder, progress_bar):
-    data = []
-    # 進捗は概算（ページ数×20件想定）
-    estimated_total_items = max(1, (end_page - start_page + 1) * 20)
-    for i, store_details in enumerate(scrape_tabelog_range(prefecture_jp, genre_jp, start_page, end_page)):
-        data.append(store_details)
-        progress = min((i + 1) / estimated_total_items, 1.0)
-        progress_bar.progress(progress)
-        if genre_jp:
-            status_placeholder.info(f"'{prefecture_jp}' の '{genre_jp}' を検索中... ({i + 1} 件取得)")
-        else:
-            status_placeholder.info(f"'{prefecture_jp}' の '全ジャンル' を検索中... ({i + 1} 件取得)")
-    return data
+from utils import (PREFECTURE_MAP, PREFECTURE_BY_ROMAN, convert_prefecture_to_roman, GENRE_MAP, GENRE_BY_ROMAN,
+                   convert_genre_to_roman, setup_logging)
+from crawl_job import CrawlJob, DEFAULT_JOBS_DIR, list_jobs, jobs_signature
+from job_queue import get_job_queue, ScrapeTask, STATUS_QUEUED, STATUS_FAILED
+from result_store import ResultStore
+import metrics
 
+PAGE_SIZE = 100  # 結果の表に1ページで表示する行数
+ORIGINAL_ORDER = '取得順'
 
-def render_table_and_download(df: pd.DataFrame, label_prefix: str):
-    st.write(f"検索結果: {len(df)} 件")
-    df.index = range(1, len(df) + 1)
-    if len(df) > DISPLAY_LIMIT:
-        st.caption(f"表示は先頭 {DISPLAY_LIMIT} 行まで。全件はCSVでダウンロードできます。")
-        st.dataframe(df.head(DISPLAY_LIMIT))
-    else:
-        st.dataframe(df)
-    csv_bytes = df.to_csv(index=False).encode('utf-8')
-    clicked = st.download_button(
-        label=f"CSVファイルをダウンロード（{label_prefix}）",
-        data=csv_bytes,
-        file_name=f"tabelog_{convert_prefecture_to_roman(prefecture_jp)}_{convert_genre_to_roman(genre_jp)}_{label_prefix}.csv",
-        mime="text/csv",
-        key=f"download_{label_prefix}",
-    )
-    if clicked:
-        # ダウンロード開始後に完全なブラウザリロード（URLクエリは保持）
-        # Streamlitのランタイムリロードではなくwindow.location.reload(true)を使用
-        components_html(
-            f"""
-            <script>
-              (function(){{
-                if (window.__hardReloading) return; // 多重実行防止
-                window.__hardReloading = true;
-                setTimeout(function(){{
-                  try {{
-                    var u = new URL(window.location.href);
-                    u.searchParams.set('_rnd', Date.now().toString());
-                    var url = u.toString();
-                    // 1) assign: 履歴を残す通常の遷移
-                    window.location.assign(url);
-                    // 2) href: 念のためのフォールバック
-                    setTimeout(function(){{ window.location.href = url; }}, 250);
-                    // 3) リンククリックでの遷移
-                    setTimeout(function(){{
-                      try {{
-                        var a = document.createElement('a');
-                        a.href = url;
-                        a.rel = 'noopener';
-                        document.body.appendChild(a);
-                        a.click();
-                        a.remove();
-                      }} catch(_e) {{}}
-                    }}, 500);
-                    // 4) meta refresh フォールバック
-                    setTimeout(function(){{
-                      try {{
-                        var m = document.createElement('meta');
-                        m.httpEquiv = 'refresh';
-                        m.content = '0;url=' + url;
-                        document.head.appendChild(m);
-                      }} catch(_e) {{}}
-                    }}, 800);
-                  }} catch(e) {{
-                    try {{ window.location.reload(true); }} catch(_) {{ window.location.reload(); }}
-                  }}
-                }}, {RELOAD_DELAY_MS});
-              }})();
-            </script>
-            """,
-            height=0,
-        )
+# scraper（requests / bs4）は最初のデータ取得時に読み込まれる（crawl_job.CrawlJob._crawl）
+setup_logging()
+
+
+@st.cache_resource
+def select_options() -> tuple[list[str], list[str]]:
+    # 都道府県・ジャンルの選択肢（再実行のたびに作り直さない）
+    return [''] + list(PREFECTURE_MAP.keys()), [''] + list(GENRE_MAP.keys())
+
+
+@st.cache_data(show_spinner=False)
+def unfinished_job_labels(signature: tuple) -> dict[str, str]:
+    # 未完了のジョブ名（signature はキャッシュのキーに含めるための引数。ジョブが更新されるまで進捗を読み直さない）
+    return {job.job_id: job.label for job in list_jobs(unfinished_only=True)}
+
+
+@st.cache_data(show_spinner='表記を揃えています...')
+def postprocessed_store(store_path: str, modified_at: float) -> tuple[str, int]:
+    # 結果を整形して隣に書き出す（modified_at はキャッシュのキーに含めるための引数）
+    from postprocess import postprocess_file
+
+    root, ext = os.path.splitext(store_path)
+    output_path = f"{root}_clean{ext}"
+    _, total = postprocess_file(store_path, output_path)
+    return output_path, total
+
+
+@st.cache_data(show_spinner='CSVファイルを作成しています...')
+def exported_csv(store_path: str, modified_at: float) -> str:
+    # 結果のストアからCSVを隣に書き出し、そのパスを返す（modified_at はキャッシュのキーに含めるための引数）
+    root, _ = os.path.splitext(store_path)
+    with ResultStore(store_path) as store:
+        return store.export_csv(f"{root}.csv")
+
+
+def render_table_and_download(store_path: str, total: int, prefecture_jp: str, genre_jp: str, label_prefix: str):
+    if st.checkbox('電話番号・住所・席数の表記を揃え、同じ店舗をまとめる', key=f"clean_{label_prefix}"):
+        scraped = total
+        store_path, total = postprocessed_store(store_path, os.path.getmtime(store_path))
+        label_prefix += '_clean'
+        st.caption(f"重複をまとめました（{scraped} 件 → {total} 件）")
+    st.write(f"検索結果: {total} 件")
+    # 表示する1ページ分だけをストアから読み出す（並べ替え・絞り込みもクエリで行う）
+    with ResultStore(store_path) as store:
+        filter_col, sort_col, order_col = st.columns([2, 2, 1])
+        query = filter_col.text_input('絞り込み（いずれかの列に含む）', key=f"filter_{label_prefix}")
+        sort_by = sort_col.selectbox('並べ替え', [ORIGINAL_ORDER] + store.columns, key=f"sort_{label_prefix}")
+        descending = order_col.checkbox('降順', key=f"desc_{label_prefix}")
+        matched = store.count(query)
+        pages = max(1, math.ceil(matched / PAGE_SIZE))
+        page = st.number_input(f"ページ（全 {pages} ページ）", min_value=1, max_value=pages, value=1, step=1,
+                               key=f"page_{label_prefix}")
+        offset = (min(int(page), pages) - 1) * PAGE_SIZE
+        df = store.page(offset, PAGE_SIZE, None if sort_by == ORIGINAL_ORDER else sort_by, descending, query)
+    df.index = range(offset + 1, offset + len(df) + 1)
+    if query:
+        st.caption(f"{matched} 件が一致しました。")
+    st.dataframe(df)
+    # CSV は作成ボタンが押された実行でだけ書き出してダウンロードボタンに渡す
+    # （Streamlit はファイル全体を読み込むため、以降の再実行では読み込まない）
+    if st.button(f"CSVファイルを作成（{label_prefix}）", key=f"export_{label_prefix}"):
+        csv_path = exported_csv(store_path, os.path.getmtime(store_path))
+        with open(csv_path, 'rb') as csv_file:
+            st.download_button(
+                label=f"CSVファイルをダウンロード（{label_prefix}）",
+                data=csv_file,
+                file_name=f"tabelog_{convert_prefecture_to_roman(prefecture_jp)}_{convert_genre_to_roman(genre_jp)}_{label_prefix}.csv",
+                mime="text/csv",
+                key=f"download_{label_prefix}",
+                on_click='ignore',
+            )
 
 
 # UI 本体
@@ -95,11 +91,7 @@ st.subheader('電話番号、住所、URLなど')
 st.write('サイドバーで都道府県とジャンル、ページ範囲を選択してください。')
 
 # クエリパラメータからデフォルトを復元
-pref_options = [''] + list(PREFECTURE_MAP.keys())
-genre_options = [''] + list(GENRE_MAP.keys())
-# 逆引きマップ（英字コード -> 日本語表示名）
-INV_PREF_MAP = {v: k for k, v in PREFECTURE_MAP.items()}
-INV_GENRE_MAP = {v: k for k, v in GENRE_MAP.items()}
+pref_options, genre_options = select_options()
 
 try:
     qp = dict(st.query_params)
@@ -117,10 +109,12 @@ qp_pref_code = qp.get('prefecture', '')
 qp_genre_code = qp.get('genre', '')
 
 # 英字コード -> 日本語
-default_pref = INV_PREF_MAP.get(qp_pref_code, qp.get('prefecture', ''))
-default_genre = INV_GENRE_MAP.get(qp_genre_code, qp.get('genre', ''))
+default_pref = PREFECTURE_BY_ROMAN.get(qp_pref_code, qp.get('prefecture', ''))
+default_genre = GENRE_BY_ROMAN.get(qp_genre_code, qp.get('genre', ''))
 default_start = _to_int(qp.get('start', 1), 1)
 default_end = _to_int(qp.get('end', 1), 1)
+default_list_only = qp.get('list', '') == '1'
+default_whole = qp.get('all', '') == '1'
 
 pref_index = pref_options.index(default_pref) if default_pref in pref_options else 0
 genre_index = genre_options.index(default_genre) if default_genre in genre_options else 0
@@ -155,6 +149,18 @@ end_page = st.sidebar.number_input(
     format="%d"
 )
 
+whole = st.sidebar.checkbox(
+    '都道府県全体を取得（ページ範囲を無視）',
+    value=default_whole,
+    help='60ページ（1,200件）を超える場合はエリアごとの検索に分割して、すべての店舗を取得します。',
+)
+
+list_only = st.sidebar.checkbox(
+    'リストページのみ取得（店舗ページを開かない）',
+    value=default_list_only,
+    help='店名・ジャンル・エリア・店舗URLのみを、約1/20のアクセス数で取得します。',
+)
+
 # 現在の選択をクエリパラメータに反映（変更がある場合のみ）
 # クエリには英字コードを保存
 new_qp = {
@@ -163,7 +169,11 @@ new_qp = {
     'start': str(int(start_page)),
     'end': str(int(end_page)),
 }
-need_update = False
+if list_only:
+    new_qp['list'] = '1'
+if whole:
+    new_qp['all'] = '1'
+need_update = ('list' in qp and not list_only) or ('all' in qp and not whole)
 for k, v in new_qp.items():
     if str(qp.get(k, '')) != str(v):
         need_update = True
@@ -175,35 +185,121 @@ if need_update:
     except Exception:
         pass
 
-status_placeholder = st.empty()
-progress_bar = st.progress(0)
+# スクレイピングはバックグラウンドのジョブキューで実行し、画面はその進捗を読み取って表示する
+job_queue = get_job_queue()
+# 環境変数 TABELOG_METRICS_PORT が設定されていれば Prometheus 形式のメトリクスを公開する
+metrics.start_http_server_from_env()
+
+
+def show_results(task: ScrapeTask):
+    params = task.params
+    if task.count:
+        if params.get('whole'):
+            label_prefix = 'all'
+        else:
+            label_prefix = f"range_{int(params['start_page'])}-{int(params['end_page'])}pages"
+        if params.get('list_only'):
+            label_prefix += '_list'
+        render_table_and_download(task.store_path, task.count, params['prefecture_jp'], params['genre_jp'], label_prefix)
+    else:
+        st.warning('指定された条件では店舗情報が見つかりませんでした。')
+
+
+@st.fragment(run_every=1)
+def watch_task(task_id: str):
+    # 1秒ごとにこの部分だけを再実行して進捗を表示し、完了したら画面全体を再実行して結果を表示する
+    task = job_queue.get(task_id)
+    if task is None:
+        return
+    if not task.active:
+        st.rerun()
+    genre_label = task.params['genre_jp'] or '全ジャンル'
+    if task.status == STATUS_QUEUED:
+        st.info(f"'{task.params['prefecture_jp']}' の '{genre_label}' は実行待ちです...")
+    else:
+        st.info(f"'{task.params['prefecture_jp']}' の '{genre_label}' を検索中... ({task.count} 件取得)")
+    st.progress(min(task.count / task.estimated_total, 1.0))
+
+
+def _ms(seconds: float | None) -> str:
+    return '-' if seconds is None else f"{seconds * 1000:.0f} ms"
+
+
+@st.fragment(run_every=2)
+def stats_panel():
+    # 取得の統計（このプロセスで実行した全ジョブの合計）を2秒ごとに更新する
+    summary = metrics.summary()
+    concurrency = job_queue.concurrency_stats()
+    stores = summary['stores']
+    st.caption(f"リクエスト: {summary['requests']} 件（429/503: {summary['throttled']}、接続エラー: {summary['errors']}）")
+    st.caption(f"キャッシュ: {summary['cache_hits']} 件")
+    st.caption(
+        f"店舗: 取得 {stores['ok']} 件 / 対象外 {stores['prefiltered'] + stores['filtered']} 件"
+        f"（うちリストで除外 {stores['prefiltered']} 件） / 無効 {stores['invalid']} 件 / 失敗 {stores['failed']} 件"
+    )
+    st.caption(f"再試行: 取得 {summary['retries']['ok']} 件 / 失敗 {summary['retries']['failed']} 件")
+    st.caption(f"取得時間 p50 / p90: {_ms(summary['fetch_p50'])} / {_ms(summary['fetch_p90'])}")
+    st.caption(f"解析 p50: {_ms(summary['parse_p50'])}、抽出 p50: {_ms(summary['extract_p50'])}")
+    st.caption(f"同時リクエスト数: {concurrency['in_flight']} / 上限 {concurrency['limit']}")
+
+
+with st.sidebar.expander('取得の統計'):
+    stats_panel()
+
+# 実行中のジョブ（他のタブ・セッションで投入したものを含む）の表示
+active_tasks = job_queue.active_tasks()
+if active_tasks:
+    st.sidebar.divider()
+    task_labels = {task.task_id: task.job.label for task in active_tasks}
+    watch_task_id = st.sidebar.selectbox(
+        '実行中のジョブ:',
+        list(task_labels.keys()),
+        format_func=lambda task_id: task_labels[task_id],
+    )
+    if st.sidebar.button('進捗を表示'):
+        st.session_state['task_id'] = watch_task_id
+
+# 中断されたジョブの再開（実行中のジョブは除く）
+active_task_ids = {task.task_id for task in active_tasks}
+job_labels = {job_id: label for job_id, label in unfinished_job_labels(jobs_signature()).items()
+              if job_id not in active_task_ids}
+if job_labels:
+    st.sidebar.divider()
+    resume_job_id = st.sidebar.selectbox(
+        '未完了のジョブ:',
+        list(job_labels.keys()),
+        format_func=lambda job_id: job_labels[job_id],
+    )
+    if st.sidebar.button('ジョブを再開'):
+        job = CrawlJob.load(os.path.join(DEFAULT_JOBS_DIR, resume_job_id))
+        st.session_state['task_id'] = job_queue.resume(job).task_id
+    st.sidebar.divider()
 
 if st.sidebar.button('データ取得'):
     # 入力検証
     if not prefecture_jp:
         st.sidebar.error('都道府県を選択してください。')
-    elif start_page > end_page:
+    elif not whole and start_page > end_page:
         st.sidebar.error('終了ページは開始ページ以上の値を設定してください。')
-    elif (end_page - start_page) >= 30:  # 一度に処理できるのは30ページ未満
-        st.sidebar.error('一度に処理できるのは30ページ未満です。ページ範囲を分けて実行してください。')
     else:
-        try:
-            data = collect_range(prefecture_jp, genre_jp, int(start_page), int(end_page), status_placeholder, progress_bar)
-            status_placeholder.success('データ取得が完了しました。')
-            progress_bar.empty()
-            if data:
-                df = pd.DataFrame(data)
-                render_table_and_download(df, f"range_{int(start_page)}-{int(end_page)}pages")
-                st.caption("※次のデータを取得する場合は、ダウンロード後、一度ブラウザを手動でリロードしてください。")
-            else:
-                st.warning('指定された条件では店舗情報が見つかりませんでした。')
-        except Exception as e:
-            status_placeholder.error(f"データ取得中にエラーが発生しました: {e}")
-            progress_bar.empty()
-            # 念のためGC
-            gc.collect()
-
-st.sidebar.caption('一度に処理できるのは30ページ未満です。ページ範囲を分けて実行してください。')
+        # 同じ条件のジョブが実行中なら、新しく取得せずそのジョブの結果を共有する
+        st.session_state['task_id'] = job_queue.submit(
+            prefecture_jp, genre_jp, int(start_page), int(end_page), list_only=list_only, whole=whole,
+        ).task_id
+
+current_task = job_queue.get(st.session_state['task_id']) if 'task_id' in st.session_state else None
+if current_task is not None:
+    if current_task.active:
+        watch_task(current_task.task_id)
+    elif current_task.status == STATUS_FAILED:
+        st.error(f"データ取得中にエラーが発生しました: {current_task.error}（ジョブは再開できます）")
+        gc.collect()
+    else:
+        st.success('データ取得が完了しました。')
+        show_results(current_task)
+
+st.sidebar.caption('1〜60ページを1回で取得できます。アクセス数はサイトの応答に合わせて自動で調整されます。')
 st.sidebar.caption('1ページ当たり20件の店舗情報が取得できます。')
 st.sidebar.caption('収集する項目は、店名、ジャンル、住所、電話番号、予約・お問い合わせ先、ホームページURL、席数です。')
+st.sidebar.caption('リストページのみ取得する場合は、店名、ジャンル、エリア（最寄り駅）、店舗URLです。')
 st.sidebar.caption('食べログに情報がない項目は空欄になります。')
\ No newline at end of file
@@ -0,0 +1,348 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from http_cache import page_kind
+from utils import setup_logging
+
+# 環境変数でディレクトリを指定すると、取得したページの本文をアーカイブする
+ARCHIVE_DIR_ENV = 'TABELOG_ARCHIVE_DIR'
+# 1セグメントファイルの最大サイズ（圧縮後のバイト数）。超えたら次のファイルに切り替える
+DEFAULT_SEGMENT_BYTES = 256 * 1024 * 1024
+# 再解析で1つのワーカーにまとめて渡すページ数
+DEFAULT_REPARSE_CHUNK = 200
+SEGMENT_SUFFIX = '.seg'
+
+
+def _zstd_module():
+    """zstd の実装（Python 3.14 の compression.zstd、なければ zstandard パッケージ）。どちらもなければNone"""
+    try:
+        from compression import zstd
+        return zstd
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+_zstd = _zstd_module()
+# 圧縮形式: zstd が使えればそれを、なければ標準ライブラリの zlib を使う（レコードごとに記録するため混在してよい）
+DEFAULT_CODEC = 'zstd' if _zstd else 'zlib'
+
+
+def compress(body: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return _zstd.compress(body)
+    return zlib.compress(body, 6)
+
+
+def decompress(payload: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if _zstd is None:
+            raise RuntimeError('This archive contains zstd records; install zstandard to read them')
+        return _zstd.decompress(payload)
+    return zlib.decompress(payload)
+
+
+class ArchiveEntry(NamedTuple):
+    url: str
+    kind: str
+    segment: str
+    offset: int
+    length: int
+    codec: str
+    fetched_at: float
+
+
+class PageArchive:
+    """
+    取得したページの本文を圧縮して追記する、追記専用のアーカイブ（WARC に似た形式）
+
+    本文はレコードごとに圧縮し、セグメントファイルに「ヘッダー（JSON 1行）＋圧縮した本文」の順で追記する。
+    各レコードの位置は index.sqlite に記録し、URLごとに最新の本文を取り出せる。
+    ヘッダーに URL・長さ・圧縮形式を含むため、インデックスはセグメントから作り直せる（rebuild_index）。
+    セグメントはインスタンス（プロセス）ごとに新しく作るため、複数のワーカープロセスから同時に書き込める。
+
+    Args:
+        directory: アーカイブのディレクトリ
+        codec: 圧縮形式（'zstd' または 'zlib'。既定は zstd が使えれば zstd）
+        segment_bytes: 1セグメントファイルの最大サイズ
+    """
+
+    def __init__(self, directory: str, codec: str = DEFAULT_CODEC, segment_bytes: int = DEFAULT_SEGMENT_BYTES):
+        if codec == 'zstd' and _zstd is None:
+            raise RuntimeError('zstd compression requires the zstandard package')
+        self.directory = directory
+        self.codec = codec
+        self.segment_bytes = segment_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, kind TEXT NOT NULL, segment TEXT NOT NULL,'
+            ' offset INTEGER NOT NULL, length INTEGER NOT NULL, codec TEXT NOT NULL, fetched_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pages_url ON pages (url)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._segment: str | None = None
+        self._file = None
+        self._sequence = 0
+
+    def _open_segment(self) -> None:
+        """新しいセグメントファイルを開く（ロック取得済みで呼ぶ）"""
+        if self._file is not None:
+            self._file.close()
+        self._sequence += 1
+        self._segment = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence:04d}{SEGMENT_SUFFIX}"
+        self._file = open(os.path.join(self.directory, self._segment), 'ab')
+
+    def store(self, url: str, body: bytes) -> None:
+        """ページの本文を追記する"""
+        payload = compress(body, self.codec)
+        fetched_at = time.time()
+        kind = page_kind(url)
+        header = json.dumps({'url': url, 'kind': kind, 'codec': self.codec, 'length': len(payload),
+                             'fetched_at': fetched_at}, ensure_ascii=False).encode('utf-8') + b'\n'
+        with self._lock:
+            if self._file is None or self._file.tell() >= self.segment_bytes:
+                self._open_segment()
+            offset = self._file.tell() + len(header)
+            self._file.write(header)
+            self._file.write(payload)
+            self._file.flush()
+            self._conn.execute(
+                'INSERT INTO pages (url, kind, segment, offset, length, codec, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, kind, self._segment, offset, len(payload), self.codec, fetched_at),
+            )
+            self._conn.commit()
+
+    def latest_entries(self, kind: str | None = None) -> list[ArchiveEntry]:
+        """
+        URLごとに最後に保存した本文の位置を返す（保存順）
+
+        Args:
+            kind: 'store' / 'list' で絞り込む（None なら全て）
+        """
+        query = ('SELECT url, kind, segment, offset, length, codec, fetched_at FROM pages'
+                 ' WHERE id IN (SELECT MAX(id) FROM pages GROUP BY url)')
+        params: tuple = ()
+        if kind:
+            query += ' AND kind = ?'
+            params = (kind,)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY id', params).fetchall()
+        return [ArchiveEntry(*row) for row in rows]
+
+    def read(self, entry: ArchiveEntry) -> bytes:
+        """保存した本文を読み出す"""
+        return read_entries(self.directory, [entry])[0]
+
+    def rebuild_index(self) -> int:
+        """
+        セグメントのヘッダーからインデックスを作り直す（index.sqlite が失われた・壊れた場合）
+
+        Returns:
+            登録したレコード数
+        """
+        count = 0
+        with self._lock:
+            self._conn.execute('DELETE FROM pages')
+            for path in sorted(glob.glob(os.path.join(self.directory, f'*{SEGMENT_SUFFIX}'))):
+                segment = os.path.basename(path)
+                with open(path, 'rb') as f:
+                    while True:
+                        line = f.readline()
+                        if not line:
+                            break
+                        try:
+                            header = json.loads(line)
+                        except ValueError:
+                            logging.warning(f"Stopping at a corrupt record in {segment}")
+                            break
+                        offset = f.tell()
+                        f.seek(header['length'], os.SEEK_CUR)
+                        if f.tell() > os.path.getsize(path):
+                            logging.warning(f"Stopping at a truncated record in {segment}")
+                            break
+                        self._conn.execute(
+                            'INSERT INTO pages (url, kind, segment, offset, length, codec, fetched_at)'
+                            ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (header['url'], header['kind'], segment, offset, header['length'],
+                             header['codec'], header['fetched_at']),
+                        )
+                        count += 1
+            self._conn.commit()
+        return count
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            pages（保存したレコード数）, urls（URL数）, segments（セグメント数）, bytes（圧縮後の合計バイト数）の辞書
+        """
+        with self._lock:
+            pages, urls, total = self._conn.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT url), COALESCE(SUM(length), 0) FROM pages'
+            ).fetchone()
+        segments = len(glob.glob(os.path.join(self.directory, f'*{SEGMENT_SUFFIX}')))
+        return {'pages': pages, 'urls': urls, 'segments': segments, 'bytes': total}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._conn.close()
+
+
+def read_entries(directory: str, entries: list[ArchiveEntry]) -> list[bytes]:
+    """複数のレコードの本文を読み出す（同じセグメントのファイルは1度だけ開く）"""
+    bodies = []
+    files = {}
+    try:
+        for entry in entries:
+            f = files.get(entry.segment)
+            if f is None:
+                f = files[entry.segment] = open(os.path.join(directory, entry.segment), 'rb')
+            f.seek(entry.offset)
+            bodies.append(decompress(f.read(entry.length), entry.codec))
+    finally:
+        for f in files.values():
+            f.close()
+    return bodies
+
+
+_default_archive: PageArchive | None = None
+_default_archive_loaded = False
+_default_archive_lock = threading.Lock()
+
+
+def configure_archive(directory: str | None) -> PageArchive | None:
+    """
+    既定のアーカイブを有効化する（directory が None なら無効化する）
+
+    Returns:
+        有効化したPageArchive、または無効化した場合はNone
+    """
+    global _default_archive, _default_archive_loaded
+    with _default_archive_lock:
+        if _default_archive is not None:
+            _default_archive.close()
+        _default_archive = PageArchive(directory) if directory else None
+        _default_archive_loaded = True
+        return _default_archive
+
+
+def get_archive() -> PageArchive | None:
+    """既定のアーカイブを返す。未設定なら環境変数 TABELOG_ARCHIVE_DIR を参照する（オプトイン）"""
+    global _default_archive, _default_archive_loaded
+    with _default_archive_lock:
+        if not _default_archive_loaded:
+            directory = os.environ.get(ARCHIVE_DIR_ENV)
+            _default_archive = PageArchive(directory) if directory else None
+            _default_archive_loaded = True
+        return _default_archive
+
+
+def _reparse_chunk(directory: str, entries: list[ArchiveEntry], backend: str) -> list[dict | None]:
+    """ワーカープロセスで店舗ページをまとめて解析する（ネットワークにはアクセスしない）"""
+    import scraper
+
+    if scraper._parser_backend != backend:
+        scraper.set_parser_backend(backend)
+    records = []
+    for entry, body in zip(entries, read_entries(directory, entries)):
+        details = scraper.extract_store_details(scraper.make_soup(body, entry.url))
+        records.append({**details, '店舗URL': entry.url} if details else None)
+    return records
+
+
+def reparse(directory: str, output_path: str, workers: int | None = None,
+            chunk_size: int = DEFAULT_REPARSE_CHUNK, backend: str | None = None) -> tuple[int, int]:
+    """
+    アーカイブした店舗ページを全コアで並列に解析し直し、extract_store_details の結果を書き出す
+
+    URLごとに最新の本文を使い、出力はアーカイブに保存した順になる。抽出項目を増やした場合や
+    サイトのマークアップ変更に対応した場合に、再取得せずに結果を作り直せる。
+
+    Args:
+        directory: アーカイブのディレクトリ
+        output_path: 出力ファイル（.csv / .jsonl / .parquet）
+        workers: ワーカープロセス数（省略時は CPU 数）
+        chunk_size: 1つのワーカーにまとめて渡すページ数
+        backend: パーサーバックエンド（省略時は現在の設定）
+
+    Returns:
+        (書き出した店舗数, 有効なデータがなかったページ数)
+    """
+    import scraper
+    from sinks import open_sink
+
+    archive = PageArchive(directory)
+    try:
+        entries = archive.latest_entries(kind='store')
+    finally:
+        archive.close()
+    backend = backend or scraper._parser_backend
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    invalid = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool, open_sink(output_path) as sink:
+        futures = [pool.submit(_reparse_chunk, directory, chunk, backend) for chunk in chunks]
+        for future in futures:
+            for record in future.result():
+                if record:
+                    sink.write(record)
+                else:
+                    invalid += 1
+    logging.warning(f"Reparsed {len(entries)} store pages in {time.perf_counter() - started:.1f}s "
+                    f"({sink.count} stores, {invalid} without valid data)")
+    return sink.count, invalid
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='取得したページのアーカイブの操作')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    re_parse = sub.add_parser('reparse', help='アーカイブの店舗ページを解析し直して書き出す（ネットワークなし）')
+    re_parse.add_argument('directory', help='アーカイブのディレクトリ')
+    re_parse.add_argument('--output', required=True, help='出力ファイル（.csv / .jsonl / .parquet）')
+    re_parse.add_argument('--workers', type=int, default=None, help='ワーカープロセス数（既定は CPU 数）')
+    re_parse.add_argument('--parser', default=None, help='パーサーバックエンド（scraper.PARSER_BACKENDS）')
+
+    stats = sub.add_parser('stats', help='アーカイブの件数とサイズを表示する')
+    stats.add_argument('directory')
+
+    rebuild = sub.add_parser('rebuild-index', help='セグメントからインデックスを作り直す')
+    rebuild.add_argument('directory')
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    if args.command == 'reparse':
+        count, invalid = reparse(args.directory, args.output, workers=args.workers, backend=args.parser)
+        print(f"Wrote {count} stores to {args.output} ({invalid} pages without valid data)")
+        return
+    archive = PageArchive(args.directory)
+    try:
+        if args.command == 'rebuild-index':
+            print(f"Indexed {archive.rebuild_index()} records")
+        else:
+            print(json.dumps(archive.stats()))
+    finally:
+        archive.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+import argparse
+import glob
+import itertools
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from archive import ARCHIVE_DIR_ENV
+from crawl_job import CrawlJob, STATUS_DONE
+from metrics import REGISTRY
+from rate_limit import HostRateLimiter, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_MAX_IN_FLIGHT
+from records import ColumnarAccumulator
+from sinks import JsonlSink, open_sink, write_frame, flatten_record
+from store_index import StoreIndex, SeenStores
+from utils import PREFECTURE_MAP, GENRE_MAP, convert_prefecture_to_roman, convert_genre_to_roman, setup_logging
+
+
+def build_matrix(prefectures: list[str], genres: list[str], start_page: int, end_page: int,
+                 list_only: bool = False, whole: bool = False) -> list[dict]:
+    """
+    都道府県 × ジャンルのジョブ一覧を作る（順序は PREFECTURE_MAP / GENRE_MAP の定義順で固定）
+
+    Args:
+        prefectures: 都道府県の漢字表記のリスト
+        genres: ジャンルの漢字表記のリスト（'' は全ジャンル）
+        start_page: 開始ページ
+        end_page: 終了ページ
+        list_only: True ならリストページのみ取得する
+        whole: True ならページ範囲を無視し、エリアごとに分割して都道府県全体を取得する
+
+    Returns:
+        ジョブ条件の辞書のリスト
+    """
+    pref_order = {p: i for i, p in enumerate(PREFECTURE_MAP)}
+    genre_order = {g: i for i, g in enumerate(GENRE_MAP)}
+    prefectures = sorted(dict.fromkeys(prefectures), key=lambda p: pref_order[p])
+    genres = sorted(dict.fromkeys(genres), key=lambda g: genre_order.get(g, -1))
+    return [
+        {'prefecture_jp': p, 'genre_jp': g, 'start_page': start_page, 'end_page': end_page,
+         'list_only': list_only, 'whole': whole}
+        for p, g in itertools.product(prefectures, genres)
+    ]
+
+
+def select_shard(matrix: list[dict], shard_index: int, shard_count: int) -> list[dict]:
+    """
+    ジョブ一覧を shard_count 個に決定的に分割し、shard_index 番目（1始まり）を返す
+
+    同じ引数で実行すれば、どのマシンでも同じ分割になる。
+    """
+    if not 1 <= shard_index <= shard_count:
+        raise ValueError(f"Invalid shard {shard_index}/{shard_count}")
+    return [unit for i, unit in enumerate(matrix) if i % shard_count == shard_index - 1]
+
+
+def unit_id(unit: dict) -> str:
+    """ジョブ条件から決まるジョブID（再実行時に同じジョブを再開するため）"""
+    pref = convert_prefecture_to_roman(unit['prefecture_jp'])
+    genre = convert_genre_to_roman(unit['genre_jp']) or 'all'
+    suffix = '_list' if unit.get('list_only') else ''
+    scope = 'all' if unit.get('whole') else f"{unit['start_page']}-{unit['end_page']}"
+    return f"{pref}_{genre}_{scope}{suffix}"
+
+
+# ワーカープロセスで実行する全ジョブが共有するレートリミッター（_init_worker で作る）
+_worker_limiter: HostRateLimiter | None = None
+
+
+def _init_worker(log_level: int, requests_per_second: float) -> None:
+    global _worker_limiter
+    setup_logging(log_level)
+    # ジョブごとに満杯のバケットから始めないよう、ワーカーの全ジョブで1つのリミッターを共有する。
+    # 割り当てたレートは全体を分けたものなので、バーストは1件に抑える
+    _worker_limiter = HostRateLimiter(requests_per_second, burst=1)
+
+
+def _run_unit(unit: dict, jobs_dir: str, requests_per_second: float, max_in_flight: int,
+              index_path: str | None, seen_path: str | None = None) -> tuple[str, int, dict]:
+    """
+    ワーカープロセスで1ジョブを実行する（完了済みならスキップ、未完了なら続きから再開）
+
+    seen_path を指定すると、シャード内の全ジョブで店舗IDごとの取得担当を共有し、
+    他のジャンル・検索条件で取得済み（または取得中）の店舗は取得しない。
+
+    Returns:
+        (ジョブID, 取得件数, このジョブで記録したメトリクスのスナップショット)
+    """
+    job_dir = os.path.join(jobs_dir, unit_id(unit))
+    if os.path.exists(os.path.join(job_dir, 'job.json')):
+        job = CrawlJob.load(job_dir)
+    else:
+        job = CrawlJob.create(unit['prefecture_jp'], unit['genre_jp'], unit['start_page'], unit['end_page'],
+                              jobs_dir=jobs_dir, job_id=unit_id(unit), list_only=unit.get('list_only', False),
+                              whole=unit.get('whole', False))
+    if job.status == STATUS_DONE:
+        return job.job_id, job.record_count, {}
+    # ワーカープロセスは複数のジョブを順に実行するため、ジョブごとの値を返せるよう記録をリセットする
+    REGISTRY.reset()
+    index = StoreIndex(index_path) if index_path else None
+    seen = SeenStores(seen_path) if seen_path else None
+    started = time.perf_counter()
+    try:
+        # ワーカープロセスが並列に動くため、店舗ページの解析用のプロセスは起動しない
+        count = sum(1 for _ in job.run(seen=seen, requests_per_second=requests_per_second,
+                                       max_in_flight=max_in_flight, index=index, parse_workers=0,
+                                       limiter=_worker_limiter))
+    finally:
+        if index:
+            index.close()
+        if seen:
+            seen.close()
+    logging.warning(f"Finished {job.job_id}: {count} stores in {time.perf_counter() - started:.1f}s")
+    return job.job_id, count, REGISTRY.snapshot()
+
+
+def run_shard(matrix: list[dict], shard_index: int, shard_count: int, out_dir: str, workers: int,
+              total_rps: float, max_in_flight: int, index_path: str | None = None,
+              log_level: int = logging.WARNING, metrics_path: str | None = None, dedup: bool = True) -> str:
+    """
+    シャードに割り当てられたジョブをワーカープロセスで並列に実行し、シャードの出力ファイルを書く
+
+    リクエスト数は全シャード・全ワーカーの合計が total_rps を超えないよう、
+    ワーカーごとに total_rps / (shard_count × workers) を割り当て、ワーカー内の全ジョブで1つのレートリミッター
+    （バースト1件）を共有する。
+    metrics_path を指定すると、全ワーカーのメトリクスを集計して Prometheus のテキスト形式で書き出す。
+    dedup が True なら、複数のジャンルに表示される店舗も店舗IDごとに1度だけ取得し（out_dir/seen.sqlite で共有）、
+    出力の「一致した検索」列に一致したすべての検索条件（例: 東京都/居酒屋）を記録する。
+
+    Returns:
+        シャードの出力ファイル（JSONL）のパス
+    """
+    units = select_shard(matrix, shard_index, shard_count)
+    jobs_dir = os.path.join(out_dir, 'jobs')
+    seen_path = os.path.join(out_dir, 'seen.sqlite') if dedup else None
+    os.makedirs(jobs_dir, exist_ok=True)
+    workers = max(1, min(workers, len(units) or 1))
+    per_worker_rps = total_rps / (shard_count * workers)
+    logging.warning(
+        f"Shard {shard_index}/{shard_count}: {len(units)} of {len(matrix)} jobs, "
+        f"{workers} workers at {per_worker_rps:.3f} req/s each"
+    )
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level, per_worker_rps)) as pool:
+        futures = [
+            pool.submit(_run_unit, unit, jobs_dir, per_worker_rps, max_in_flight, index_path, seen_path)
+            for unit in units
+        ]
+        # 後から実行したジョブも一致した検索条件を追記するため、全ジョブの完了を待ってから書き出す
+        job_ids = []
+        for future in futures:
+            job_id, _count, snapshot = future.result()
+            REGISTRY.merge(snapshot)
+            job_ids.append(job_id)
+    # 出力はジョブ一覧の順序で書き出す（完了順に依存しない）
+    output_path = os.path.join(out_dir, f"shard-{shard_index}-of-{shard_count}.jsonl")
+    tmp_path = output_path + '.tmp'
+    seen = SeenStores(seen_path) if seen_path else None
+    with JsonlSink(tmp_path) as sink:
+        for unit, job_id in zip(units, job_ids):
+            job = CrawlJob.load(os.path.join(jobs_dir, job_id))
+            for url, record in job.iter_store_records():
+                head = {'検索都道府県': unit['prefecture_jp'], '検索ジャンル': unit['genre_jp']}
+                if seen:
+                    head['一致した検索'] = seen.searches(url) or [job.search_label]
+                sink.write({**head, **record})
+    if seen:
+        seen.close()
+    os.replace(tmp_path, output_path)
+    if metrics_path:
+        REGISTRY.dump(metrics_path)
+    return output_path
+
+
+def merge_shards(out_dir: str, output_path: str, postprocess: bool = False) -> int:
+    """
+    シャードの出力ファイルを1つにまとめる（拡張子に応じて CSV / JSONL / Parquet、1行ずつ書き出す）
+
+    postprocess が True なら、全行を列単位のバッファに読み込み、表記を揃えて同じ店舗の行をまとめてから書き出す
+    （postprocess.postprocess_frame）。
+
+    Returns:
+        書き出した行数
+    """
+    def shard_key(path: str) -> int:
+        m = re.search(r'shard-(\d+)-of-\d+\.jsonl$', path)
+        return int(m.group(1)) if m else 0
+
+    paths = sorted(glob.glob(os.path.join(out_dir, 'shard-*-of-*.jsonl')), key=shard_key)
+    if not paths:
+        raise FileNotFoundError(f"No shard outputs found in {out_dir}")
+    if postprocess:
+        from postprocess import postprocess_frame
+
+        buffer = ColumnarAccumulator()
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                buffer.extend(flatten_record(json.loads(line)) for line in f)
+        frame = postprocess_frame(buffer.to_frame())
+        write_frame(frame, output_path)
+        return len(frame)
+    with open_sink(output_path) as sink:
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    sink.write(json.loads(line))
+    return sink.count
+
+
+def _parse_shard(value: str) -> tuple[int, int]:
+    m = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not m:
+        raise argparse.ArgumentTypeError(f"--shard must look like i/N (e.g. 1/4): {value}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def _parse_pages(value: str) -> tuple[int, int]:
+    m = re.fullmatch(r'(\d+)(?:-(\d+))?', value)
+    if not m:
+        raise argparse.ArgumentTypeError(f"--pages must look like 1-60: {value}")
+    start = int(m.group(1))
+    return start, int(m.group(2) or start)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='都道府県 × ジャンルを一括でスクレイピングするバッチ')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='ジョブ一覧のうち指定シャードを実行する')
+    run.add_argument('--prefectures', nargs='+', default=[], help='都道府県（漢字表記）')
+    run.add_argument('--all-prefectures', action='store_true', help='47都道府県すべて')
+    run.add_argument('--genres', nargs='+', default=[], help="ジャンル（漢字表記、'' で全ジャンル）")
+    run.add_argument('--all-genres', action='store_true', help='GENRE_MAP のジャンルすべて')
+    run.add_argument('--pages', type=_parse_pages, default=(1, 60), help='ページ範囲（例: 1-60）')
+    run.add_argument('--shard', type=_parse_shard, default=(1, 1), help='実行するシャード i/N（1始まり）')
+    run.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='ワーカープロセス数')
+    run.add_argument('--rps', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                     help='全シャード合計のホストあたりリクエスト数/秒')
+    run.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT)
+    run.add_argument('--whole', action='store_true',
+                     help='--pages を無視し、60ページを超える分はエリアごとに分割して都道府県全体を取得する')
+    run.add_argument('--list-only', action='store_true',
+                     help='リストページのみ取得する（店名・ジャンル・エリア・店舗URL、店舗ページは取得しない）')
+    run.add_argument('--no-dedup', action='store_true',
+                     help='ジャンル間で店舗を共有せず、組み合わせごとにすべての店舗ページを取得する')
+    run.add_argument('--index', help='インクリメンタル取得に使う店舗インデックス（SQLite）のパス')
+    run.add_argument('--archive', help='取得したページの本文を圧縮して保存するディレクトリ（archive.py reparse で再解析できる）')
+    run.add_argument('--out-dir', required=True, help='出力ディレクトリ（シャードごとの出力とジョブの進捗）')
+    run.add_argument('--metrics-out', help='メトリクス（Prometheus のテキスト形式）の書き出し先')
+    run.add_argument('--verbose', action='store_true')
+
+    merge = sub.add_parser('merge', help='シャードの出力を1つのファイルにまとめる')
+    merge.add_argument('out_dir', help='run の --out-dir')
+    merge.add_argument('--output', required=True, help='出力ファイル（.csv / .jsonl / .parquet / .sqlite）')
+    merge.add_argument('--postprocess', action='store_true',
+                       help='電話番号・住所・席数の表記を揃え、電話番号と住所が一致する店舗の行をまとめる')
+
+    args = parser.parse_args(argv)
+    log_level = logging.INFO if getattr(args, 'verbose', False) else logging.WARNING
+    setup_logging(log_level)
+
+    if args.command == 'merge':
+        rows = merge_shards(args.out_dir, args.output, postprocess=args.postprocess)
+        print(f"Merged {rows} rows into {args.output}")
+        return
+
+    prefectures = list(PREFECTURE_MAP) if args.all_prefectures else args.prefectures
+    genres = list(GENRE_MAP) if args.all_genres else (args.genres or [''])
+    unknown = [p for p in prefectures if p not in PREFECTURE_MAP] + [g for g in genres if g and g not in GENRE_MAP]
+    if unknown or not prefectures:
+        parser.error(f"Unknown or missing prefecture/genre: {', '.join(unknown) or '(none)'}")
+    matrix = build_matrix(prefectures, genres, *args.pages, list_only=args.list_only, whole=args.whole)
+    shard_index, shard_count = args.shard
+    if args.archive:
+        # ワーカープロセスは環境変数を引き継ぎ、それぞれ自分のセグメントファイルに追記する
+        os.environ[ARCHIVE_DIR_ENV] = args.archive
+    output_path = run_shard(matrix, shard_index, shard_count, args.out_dir, args.workers,
+                            args.rps, args.max_in_flight, args.index, log_level, args.metrics_out,
+                            dedup=not args.no_dedup)
+    print(f"Wrote {output_path}")
+
+
+if __name__ == '__main__':
+    main()
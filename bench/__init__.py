@@ -0,0 +1,7 @@
+"""
+オフライン計測用のベンチマーク一式
+
+- corpus.py: 計測に使うHTMLコーパス（実ページの取り込み・合成ページの生成）
+- server.py: build_search_url と同じURL構成でコーパスを返すローカルの食べログ代替サーバー
+- run.py:    scrape_tabelog_range / extract_store_details を通しで実行して計測するCLI
+"""
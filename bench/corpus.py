@@ -0,0 +1,159 @@
+import argparse
+import logging
+import os
+
+from store_index import store_id_from_url
+from utils import PREFECTURE_MAP, PREFECTURE_BY_ROMAN, setup_logging
+
+# 取り込んだ実ページの保存先（list/ にリストページ、store/ に店舗ページ）
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'corpus')
+# 1ページあたりの店舗数（食べログのリストページと同じ）
+STORES_PER_PAGE = 20
+
+
+class Corpus:
+    """
+    ベンチマークで返すHTMLの集合
+
+    CORPUS_DIR に取り込んだ実ページがあればそれを使い、なければ食べログのマークアップを
+    模した合成ページを返す。
+
+    Args:
+        directory: コーパスのディレクトリ
+    """
+
+    def __init__(self, directory: str = CORPUS_DIR):
+        self.list_pages: list[bytes] = []
+        self.store_pages: dict[str, bytes] = {}
+        list_dir = os.path.join(directory, 'list')
+        store_dir = os.path.join(directory, 'store')
+        if os.path.isdir(list_dir):
+            for name in sorted(os.listdir(list_dir), key=lambda n: int(n.split('.')[0])):
+                with open(os.path.join(list_dir, name), 'rb') as f:
+                    self.list_pages.append(f.read())
+        if os.path.isdir(store_dir):
+            for name in os.listdir(store_dir):
+                with open(os.path.join(store_dir, name), 'rb') as f:
+                    self.store_pages[name.split('.')[0]] = f.read()
+
+    @property
+    def recorded(self) -> bool:
+        return bool(self.list_pages)
+
+    def list_page(self, prefecture_roman: str, page_num: int, num_pages: int) -> bytes:
+        """リストページを返す（範囲外のページは「検索結果なし」ページ）"""
+        if self.recorded:
+            if page_num > len(self.list_pages):
+                return no_result_page()
+            return self.list_pages[page_num - 1]
+        if page_num > num_pages:
+            return no_result_page()
+        return synthetic_list_page(prefecture_roman, page_num, num_pages * STORES_PER_PAGE)
+
+    def store_page(self, prefecture_roman: str, store_id: str) -> bytes:
+        """店舗ページを返す"""
+        if store_id in self.store_pages:
+            return self.store_pages[store_id]
+        return synthetic_store_page(prefecture_roman, store_id)
+
+
+def _padding(kind: str, count: int) -> str:
+    """実ページ相当のサイズにするためのヘッダー・ナビ・レビュー部分"""
+    return ''.join(
+        f'<div class="{kind}"><ul>' + ''.join(f'<li><a href="/{kind}/{j}/">項目{j}</a></li>' for j in range(20)) + '</ul></div>'
+        for _ in range(count)
+    )
+
+
+def _html(body: str) -> bytes:
+    head = (
+        '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8"><title>食べログ</title>'
+        + '<script>window.dataLayer = window.dataLayer || []; dataLayer.push({"event": "<div>"});</script>' * 30
+        + '</head><body>'
+    )
+    return (head + body + '</body></html>').encode('utf-8')
+
+
+def synthetic_list_page(prefecture_roman: str, page_num: int, total: int | None = None) -> bytes:
+    """合成リストページ（STORES_PER_PAGE 件の店舗リンクと、total を指定した場合は検索結果の総件数を含む）"""
+    items = ''.join(
+        '<div class="list-rst js-rst-cassette-wrap">'
+        f'<a class="list-rst__rst-name-target cpy-rst-name" href="/{prefecture_roman}/A0101/A010101/{_synthetic_store_id(page_num, i)}/">店舗 {page_num}-{i}</a>'
+        '<div class="list-rst__area-genre cpy-area-genre">中央駅 300m / ラーメン、つけ麺</div>'
+        '</div>'
+        for i in range(STORES_PER_PAGE)
+    )
+    ranking = '<div class="rstlst-ranking"><a class="list-rst__rst-name-target" href="/ranking/1/">広告</a></div>'
+    first = (page_num - 1) * STORES_PER_PAGE + 1
+    count = (
+        f'<p class="c-page-count"><span class="c-page-count__num"><strong>{first}</strong>～'
+        f'<strong>{first + STORES_PER_PAGE - 1}</strong>件 / 全<strong>{total:,}</strong>件</span></p>'
+        if total is not None else ''
+    )
+    return _html(_padding('nav', 40) + ranking + count + f'<div id="js-RstListWrap">{items}</div>' + _padding('footer', 60))
+
+
+def _synthetic_store_id(page_num: int, index: int) -> str:
+    return f"{page_num:05d}{index:03d}"
+
+
+def synthetic_store_page(prefecture_roman: str, store_id: str) -> bytes:
+    """合成店舗ページ（#contents-rstdata の店舗情報テーブルを含む）"""
+    prefecture_jp = PREFECTURE_BY_ROMAN.get(prefecture_roman, '東京都')
+    table = (
+        '<div id="contents-rstdata" class="rstinfo-table"><table class="c-table c-table--form rstinfo-table__table"><tbody>'
+        f'<tr><th>店名</th><td><div class="rstinfo-table__name-wrap"><span>ベンチ店舗 {store_id}</span></div></td></tr>'
+        '<tr><th>ジャンル</th><td><span>ラーメン、つけ麺</span></td></tr>'
+        '<tr><th>予約・<br>\nお問い合わせ</th><td><p class="rstinfo-table__tel-num-wrap"><strong>050-0000-0000</strong></p></td></tr>'
+        f'<tr><th>住所</th><td><p class="rstinfo-table__address">{prefecture_jp}中央区　1-2-3</p>\n<div>大きな地図を見る</div></td></tr>'
+        f'<tr><th>電話番号</th><td>03-0000-{store_id[-4:]}</td></tr>'
+        '<tr><th>ホームページ</th><td><p><a href="https://example.com/">https://example.com/</a></p></td></tr>'
+        '<tr><th>席数</th><td><p>30席</p><p>（カウンター10席、テーブル20席）</p></td></tr>'
+        '</tbody></table></div>'
+    )
+    reviews = ''.join('<div class="rvw-item"><p>' + 'おいしいラーメンでした。' * 20 + '</p></div>' for _ in range(60))
+    return _html(_padding('nav', 40) + table + reviews + _padding('footer', 20))
+
+
+def no_result_page() -> bytes:
+    return _html(
+        '<div class="result-cassette__title result-cassette__title--no-result">'
+        '<p>ご指定の条件に該当するお店は見つかりませんでした</p></div>'
+    )
+
+
+def capture(prefecture_jp: str, genre_jp: str, pages: int, directory: str = CORPUS_DIR) -> None:
+    """
+    実際の食べログからリストページと店舗ページを取り込み、コーパスとして保存する
+
+    取得は scraper の通常のレート制御下で行う（既定 1 リクエスト/秒）。
+    """
+    import scraper
+    from utils import convert_genre_to_roman
+
+    prefecture_roman = PREFECTURE_MAP[prefecture_jp]
+    genre_roman = convert_genre_to_roman(genre_jp)
+    os.makedirs(os.path.join(directory, 'list'), exist_ok=True)
+    os.makedirs(os.path.join(directory, 'store'), exist_ok=True)
+    for page_num in range(1, pages + 1):
+        url = scraper.build_search_url(prefecture_roman, genre_roman, page_num)
+        content = scraper._download(url, scraper._rate_limiter)
+        with open(os.path.join(directory, 'list', f'{page_num}.html'), 'wb') as f:
+            f.write(content)
+        for store_url in scraper.extract_store_urls(scraper.make_soup(content, url)):
+            store_id = store_id_from_url(store_url)
+            if not store_id:
+                continue
+            logging.info(f"Capturing store page: {store_url}")
+            with open(os.path.join(directory, 'store', f'{store_id}.html'), 'wb') as f:
+                f.write(scraper._download(store_url, scraper._rate_limiter))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='食べログのページをベンチマーク用コーパスとして取り込む')
+    parser.add_argument('prefecture', help='都道府県（例: 東京都）')
+    parser.add_argument('genre', nargs='?', default='', help='ジャンル（例: ラーメン）')
+    parser.add_argument('--pages', type=int, default=1, help='取り込むリストページ数')
+    args = parser.parse_args()
+    setup_logging()
+    capture(args.prefecture, args.genre, args.pages)
@@ -0,0 +1,232 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import resource
+import time
+
+import scraper
+from bench.corpus import Corpus, synthetic_store_page
+from bench.server import BenchServer
+from http_cache import configure_cache
+from rate_limit import HostRateLimiter
+from utils import setup_logging
+
+# 計測対象のステージ: 名前 -> scraper 内の関数名
+STAGES = {
+    'fetch': '_download',
+    'parse': 'make_soup',
+    'extract': 'extract_store_details',
+}
+
+
+class StageTimer:
+    """
+    scraper の各ステージの関数を差し替え、呼び出しごとの所要時間を記録する
+
+    解析用のワーカープロセスで行った解析・抽出は、呼び出し元に届いた所要時間（_observe_parse）で記録する。
+    """
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {stage: [] for stage in STAGES}
+        self._originals: dict[str, object] = {}
+
+    def __enter__(self) -> 'StageTimer':
+        for stage, attr in STAGES.items():
+            original = getattr(scraper, attr)
+            self._originals[attr] = original
+            setattr(scraper, attr, self._wrap(stage, original))
+        self._originals['_observe_parse'] = original = scraper._observe_parse
+
+        def observe_parse(parse_seconds: float, extract_seconds: float) -> None:
+            self.samples['parse'].append(parse_seconds)
+            self.samples['extract'].append(extract_seconds)
+            original(parse_seconds, extract_seconds)
+        scraper._observe_parse = observe_parse
+        return self
+
+    def __exit__(self, *exc) -> None:
+        for attr, original in self._originals.items():
+            setattr(scraper, attr, original)
+
+    def _wrap(self, stage: str, func):
+        samples = self.samples[stage]
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - t0)
+        return timed
+
+
+def percentiles(values: list[float]) -> dict:
+    """p50 / p90 / p99 / max（ミリ秒）"""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+    return {'count': len(ordered), 'p50': pick(0.50), 'p90': pick(0.90), 'p99': pick(0.99), 'max': round(ordered[-1] * 1000, 2)}
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux では KB 単位
+
+
+def _serve(server_kwargs: dict, ready, stop) -> None:
+    """子プロセスでサーバーを起動する（計測プロセスのCPU時間・RSSに含めないため）"""
+    with BenchServer(**server_kwargs) as server:
+        ready.put(server.base_url)
+        stop.wait()
+        ready.put(server.counters)
+
+
+def run_scrape(args) -> dict:
+    """ローカルサーバーに対して scrape_tabelog_range を通しで実行し、計測結果を返す"""
+    server_kwargs = {
+        'num_pages': args.num_pages,
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'throttle_rate': args.throttle_rate,
+        'retry_after': args.retry_after,
+        'seed': args.seed,
+    }
+    ctx = multiprocessing.get_context('spawn')
+    ready, stop = ctx.Queue(), ctx.Event()
+    proc = ctx.Process(target=_serve, args=(server_kwargs, ready, stop), daemon=True)
+    proc.start()
+    base_url = ready.get(timeout=30)
+
+    scraper.BASE_URL = base_url
+    scraper._rate_limiter = HostRateLimiter(args.rps)
+    configure_cache(None)
+    scraper.set_parser_backend(args.parser)
+
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    with StageTimer() as timer:
+        stores = scraper.scrape_tabelog_range_concurrent(
+            args.prefecture, args.genre, args.start, args.end,
+            requests_per_second=args.rps, max_in_flight=args.max_in_flight,
+            list_lookahead=args.list_lookahead, parse_workers=args.parse_workers, ordered=not args.unordered,
+        )
+        count = sum(1 for _ in stores)
+    elapsed, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+
+    stop.set()
+    server_counters = ready.get(timeout=30)
+    proc.join(timeout=30)
+
+    pages = len(timer.samples['fetch'])
+    return {
+        'mode': 'scrape',
+        'config': {**server_kwargs, 'parser': args.parser, 'rps': args.rps,
+                   'max_in_flight': args.max_in_flight, 'parse_workers': args.parse_workers, 'unordered': args.unordered,
+                   'list_lookahead': args.list_lookahead, 'start': args.start, 'end': args.end},
+        'stores': count,
+        'pages_fetched': pages,
+        'elapsed_s': round(elapsed, 3),
+        'pages_per_s': round(pages / elapsed, 2) if elapsed else 0.0,
+        'stores_per_s': round(count / elapsed, 2) if elapsed else 0.0,
+        'cpu_s': round(cpu, 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'stages': {stage: percentiles(samples) for stage, samples in timer.samples.items()},
+        'server': server_counters,
+    }
+
+
+def run_extract(args) -> dict:
+    """ネットワークなしで店舗ページの解析と extract_store_details をパーサーごとに計測する"""
+    corpus = Corpus()
+    pages = list(corpus.store_pages.items()) or [
+        (f"{i:08d}", synthetic_store_page('tokyo', f"{i:08d}")) for i in range(1, 21)
+    ]
+    url = f"{scraper.BASE_URL}tokyo/A1301/A130101/00000001/"
+    results = {}
+    reference = None
+    for backend in args.parsers:
+        try:
+            scraper.set_parser_backend(backend)
+        except ValueError as e:
+            logging.warning(f"Skipping parser backend {backend}: {e}")
+            continue
+        samples, outputs = [], []
+        cpu0 = time.process_time()
+        for _ in range(args.repeat):
+            for _store_id, content in pages:
+                t0 = time.perf_counter()
+                outputs.append(scraper.extract_store_details(scraper.make_soup(content, url)))
+                samples.append(time.perf_counter() - t0)
+        if reference is None:
+            reference = outputs
+        results[backend] = {
+            'pages_per_s': round(len(samples) / sum(samples), 1),
+            'cpu_s': round(time.process_time() - cpu0, 3),
+            'latency_ms': percentiles(samples),
+            'identical_output': outputs == reference,
+        }
+    return {'mode': 'extract', 'pages': len(pages), 'repeat': args.repeat,
+            'peak_rss_mb': round(peak_rss_mb(), 1), 'backends': results}
+
+
+def _print_comparison(result: dict, baseline: dict) -> None:
+    """前回の計測結果（JSON）との差分を表示する"""
+    keys = ('pages_per_s', 'stores_per_s', 'elapsed_s', 'cpu_s', 'peak_rss_mb')
+    for key in keys:
+        if key in result and key in baseline and baseline[key]:
+            change = (result[key] - baseline[key]) / baseline[key] * 100
+            print(f"  {key:>14}: {baseline[key]} -> {result[key]} ({change:+.1f}%)")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='ローカルの代替サーバーを使ったスクレイパーのベンチマーク')
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    scrape = sub.add_parser('scrape', help='scrape_tabelog_range を通しで計測する')
+    scrape.add_argument('--prefecture', default='東京都')
+    scrape.add_argument('--genre', default='ラーメン')
+    scrape.add_argument('--start', type=int, default=1)
+    scrape.add_argument('--end', type=int, default=3)
+    scrape.add_argument('--num-pages', type=int, default=5, help='合成コーパスのリストページ数')
+    scrape.add_argument('--parse-workers', type=int, default=scraper.DEFAULT_PARSE_WORKERS,
+                        help='店舗ページの解析プロセス数（0 でプロセスを使わない）')
+    scrape.add_argument('--list-lookahead', type=int, default=scraper.DEFAULT_LIST_LOOKAHEAD,
+                        help='先読みするリストページ数')
+    scrape.add_argument('--unordered', action='store_true', help='取得・解析が終わった順に返す（ordered=False）')
+    scrape.add_argument('--parser', default=scraper.DEFAULT_PARSER_BACKEND, choices=list(scraper.PARSER_BACKENDS))
+    scrape.add_argument('--rps', type=float, default=50.0, help='ホストあたりのリクエスト数/秒')
+    scrape.add_argument('--max-in-flight', type=int, default=scraper.DEFAULT_MAX_IN_FLIGHT)
+    scrape.add_argument('--latency', type=float, default=0.15, help='平均応答遅延（秒）')
+    scrape.add_argument('--jitter', type=float, default=0.05)
+    scrape.add_argument('--error-rate', type=float, default=0.0, help='500 を返す確率')
+    scrape.add_argument('--throttle-rate', type=float, default=0.0, help='429 を返す確率')
+    scrape.add_argument('--retry-after', type=float, default=1.0)
+    scrape.add_argument('--seed', type=int, default=0)
+
+    extract = sub.add_parser('extract', help='店舗ページの解析・抽出をパーサーごとに計測する')
+    extract.add_argument('--parsers', nargs='+', default=list(scraper.PARSER_BACKENDS))
+    extract.add_argument('--repeat', type=int, default=5)
+
+    for p in (scrape, extract):
+        p.add_argument('--json', help='計測結果をJSONで保存するパス')
+        p.add_argument('--compare', help='比較対象とする前回の計測結果（JSON）')
+
+    args = parser.parse_args(argv)
+    setup_logging(logging.WARNING)
+
+    result = run_scrape(args) if args.mode == 'scrape' else run_extract(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print(f"Compared with {args.compare}:")
+            _print_comparison(result, json.load(f))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.corpus import Corpus
+from store_index import store_id_from_url
+
+# build_search_url と同じ構成: /{pref}/[{エリア}/]rstLst/{genre}/{page}/ または /{pref}/[{エリア}/]rstLst/{page}/
+# （エリアを指定した場合も同じリストページを返す）
+_LIST_PATH_RE = re.compile(r'^/([a-z]+)/(?:A\d{4}/(?:A\d{6}/)?)?rstLst/(?:([a-z]+)/)?(\d+)/$')
+
+
+class BenchServer:
+    """
+    食べログの代替となるローカルHTTPサーバー
+
+    リストページと店舗ページを食べログと同じURL構成で返す。遅延・エラー率・429 の発生率を設定できる。
+
+    Args:
+        corpus: 返すHTMLの集合
+        num_pages: 合成コーパス使用時のリストページ数（以降は「検索結果なし」）
+        latency: 1レスポンスあたりの平均遅延（秒）
+        jitter: 遅延のばらつき（秒、一様分布の幅）
+        error_rate: 500 を返す確率
+        throttle_rate: 429 を返す確率
+        retry_after: 429 に付ける Retry-After（秒）
+        seed: 乱数シード（同じ設定なら同じ順序でエラーが発生する）
+    """
+
+    def __init__(
+        self,
+        corpus: Corpus | None = None,
+        num_pages: int = 5,
+        latency: float = 0.15,
+        jitter: float = 0.05,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 0,
+    ):
+        self.corpus = corpus or Corpus()
+        self.num_pages = num_pages
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'throttled': 0}
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        """scraper.BASE_URL に設定するURL"""
+        return f"http://127.0.0.1:{self._httpd.server_port}/"
+
+    def _roll(self) -> tuple[float, str | None]:
+        """このリクエストの遅延と、発生させる障害（'error' / 'throttle' / None）を決める"""
+        with self._lock:
+            self.counters['requests'] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            r = self._random.random()
+            if r < self.throttle_rate:
+                self.counters['throttled'] += 1
+                return delay, 'throttle'
+            if r < self.throttle_rate + self.error_rate:
+                self.counters['errors'] += 1
+                return delay, 'error'
+            return delay, None
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-Alive を有効にする
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes = b'', headers: dict | None = None) -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                delay, fault = server._roll()
+                time.sleep(delay)
+                if fault == 'throttle':
+                    self._send(429, headers={'Retry-After': str(int(server.retry_after))})
+                    return
+                if fault == 'error':
+                    self._send(500)
+                    return
+                m = _LIST_PATH_RE.match(self.path)
+                if m:
+                    self._send(200, server.corpus.list_page(m.group(1), int(m.group(3)), server.num_pages))
+                    return
+                store_id = store_id_from_url(self.path)
+                if store_id:
+                    self._send(200, server.corpus.store_page(self.path.split('/')[1], store_id))
+                    return
+                self._send(404)
+
+        return Handler
+
+    def start(self) -> 'BenchServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'BenchServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# リポジトリのルートと UI のスクリプト
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, 'app.py')
+# app.py が起動時に読み込むリポジトリ内のモジュール
+APP_MODULES = ('utils', 'crawl_job', 'job_queue', 'result_store', 'metrics')
+# UI の起動・再実行では読み込まず、最初のデータ取得時に読み込むモジュール
+LAZY_MODULES = ('scraper', 'requests', 'bs4', 'lxml')
+# 未完了のジョブとして作る1ジョブあたりの店舗数（再開の選択肢を作る際に進捗を読み込む量）
+STORES_PER_JOB = 200
+
+# 新しいプロセスで streamlit と app.py の依存モジュールの読み込み時間を計る
+_IMPORT_SCRIPT = f'''
+import json, sys, time
+start = time.perf_counter()
+import streamlit
+loaded = time.perf_counter()
+import {', '.join(APP_MODULES)}
+end = time.perf_counter()
+print(json.dumps({{
+    'streamlit': (loaded - start) * 1000,
+    'app_modules': (end - loaded) * 1000,
+    'lazy_modules': [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+'''
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def measure_imports(repeat: int) -> dict:
+    """
+    streamlit と app.py の依存モジュールの読み込み時間（ミリ秒、新しいプロセスで repeat 回計った中央値）
+
+    Returns:
+        計測結果の辞書（lazy_modules は読み込み後に sys.modules にあった LAZY_MODULES）
+    """
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _IMPORT_SCRIPT], cwd=ROOT_DIR, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output))
+    return {
+        'import_streamlit_ms': round(statistics.median(run['streamlit'] for run in runs), 1),
+        'import_app_modules_ms': round(statistics.median(run['app_modules'] for run in runs), 1),
+        'lazy_modules_on_import': runs[-1]['lazy_modules'],
+    }
+
+
+def _create_jobs(jobs_dir: str, unfinished: int, done: int) -> None:
+    """未完了のジョブと完了したジョブを作る（未完了のジョブは STORES_PER_JOB 件の進捗を持つ）"""
+    from crawl_job import CrawlJob, STATUS_DONE
+
+    for index in range(unfinished + done):
+        job = CrawlJob.create('東京都', 'ラーメン', 1, 60, jobs_dir=jobs_dir, job_id=f"bench-{index:04d}")
+        for store in range(STORES_PER_JOB):
+            job.store_done(store // 20 + 1, f"https://example.com/tokyo/A1301/A130101/{index:04d}{store:04d}/",
+                           {'店名': f"店舗{store}"})
+        if index >= unfinished:
+            job.status = STATUS_DONE
+            job._save()
+        job.close()
+
+
+def measure_reruns(unfinished: int, done: int, reruns: int) -> dict:
+    """
+    AppTest で app.py を実行し、初回の実行と再実行（サイドバーの選択を変える操作）にかかる時間を計る
+
+    ジョブの保存先は一時ディレクトリにし、未完了のジョブ unfinished 件と完了したジョブ done 件を置く。
+
+    Returns:
+        計測結果の辞書（lazy_modules_after_reruns は再実行後に sys.modules にあった LAZY_MODULES）
+    """
+    from streamlit.testing.v1 import AppTest
+
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        # crawl_job は import 時に保存先を読むため、読み込む前に設定する
+        os.environ['TABELOG_JOBS_DIR'] = jobs_dir
+        _create_jobs(jobs_dir, unfinished, done)
+
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        start = time.perf_counter()
+        at.run()
+        first_run = (time.perf_counter() - start) * 1000
+        if at.exception:
+            raise RuntimeError(f"app.py raised: {at.exception[0].value}")
+
+        genres = at.sidebar.selectbox[1].options[1:4]
+        timings = []
+        for index in range(reruns):
+            start = time.perf_counter()
+            at.sidebar.selectbox[1].set_value(genres[index % len(genres)]).run()
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'first_run_ms': round(first_run, 1),
+        'rerun_ms': round(statistics.median(timings), 1),
+        'rerun_p90_ms': round(_percentile(timings, 0.9), 1),
+        'lazy_modules_after_reruns': [name for name in LAZY_MODULES if name in sys.modules],
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='UI（app.py）の起動と再実行にかかる時間のベンチマーク')
+    parser.add_argument('--import-repeat', type=int, default=5, help='読み込み時間を計るプロセスの起動回数')
+    parser.add_argument('--reruns', type=int, default=20, help='再実行の回数')
+    parser.add_argument('--unfinished-jobs', type=int, default=10, help='保存先に置く未完了のジョブ数')
+    parser.add_argument('--done-jobs', type=int, default=50, help='保存先に置く完了したジョブ数')
+    parser.add_argument('--json', help='計測結果をJSONで保存するパス')
+    parser.add_argument('--compare', help='比較対象とする前回の計測結果（JSON）')
+    args = parser.parse_args(argv)
+
+    result = {
+        **measure_imports(args.import_repeat),
+        **measure_reruns(args.unfinished_jobs, args.done_jobs, args.reruns),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare}:")
+        for key, value in result.items():
+            if isinstance(value, float) and baseline.get(key):
+                change = (value - baseline[key]) / baseline[key] * 100
+                print(f"  {key:>22}: {baseline[key]} -> {value} ({change:+.1f}%)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+
+from planner import MAX_PAGES, plan_partitions
+from rate_limit import HostRateLimiter, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_MAX_IN_FLIGHT, concurrent_burst
+from retry import DeadLetters, get_dead_letters
+from store_index import SeenStores
+
+# ジョブの保存先（環境変数 TABELOG_JOBS_DIR で変更可能）
+DEFAULT_JOBS_DIR = os.environ.get('TABELOG_JOBS_DIR', '.tabelog_jobs')
+
+# 取得に失敗した店舗ページの一覧（ジョブの保存先に全ジョブ共通で置く）
+DEAD_LETTERS_FILE = 'dead_letters.sqlite'
+
+# リストページのみのジョブで scrape_tabelog_list に渡す引数
+LIST_ONLY_KWARGS = ('requests_per_second', 'limiter', 'concurrency')
+
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+
+
+class CrawlJob:
+    """
+    チェックポイント付きのスクレイピングジョブ
+
+    ジョブごとのディレクトリに、条件と状態を job.json、進捗を追記専用の progress.jsonl に保存する。
+    progress.jsonl には処理済みの店舗（取得結果を含む）と完了したページを1行ずつ記録するため、
+    どの時点で中断しても、完了済みのページと店舗を取得し直さずに再開できる。
+    店舗情報を抽出できなかった店舗（取得の失敗など）は処理済みとせず失敗として記録し、
+    完了済みのページにある失敗した店舗は、再開時にページ範囲の取得後の再試行で取得し直す。
+    都道府県全体のジョブ（whole）は planner でエリアごとの検索に分割し、ページはエリアごとに記録する。
+    処理済みの店舗はエリアをまたいで共有するため、複数のエリアに表示される店舗も1度だけ取得する。
+
+    Args:
+        job_dir: ジョブのディレクトリ
+        params: 取得条件（prefecture_jp, genre_jp, start_page, end_page, list_only, whole, partitions）
+        status: 'running'（未完了）または 'done'
+        created_at: 作成時刻（UNIX時刻）
+    """
+
+    def __init__(self, job_dir: str, params: dict, status: str = STATUS_RUNNING, created_at: float | None = None):
+        self.job_dir = job_dir
+        self.job_id = os.path.basename(job_dir)
+        self.params = params
+        self.status = status
+        self.created_at = created_at or time.time()
+        self.completed_pages: dict[str, set[int]] = {}  # エリア（'' は分割なし）ごとの完了ページ
+        self.processed_urls: set[str] = set()
+        self.failed_stores: dict[str, tuple[str, int]] = {}  # 失敗した店舗URL -> (エリア, ページ)
+        self.record_count = 0
+        self._area = ''
+        self._seen: SeenStores | None = None
+        self._log = None
+
+    @classmethod
+    def create(cls, prefecture_jp: str, genre_jp: str, start_page: int, end_page: int,
+               jobs_dir: str = DEFAULT_JOBS_DIR, job_id: str | None = None, list_only: bool = False,
+               whole: bool = False) -> 'CrawlJob':
+        """
+        新しいジョブを作成して保存する（job_id 省略時は作成時刻から生成）
+
+        Args:
+            list_only: True ならリストページのみ取得する
+            whole: True ならページ範囲を無視し、エリアごとに分割して都道府県全体を取得する
+        """
+        job_id = job_id or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        job = cls(os.path.join(jobs_dir, job_id), {
+            'prefecture_jp': prefecture_jp,
+            'genre_jp': genre_jp,
+            'start_page': 1 if whole else int(start_page),
+            'end_page': MAX_PAGES if whole else int(end_page),
+            'list_only': bool(list_only),
+            'whole': bool(whole),
+            'partitions': None,  # whole の場合、実行時に planner で分割した [エリア, ページ数, 総件数] のリスト
+        })
+        os.makedirs(job.job_dir, exist_ok=True)
+        job._save()
+        return job
+
+    @classmethod
+    def load(cls, job_dir: str) -> 'CrawlJob':
+        """保存済みのジョブを読み込み、進捗を復元する"""
+        with open(os.path.join(job_dir, 'job.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        job = cls(job_dir, meta['params'], meta['status'], meta['created_at'])
+        progress_path = os.path.join(job_dir, 'progress.jsonl')
+        if os.path.exists(progress_path):
+            valid_size = 0
+            with open(progress_path, 'rb') as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    job._apply(event)
+                    valid_size += len(line)
+            if valid_size < os.path.getsize(progress_path):
+                # 書き込み途中で中断された最終行は未処理として扱い、以降の追記に備えて切り詰める
+                logging.warning(f"Truncating incomplete checkpoint line in {progress_path}")
+                os.truncate(progress_path, valid_size)
+        return job
+
+    def _apply(self, event: dict) -> None:
+        if event['type'] == 'store':
+            self.processed_urls.add(event['url'])
+            self.failed_stores.pop(event['url'], None)
+            if event['record']:
+                self.record_count += 1
+        elif event['type'] == 'failed':
+            if event['url'] not in self.processed_urls:
+                self.failed_stores[event['url']] = (event.get('area', ''), event['page'])
+        elif event['type'] == 'page':
+            self.completed_pages.setdefault(event.get('area', ''), set()).add(event['page'])
+
+    def iter_records(self):
+        """
+        取得済みの店舗情報を progress.jsonl から順に読み出す（全件をメモリに保持しない）
+
+        Yields:
+            dict: 店舗情報の辞書
+        """
+        for _url, record in self.iter_store_records():
+            yield record
+
+    def iter_store_records(self):
+        """
+        取得済みの店舗URLと店舗情報を progress.jsonl から順に読み出す
+
+        Yields:
+            (店舗URL, 店舗情報の辞書) のタプル
+        """
+        progress_path = os.path.join(self.job_dir, 'progress.jsonl')
+        if not os.path.exists(progress_path):
+            return
+        with open(progress_path, encoding='utf-8') as f:
+            for line in f:
+                event = json.loads(line)
+                if event['type'] == 'store' and event['record']:
+                    yield event['url'], event['record']
+
+    def _save(self) -> None:
+        """job.json を原子的に書き換える"""
+        path = os.path.join(self.job_dir, 'job.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'params': self.params, 'status': self.status, 'created_at': self.created_at},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _append(self, event: dict) -> None:
+        if self._log is None:
+            self._log = open(os.path.join(self.job_dir, 'progress.jsonl'), 'a', encoding='utf-8')
+        self._log.write(json.dumps(event, ensure_ascii=False) + '\n')
+        self._log.flush()
+        self._apply(event)
+
+    # scrape_tabelog_range の progress として呼ばれるメソッド
+    def is_done(self, store_url: str) -> bool:
+        if store_url in self.processed_urls:
+            return True
+        # 実行全体で共有する集合があれば、他のジョブが担当する店舗は取得しない
+        return self._seen is not None and not self._seen.claim(store_url, self.job_id, self.search_label)
+
+    def store_done(self, page_num: int, store_url: str, store_details: dict | None) -> None:
+        event = {'type': 'store', 'page': page_num, 'url': store_url, 'record': store_details}
+        if self._area:
+            event['area'] = self._area
+        self._append(event)
+
+    def store_failed(self, page_num: int, store_url: str) -> None:
+        event = {'type': 'failed', 'page': page_num, 'url': store_url}
+        if self._area:
+            event['area'] = self._area
+        self._append(event)
+
+    def page_done(self, page_num: int) -> None:
+        event = {'type': 'page', 'page': page_num}
+        if self._area:
+            event['area'] = self._area
+        self._append(event)
+
+    def resume_page_for(self, area: str, start_page: int) -> int:
+        """エリアの次に取得するページ（完了済みページの次）"""
+        return max(self.completed_pages.get(area, ()), default=start_page - 1) + 1
+
+    def retry_stores_for(self, area: str) -> list[tuple[int, str]]:
+        """エリアの完了済みページで失敗した店舗の (ページ, 店舗URL)（未完了のページの店舗はページの取得で取得し直す）"""
+        completed = self.completed_pages.get(area, ())
+        return [(page, url) for url, (store_area, page) in self.failed_stores.items()
+                if store_area == area and page in completed]
+
+    @property
+    def resume_page(self) -> int:
+        """次に取得するページ（完了済みページの次）"""
+        return self.resume_page_for('', self.params['start_page'])
+
+    @property
+    def estimated_total(self) -> int:
+        """進捗表示用の概算件数（都道府県全体のジョブは分割後の総件数、それ以外はページ数×20件想定）"""
+        p = self.params
+        if p.get('whole'):
+            if p.get('partitions') is None:
+                return MAX_PAGES * 20
+            return sum(total if total is not None else pages * 20 for _, pages, total in p['partitions'])
+        return (p['end_page'] - p['start_page'] + 1) * 20
+
+    @property
+    def search_label(self) -> str:
+        """店舗が一致した検索条件として記録する名前（例: 東京都/ラーメン）"""
+        return f"{self.params['prefecture_jp']}/{self.params['genre_jp'] or '全ジャンル'}"
+
+    @property
+    def label(self) -> str:
+        """UI表示用のジョブ名"""
+        p = self.params
+        genre = p['genre_jp'] or '全ジャンル'
+        mode = '・リストのみ' if p.get('list_only') else ''
+        if p.get('whole'):
+            areas = f"（{len(p['partitions'])} エリア）" if p.get('partitions') is not None else ''
+            scope = f"全件{areas}"
+        else:
+            scope = f"{p['start_page']}-{p['end_page']}ページ"
+        return (f"{p['prefecture_jp']} / {genre} / {scope}{mode}"
+                f"（{self.record_count} 件取得済み・{time.strftime('%m/%d %H:%M', time.localtime(self.created_at))}）")
+
+    def run(self, seen: SeenStores | None = None, **scrape_kwargs):
+        """
+        ジョブを実行（または再開）するジェネレーター
+
+        取得済みの店舗情報を先に yield し、続けて未完了のページから取得を再開する。
+        最後まで取得できた場合はジョブを完了状態にする。
+
+        Args:
+            seen: 複数のジョブで共有する取得担当の集合。指定すると、他のジョブが担当する店舗は取得せず
+                （このジョブの結果にも含めず）、一致した検索条件として記録だけを行う
+            scrape_kwargs: scrape_tabelog_range_concurrent に渡す追加の引数
+                （リストページのみのジョブでは requests_per_second / limiter / concurrency のみ使う）。
+                dead_letters を省略すると、再試行しても取得できなかった店舗をジョブの保存先の
+                dead_letters.sqlite（環境変数 TABELOG_DEAD_LETTERS があればそちら）に記録する
+
+        Yields:
+            dict: 収集した店舗情報の辞書
+        """
+        if self.status == STATUS_DONE:
+            yield from self.iter_records()
+            return
+        # 追記中のファイルを読まないよう、既存分は件数を固定してから読み出す
+        yield from itertools.islice(self.iter_records(), self.record_count)
+        p = self.params
+        self._seen = seen
+        own_dead_letters = None
+        if not p.get('list_only') and 'dead_letters' not in scrape_kwargs:
+            dead_letters = get_dead_letters()
+            if dead_letters is None:
+                dead_letters = own_dead_letters = DeadLetters(
+                    os.path.join(os.path.dirname(self.job_dir), DEAD_LETTERS_FILE))
+            scrape_kwargs['dead_letters'] = dead_letters
+        try:
+            if p.get('whole'):
+                yield from self._run_partitions(scrape_kwargs)
+            else:
+                yield from self._crawl('', self.resume_page, p['end_page'], scrape_kwargs)
+            self.status = STATUS_DONE
+            self._save()
+        finally:
+            self._seen = None
+            if own_dead_letters is not None:
+                own_dead_letters.close()
+            self.close()
+
+    def _crawl(self, area: str, start_page: int, end_page: int, scrape_kwargs: dict, first_page: list | None = None):
+        """
+        1つの検索条件（エリア）のページ範囲と、完了済みのページで失敗した店舗を取得する
+
+        first_page を指定すると、start_page のリストページは取得せずにその店舗一覧を使う（planner で取得済みの1ページ目）
+        """
+        retry_stores = self.retry_stores_for(area)
+        if start_page > end_page and not retry_stores:
+            return
+        # scraper（requests / bs4）は最初の取得時に読み込み、UI の起動と再実行を軽くする
+        from scraper import scrape_tabelog_range_concurrent, scrape_tabelog_list
+
+        p = self.params
+        self._area = area
+        try:
+            if p.get('list_only'):
+                list_kwargs = {k: v for k, v in scrape_kwargs.items() if k in LIST_ONLY_KWARGS}
+                yield from scrape_tabelog_list(
+                    p['prefecture_jp'], p['genre_jp'], start_page, end_page,
+                    progress=self, area=area, first_page=first_page, **list_kwargs,
+                )
+            else:
+                yield from scrape_tabelog_range_concurrent(
+                    p['prefecture_jp'], p['genre_jp'], start_page, end_page,
+                    progress=self, area=area, retry_stores=retry_stores, first_page=first_page, **scrape_kwargs,
+                )
+        finally:
+            self._area = ''
+
+    def _run_partitions(self, scrape_kwargs: dict):
+        """
+        都道府県全体をエリアごとに分割し（初回のみ）、未完了のエリアを順に取得する
+
+        分割した実行では、分割の確認で取得した各エリアの1ページ目を取得し直さずに使う。
+        """
+        p = self.params
+        if scrape_kwargs.get('limiter') is None:
+            # 分割の確認と全エリアの取得で1つのレートリミッターを共有する
+            requests_per_second = scrape_kwargs.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND)
+            scrape_kwargs = dict(scrape_kwargs, limiter=HostRateLimiter(requests_per_second, burst=concurrent_burst(
+                requests_per_second, scrape_kwargs.get('max_in_flight', DEFAULT_MAX_IN_FLIGHT))))
+        first_pages = {}
+        if p.get('partitions') is None:
+            partitions = plan_partitions(p['prefecture_jp'], p['genre_jp'],
+                                         scrape_kwargs['limiter'], scrape_kwargs.get('concurrency'), first_pages)
+            p['partitions'] = [list(partition) for partition in partitions]
+            self._save()
+        for area, pages, _total in p['partitions']:
+            start_page = self.resume_page_for(area, 1)
+            first_page = first_pages.pop(area, None) if start_page == 1 else None
+            yield from self._crawl(area, start_page, pages, scrape_kwargs, first_page)
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def list_jobs(jobs_dir: str = DEFAULT_JOBS_DIR, unfinished_only: bool = False) -> list[CrawlJob]:
+    """
+    保存済みのジョブを新しい順に返す
+
+    Args:
+        jobs_dir: ジョブの保存先
+        unfinished_only: True なら未完了のジョブのみ返す
+    """
+    if not os.path.isdir(jobs_dir):
+        return []
+    jobs = []
+    for name in os.listdir(jobs_dir):
+        job_dir = os.path.join(jobs_dir, name)
+        meta_path = os.path.join(job_dir, 'job.json')
+        if not os.path.exists(meta_path):
+            continue
+        try:
+            if unfinished_only:
+                # 完了したジョブは進捗（progress.jsonl）を読み込まずに除く
+                with open(meta_path, encoding='utf-8') as f:
+                    if json.load(f)['status'] == STATUS_DONE:
+                        continue
+            job = CrawlJob.load(job_dir)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Skipping unreadable job {job_dir}: {e}")
+            continue
+        if unfinished_only and job.status == STATUS_DONE:
+            continue
+        jobs.append(job)
+    return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+
+def processed_store_urls(jobs_dir: str = DEFAULT_JOBS_DIR) -> set[str]:
+    """
+    保存済みのジョブ（リストページのみのジョブを除く）で処理済みの店舗URL
+
+    失敗一覧を取得し直す際に、後の実行で取得済みの店舗を除くために使う。
+    """
+    urls = set()
+    for job in list_jobs(jobs_dir):
+        if not job.params.get('list_only'):
+            urls |= job.processed_urls
+    return urls
+
+
+def jobs_signature(jobs_dir: str = DEFAULT_JOBS_DIR) -> tuple:
+    """
+    保存済みのジョブの更新状況（ジョブごとの job.json と progress.jsonl の更新時刻・サイズ）
+
+    値が変わらない間は list_jobs の結果も変わらないため、UI で list_jobs の結果をキャッシュするキーに使う。
+    """
+    if not os.path.isdir(jobs_dir):
+        return ()
+    signature = []
+    for name in sorted(os.listdir(jobs_dir)):
+        for filename in ('job.json', 'progress.jsonl'):
+            try:
+                stat = os.stat(os.path.join(jobs_dir, name, filename))
+            except OSError:
+                continue
+            signature.append((name, filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import NamedTuple
+
+# URL種別ごとの既定TTL（秒）。リストページは掲載順が頻繁に変わるため短く、店舗ページは長くする
+DEFAULT_TTLS = {
+    'list': 60 * 60,            # rstLst リストページ: 1時間
+    'store': 30 * 24 * 60 * 60, # 店舗ページ: 30日
+}
+# キャッシュ全体のサイズ上限（圧縮後の本文バイト数）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 環境変数でキャッシュファイルのパスを指定すると、既定キャッシュが有効になる
+CACHE_PATH_ENV = 'TABELOG_HTTP_CACHE'
+
+
+def page_kind(url: str) -> str:
+    """URLがリストページ（rstLst）なら 'list'、それ以外は 'store' を返す"""
+    return 'list' if '/rstLst/' in url else 'store'
+
+
+class CacheEntry(NamedTuple):
+    body: bytes
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+    fresh: bool
+
+    def conditional_headers(self) -> dict:
+        """再検証用の条件付きリクエストヘッダー"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    SQLiteに保存する永続HTTPキャッシュ（URLをキーとする）
+
+    本文は zlib 圧縮して ETag / Last-Modified / 取得時刻とともに保存する。
+    URL種別ごとのTTLを過ぎたエントリは stale として返し、呼び出し側で条件付きGETにより再検証する。
+    サイズ上限を超えた場合は最終アクセスが古い順（LRU）に削除する。
+
+    Args:
+        path: SQLiteファイルのパス
+        ttls: URL種別（'list' / 'store'）ごとのTTL秒数
+        max_bytes: 保存する本文（圧縮後）の合計サイズ上限
+    """
+
+    def __init__(self, path: str, ttls: dict | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' url TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, last_modified TEXT,'
+            ' fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._total_bytes = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        self._counters = {'lookups': 0, 'hits': 0, 'revalidated': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def lookup(self, url: str) -> CacheEntry | None:
+        """
+        URLのエントリを返す（fresh=False ならTTL切れで再検証が必要）
+
+        Returns:
+            CacheEntry、または未保存の場合はNone
+        """
+        now = time.time()
+        with self._lock:
+            self._counters['lookups'] += 1
+            row = self._conn.execute(
+                'SELECT body, etag, last_modified, fetched_at FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+            if row is None:
+                self._counters['misses'] += 1
+                return None
+            self._conn.execute('UPDATE entries SET accessed_at = ? WHERE url = ?', (now, url))
+            self._conn.commit()
+            fresh = now - row[3] < self.ttls[page_kind(url)]
+            if fresh:
+                self._counters['hits'] += 1
+        return CacheEntry(zlib.decompress(row[0]), row[1], row[2], row[3], fresh)
+
+    def mark_revalidated(self, url: str, etag: str | None = None, last_modified: str | None = None) -> None:
+        """304 Not Modified を受け取ったエントリの取得時刻を更新する"""
+        with self._lock:
+            self._counters['revalidated'] += 1
+            self._conn.execute(
+                'UPDATE entries SET fetched_at = ?, etag = COALESCE(?, etag),'
+                ' last_modified = COALESCE(?, last_modified) WHERE url = ?',
+                (time.time(), etag, last_modified, url),
+            )
+            self._conn.commit()
+
+    def store(self, url: str, body: bytes, etag: str | None = None, last_modified: str | None = None) -> None:
+        """レスポンス本文を圧縮して保存し、サイズ上限を超えていれば古いものから削除する"""
+        compressed = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._counters['stores'] += 1
+            old = self._conn.execute('SELECT size FROM entries WHERE url = ?', (url,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (url, body, etag, last_modified, fetched_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, compressed, etag, last_modified, now, now, len(compressed)),
+            )
+            self._total_bytes += len(compressed)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """サイズ上限まで最終アクセスが古いエントリを削除する（ロック取得済みで呼ぶ）"""
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                'SELECT url, size FROM entries ORDER BY accessed_at LIMIT 64'
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                self._total_bytes -= size
+                self._counters['evictions'] += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self) -> dict:
+        """
+        キャッシュの統計を返す
+
+        Returns:
+            lookups, hits（TTL内）, revalidated（304）, misses, stores, evictions,
+            hit_rate（ネットワーク転送なしで返せた割合）, total_bytes の辞書
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['total_bytes'] = self._total_bytes
+        served = stats['hits'] + stats['revalidated']
+        stats['hit_rate'] = served / stats['lookups'] if stats['lookups'] else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: HttpCache | None = None
+_default_cache_loaded = False
+_default_cache_lock = threading.Lock()
+
+
+def configure_cache(path: str | None, ttls: dict | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> HttpCache | None:
+    """
+    既定キャッシュを有効化する（path が None なら無効化する）
+
+    Returns:
+        有効化したHttpCache、または無効化した場合はNone
+    """
+    global _default_cache, _default_cache_loaded
+    with _default_cache_lock:
+        if _default_cache is not None:
+            _default_cache.close()
+        _default_cache = HttpCache(path, ttls=ttls, max_bytes=max_bytes) if path else None
+        _default_cache_loaded = True
+        return _default_cache
+
+
+def get_cache() -> HttpCache | None:
+    """既定キャッシュを返す。未設定なら環境変数 TABELOG_HTTP_CACHE を参照する（オプトイン）"""
+    global _default_cache, _default_cache_loaded
+    with _default_cache_lock:
+        if not _default_cache_loaded:
+            path = os.environ.get(CACHE_PATH_ENV)
+            _default_cache = HttpCache(path) if path else None
+            _default_cache_loaded = True
+        return _default_cache
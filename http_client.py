@@ -0,0 +1,237 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+
+from metrics import (HTTP_REQUESTS, HTTP_CONNECT_SECONDS, HTTP_TTFB_SECONDS, HTTP_BODY_SECONDS, HTTP_RESPONSE_BYTES,
+                     RATE_LIMIT_WAIT_SECONDS)
+
+# 再試行の対象とするHTTPステータス
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Retry-After ヘッダーを優先して待機するHTTPステータス
+RETRY_AFTER_STATUSES = frozenset({429, 503})
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Retry-After ヘッダーの値（秒数 または HTTP-date）を待機秒数に変換する
+
+    Args:
+        value: Retry-After ヘッダーの値
+
+    Returns:
+        待機秒数、または解釈できない場合はNone
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    """新規接続（名前解決・TCP接続）の所要時間を記録する接続"""
+
+    def connect(self):
+        with HTTP_CONNECT_SECONDS.time():
+            super().connect()
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    """新規接続（名前解決・TCP接続・TLSハンドシェイク）の所要時間を記録する接続"""
+
+    def connect(self):
+        with HTTP_CONNECT_SECONDS.time():
+            super().connect()
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class HttpClient:
+    """
+    接続プール付きの共有HTTPクライアント
+
+    requests.Session を使い回して Keep-Alive で接続を再利用し、gzip/br 圧縮を受け付ける。
+    接続エラー・タイムアウト・429/5xx はジッター付き指数バックオフで再試行し、
+    429/503 では Retry-After ヘッダーを優先する。
+    get に limiter を渡すと、再試行を含む試行ごとにアクセス間隔を確保してから送信する。
+
+    Args:
+        pool_maxsize: ホストごとに保持する接続数の上限
+        connect_timeout: 接続タイムアウト（秒）
+        read_timeout: 読み込みタイムアウト（秒）
+        max_retries: 再試行回数の上限
+        backoff_base: バックオフの基準秒数
+        backoff_max: バックオフ（および Retry-After）の上限秒数
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = 16,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 20.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 60.0,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        # 再試行はこのクラスで行うため、アダプター側の再試行は無効にする
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=0)
+        # 新規接続の所要時間を計測できる接続プールを使う
+        self._adapter.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        self.session.headers.update({
+            'Accept-Encoding': ACCEPT_ENCODING,  # brotli が導入済みなら br も含まれる
+            'Connection': 'keep-alive',
+        })
+
+        self._lock = threading.Lock()
+        self._counters = {
+            'requests': 0,
+            'responses': 0,
+            'retries': 0,
+            'errors': 0,
+            'bytes_received': 0,
+            'bytes_on_wire': 0,
+        }
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for key, delta in deltas.items():
+                self._counters[key] += delta
+
+    def _backoff(self, attempt: int, response: requests.Response | None = None) -> float:
+        """attempt 回目の再試行までの待機秒数（Retry-After 優先、なければフルジッター）"""
+        if response is not None and response.status_code in RETRY_AFTER_STATUSES:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, headers: dict | None = None, observer=None, limiter=None) -> requests.Response:
+        """
+        GETリクエストを送信し、必要に応じて再試行する
+
+        Args:
+            url: 取得対象のURL
+            headers: 追加のリクエストヘッダー
+            observer: 試行ごとに observer(ステータス, 所要秒数) を呼ぶ関数（接続エラー時のステータスはNone）。
+                再試行の途中の 429/503 も通知されるため、同時リクエスト数の調整に使える
+            limiter: 試行ごとに limiter.acquire(url) でアクセス間隔を確保するレートリミッター
+                （rate_limit.HostRateLimiter。再試行もホストあたりのリクエスト数に含める）
+
+        Returns:
+            最後に受信したレスポンス（再試行し尽くした場合は 429/5xx のこともある）
+
+        Raises:
+            requests.exceptions.RequestException: 再試行し尽くしても接続できなかった場合
+        """
+        attempt = 0
+        while True:
+            if limiter is not None:
+                with RATE_LIMIT_WAIT_SECONDS.time():
+                    limiter.acquire(url)
+            self._count(requests=1)
+            started = time.monotonic()
+            try:
+                # ヘッダー受信まで（TTFB）と本文の読み込みを分けて計測するため、本文は後から読む
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+                headers_at = time.monotonic()
+                content = response.content  # 本文を読み切って接続をプールに戻す
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._count(errors=1)
+                HTTP_REQUESTS.inc(status='error')
+                if observer:
+                    observer(None, time.monotonic() - started)
+                if attempt >= self.max_retries:
+                    raise
+                wait = self._backoff(attempt)
+                logging.warning(f"Retrying {url} in {wait:.1f}s after error: {e}")
+            else:
+                finished = time.monotonic()
+                self._count(
+                    responses=1,
+                    bytes_received=len(content),
+                    bytes_on_wire=response.raw.tell() if response.raw is not None else len(content),
+                )
+                HTTP_REQUESTS.inc(status=response.status_code)
+                HTTP_TTFB_SECONDS.observe(headers_at - started)
+                HTTP_BODY_SECONDS.observe(finished - headers_at)
+                HTTP_RESPONSE_BYTES.inc(len(content))
+                if observer:
+                    observer(response.status_code, finished - started)
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                wait = self._backoff(attempt, response)
+                logging.warning(f"Retrying {url} in {wait:.1f}s after HTTP {response.status_code}")
+            self._count(retries=1)
+            attempt += 1
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        """
+        転送に関するカウンターを返す
+
+        Returns:
+            requests（送信数）, responses, retries, errors, bytes_received（展開後）,
+            bytes_on_wire（圧縮状態の受信量）, connections_opened, connections_reused の辞書
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+        stats['connections_opened'] = opened
+        stats['connections_reused'] = max(0, stats['responses'] - opened)
+        return stats
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_default_client: HttpClient | None = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """プロセス内で共有する既定の HttpClient を返す（初回呼び出し時に生成）"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
+
+
+def transport_stats() -> dict:
+    """既定の HttpClient のカウンターを返す"""
+    return get_client().stats()
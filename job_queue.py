@@ -0,0 +1,198 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from crawl_job import CrawlJob
+from planner import MAX_PAGES
+from rate_limit import (HostRateLimiter, AdaptiveConcurrency, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_MAX_IN_FLIGHT,
+                        concurrent_burst)
+from sinks import SqliteSink, write_records
+
+# 同時に実行するジョブ数（環境変数 TABELOG_WORKERS で変更可能）
+DEFAULT_WORKERS = int(os.environ.get('TABELOG_WORKERS', '2'))
+# 結果の表示用に保持する終了したジョブ数（古いものから破棄する。ジョブと結果はディスクに残る）
+DEFAULT_FINISHED_TASKS = 100
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def task_key(params: dict) -> tuple:
+    """同一条件のジョブを判定するためのキー"""
+    return (params['prefecture_jp'], params['genre_jp'], int(params['start_page']), int(params['end_page']),
+            bool(params.get('list_only')), bool(params.get('whole')))
+
+
+class ScrapeTask:
+    """
+    バックグラウンドで実行する1件のスクレイピング
+
+    CrawlJob を実行し、取得結果をジョブのディレクトリの results.sqlite に書き出す（画面は result_store.ResultStore で読み出す）。
+    状態と件数はワーカースレッドが更新し、UI はそれを読み取って進捗を表示する。
+
+    Args:
+        job: 実行するジョブ
+        parse_workers: 店舗ページの解析プロセス数（None なら scraper.DEFAULT_PARSE_WORKERS）
+    """
+
+    def __init__(self, job: CrawlJob, parse_workers: int | None = None):
+        self.job = job
+        self.parse_workers = parse_workers
+        self.task_id = job.job_id
+        self.key = task_key(job.params)
+        self.params = job.params
+        self.store_path = os.path.join(job.job_dir, 'results.sqlite')
+        self.status = STATUS_QUEUED
+        self.count = 0
+        self.error: str | None = None
+        self.submitted_at = time.time()
+        self.finished_at: float | None = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in (STATUS_QUEUED, STATUS_RUNNING)
+
+    @property
+    def estimated_total(self) -> int:
+        """進捗表示用の概算件数（CrawlJob.estimated_total）"""
+        return max(1, self.job.estimated_total)
+
+    def run(self, limiter: HostRateLimiter, concurrency: AdaptiveConcurrency) -> None:
+        self.status = STATUS_RUNNING
+        try:
+            parse_workers = self.parse_workers
+            if parse_workers is None:
+                # scraper は最初の取得時に読み込む（UI の起動時に読み込まない）
+                from scraper import DEFAULT_PARSE_WORKERS
+                parse_workers = DEFAULT_PARSE_WORKERS
+            with SqliteSink(self.store_path) as sink:
+                records = self.job.run(limiter=limiter, concurrency=concurrency, parse_workers=parse_workers)
+                for _ in write_records(records, sink):
+                    self.count = sink.count
+            self.status = STATUS_DONE
+        except Exception as e:
+            logging.exception(f"Scrape task {self.task_id} failed")
+            self.error = str(e)
+            self.status = STATUS_FAILED
+        finally:
+            self.finished_at = time.time()
+
+
+class JobQueue:
+    """
+    スクレイピングジョブのキューとバックグラウンドのワーカースレッド
+
+    Streamlit のスクリプト実行とは独立してジョブを実行するため、画面操作や再実行で中断されない。
+    実行待ち・実行中のジョブと同じ条件で投入された場合は新しいジョブを作らず、同じジョブ（と結果）を共有する。
+    全ジョブで1つのレートリミッターと同時リクエスト数のコントローラーを共有するため、
+    同時実行してもアクセス間隔と同時リクエスト数の合計は変わらない。
+
+    終了した（完了・失敗した）ジョブは状態がディスクに書き込まれた後、新しい max_finished 件だけを保持する。
+
+    Args:
+        workers: 同時に実行するジョブ数
+        requests_per_second: 全ジョブ合計のホストあたりリクエスト数/秒
+        max_finished: 保持する終了したジョブ数
+        parse_workers: 店舗ページの解析プロセス数（None なら scraper.DEFAULT_PARSE_WORKERS。UI のジョブは解析プロセスを使う）
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+                 max_finished: int = DEFAULT_FINISHED_TASKS, parse_workers: int | None = None):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scrape-worker')
+        self._limiter = HostRateLimiter(requests_per_second,
+                                        burst=concurrent_burst(requests_per_second, DEFAULT_MAX_IN_FLIGHT))
+        self._concurrency = AdaptiveConcurrency(DEFAULT_MAX_IN_FLIGHT)
+        self._tasks: dict[str, ScrapeTask] = {}
+        self._finished: deque[ScrapeTask] = deque()
+        self._max_finished = max(0, int(max_finished))
+        self._parse_workers = parse_workers
+        self._lock = threading.Lock()
+
+    def _find_active(self, key: tuple) -> ScrapeTask | None:
+        for task in self._tasks.values():
+            if task.active and task.key == key:
+                return task
+        return None
+
+    def _enqueue(self, job: CrawlJob) -> ScrapeTask:
+        task = ScrapeTask(job, self._parse_workers)
+        self._tasks[task.task_id] = task
+        self._executor.submit(self._run, task)
+        return task
+
+    def _run(self, task: ScrapeTask) -> None:
+        task.run(self._limiter, self._concurrency)
+        # 終了したジョブは新しいものだけを残し、古いものは一覧から外す（状態は CrawlJob と結果のストアに保存済み）
+        with self._lock:
+            self._finished.append(task)
+            while len(self._finished) > self._max_finished:
+                old = self._finished.popleft()
+                # 再開して同じ ID で実行中のジョブは残す
+                if self._tasks.get(old.task_id) is old:
+                    del self._tasks[old.task_id]
+
+    def submit(self, prefecture_jp: str, genre_jp: str, start_page: int, end_page: int,
+               list_only: bool = False, whole: bool = False) -> ScrapeTask:
+        """
+        ジョブを投入する。同じ条件のジョブが実行待ち・実行中ならそれを返す
+
+        Args:
+            list_only: True ならリストページのみ取得する（店舗ページを取得しない）
+            whole: True ならページ範囲を無視し、エリアごとに分割して都道府県全体を取得する
+
+        Returns:
+            投入した（または共有する）ScrapeTask
+        """
+        if whole:
+            start_page, end_page = 1, MAX_PAGES
+        key = (prefecture_jp, genre_jp, int(start_page), int(end_page), bool(list_only), bool(whole))
+        with self._lock:
+            task = self._find_active(key)
+            if task:
+                logging.info(f"Coalesced request into running task {task.task_id}")
+                return task
+            return self._enqueue(CrawlJob.create(
+                prefecture_jp, genre_jp, start_page, end_page, list_only=list_only, whole=whole,
+            ))
+
+    def resume(self, job: CrawlJob) -> ScrapeTask:
+        """中断されたジョブを再開する（実行中なら、または同じ条件のジョブが実行中ならそれを返す）"""
+        with self._lock:
+            task = self._tasks.get(job.job_id)
+            if task and task.active:
+                return task
+            task = self._find_active(task_key(job.params))
+            if task:
+                return task
+            return self._enqueue(job)
+
+    def get(self, task_id: str) -> ScrapeTask | None:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def concurrency_stats(self) -> dict:
+        """全ジョブで共有する同時リクエスト数のコントローラーの状態（AdaptiveConcurrency.stats）"""
+        return self._concurrency.stats()
+
+    def active_tasks(self) -> list[ScrapeTask]:
+        """実行待ち・実行中のジョブ（投入順）"""
+        with self._lock:
+            return sorted((t for t in self._tasks.values() if t.active), key=lambda t: t.submitted_at)
+
+
+_default_queue: JobQueue | None = None
+_default_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """プロセス内で共有する既定の JobQueue を返す（Streamlit の全セッションで共有される）"""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue()
+        return _default_queue
@@ -0,0 +1,331 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 所要時間のヒストグラムの既定のバケット（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 環境変数でポート番号を指定すると、Prometheus 形式のメトリクスをHTTPで公開する
+METRICS_PORT_ENV = 'TABELOG_METRICS_PORT'
+
+
+def _label_key(label_names: tuple[str, ...], labels: dict) -> tuple[str, ...]:
+    if set(labels) != set(label_names):
+        raise ValueError(f"Expected labels {label_names}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in label_names)
+
+
+def _format_labels(label_names: tuple[str, ...], key: tuple[str, ...], extra: str = '') -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, key)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    """
+    単調増加するカウンター（ラベルごとに値を持つ）
+
+    Args:
+        name: メトリクス名
+        help: 説明
+        label_names: ラベル名
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """ラベルを指定した値（省略したラベルは全値の合計）"""
+        with self._lock:
+            return sum(v for k, v in self._values.items()
+                       if all(k[self.label_names.index(n)] == str(labels[n]) for n in labels))
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value:g}" for key, value in items]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'|'.join(key): value for key, value in self._values.items()}
+
+    def merge(self, values: dict) -> None:
+        with self._lock:
+            for joined, value in values.items():
+                key = tuple(joined.split('|')) if self.label_names else ()
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    値の分布を固定のバケットで数えるヒストグラム（ラベルごとに分布を持つ）
+
+    Args:
+        name: メトリクス名
+        help: 説明
+        label_names: ラベル名
+        buckets: バケットの上限値（昇順）
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # ラベル -> [各バケットの件数（累積でない）..., 範囲外の件数, 合計値]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.label_names, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """with 文の中の所要時間を記録する"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _merged(self, labels: dict) -> list[float]:
+        merged = [0.0] * (len(self.buckets) + 2)
+        for key, counts in self._values.items():
+            if all(key[self.label_names.index(n)] == str(labels[n]) for n in labels):
+                merged = [a + b for a, b in zip(merged, counts)]
+        return merged
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            return int(sum(self._merged(labels)[:-1]))
+
+    def quantile(self, q: float, **labels) -> float | None:
+        """
+        バケット内を線形補間して分位点を推定する（省略したラベルは全値をまとめる）
+
+        Returns:
+            推定値（秒）、または記録がない場合はNone
+        """
+        with self._lock:
+            counts = self._merged(labels)[:-1]
+        total = sum(counts)
+        if not total:
+            return None
+        target = q * total
+        cumulative = 0.0
+        for i, count in enumerate(counts):
+            if cumulative + count >= target and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (target - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_labels(self.label_names, key, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative:g}")
+            cumulative += counts[len(self.buckets)]
+            le = _format_labels(self.label_names, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {counts[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative:g}")
+        return lines
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'|'.join(key): list(counts) for key, counts in self._values.items()}
+
+    def merge(self, values: dict) -> None:
+        with self._lock:
+            for joined, counts in values.items():
+                key = tuple(joined.split('|')) if self.label_names else ()
+                current = self._values.get(key)
+                self._values[key] = counts if current is None else [a + b for a, b in zip(current, counts)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    """
+    メトリクスの登録先。Prometheus のテキスト形式での出力と、プロセス間で集計するためのスナップショットを扱う
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Counter | Histogram] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, label_names: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, label_names))
+
+    def histogram(self, name: str, help: str, label_names: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def get(self, name: str) -> Counter | Histogram | None:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus のテキスト形式（exposition format）で出力する"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path: str) -> None:
+        """テキスト形式で書き出す（バッチ実行の結果として残す場合など）"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def snapshot(self) -> dict:
+        """別プロセスの値を merge で足し合わせるためのスナップショット"""
+        return {name: metric.snapshot() for name, metric in list(self._metrics.items())}
+
+    def merge(self, snapshot: dict) -> None:
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+    def reset(self) -> None:
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+# HTTP（1回の試行ごと）
+HTTP_REQUESTS = REGISTRY.counter('tabelog_http_requests_total', 'HTTP request attempts by status', ('status',))
+HTTP_CONNECT_SECONDS = REGISTRY.histogram('tabelog_http_connect_seconds', 'Time to open a new connection (DNS, TCP and TLS)')
+HTTP_TTFB_SECONDS = REGISTRY.histogram('tabelog_http_ttfb_seconds', 'Time from sending a request to receiving the response headers')
+HTTP_BODY_SECONDS = REGISTRY.histogram('tabelog_http_body_seconds', 'Time to read the response body')
+HTTP_RESPONSE_BYTES = REGISTRY.counter('tabelog_http_response_bytes_total', 'Response body bytes received (decoded)')
+# ページ取得（キャッシュとアクセス間隔の待機を含む）
+PAGES = REGISTRY.counter('tabelog_pages_total', 'Pages fetched by page kind and source', ('kind', 'source'))
+FETCH_SECONDS = REGISTRY.histogram('tabelog_fetch_seconds', 'Time to get a page body including cache and rate limiting', ('kind',))
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.histogram('tabelog_rate_limit_wait_seconds', 'Time spent waiting for the rate limiter and concurrency slots')
+# 解析・抽出・絞り込み
+PARSE_SECONDS = REGISTRY.histogram('tabelog_parse_seconds', 'Time to parse a page into a soup', ('kind',))
+EXTRACT_SECONDS = REGISTRY.histogram('tabelog_extract_seconds', 'Time to extract store details from a parsed page')
+FILTER_SECONDS = REGISTRY.histogram('tabelog_filter_seconds', 'Time to validate a store against the prefecture filter')
+STORES = REGISTRY.counter('tabelog_stores_total', 'Store pages processed by outcome', ('result',))
+STORE_RETRIES = REGISTRY.counter('tabelog_store_retries_total', 'Failed store pages retried at the end of a run by outcome', ('result',))
+
+
+def summary() -> dict:
+    """
+    UI表示用の主な値をまとめて返す
+
+    Returns:
+        requests, throttled（429/503）, errors, cache_hits, stores（結果別の件数の辞書）,
+        retries（最後の再試行の結果別の件数の辞書）,
+        fetch_p50 / fetch_p90, parse_p50, extract_p50（秒）の辞書
+    """
+    return {
+        'requests': int(HTTP_REQUESTS.value()),
+        'throttled': int(HTTP_REQUESTS.value(status='429') + HTTP_REQUESTS.value(status='503')),
+        'errors': int(HTTP_REQUESTS.value(status='error')),
+        'cache_hits': int(PAGES.value(source='cache') + PAGES.value(source='revalidated')),
+        'stores': {result: int(STORES.value(result=result)) for result in ('ok', 'index', 'prefiltered', 'filtered', 'invalid', 'failed')},
+        'retries': {result: int(STORE_RETRIES.value(result=result)) for result in ('ok', 'failed')},
+        'fetch_p50': FETCH_SECONDS.quantile(0.5),
+        'fetch_p90': FETCH_SECONDS.quantile(0.9),
+        'parse_p50': PARSE_SECONDS.quantile(0.5),
+        'extract_p50': EXTRACT_SECONDS.quantile(0.5),
+    }
+
+
+_server: ThreadingHTTPServer | None = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer | None:
+    """
+    /metrics で Prometheus 形式のメトリクスを返すHTTPサーバーをバックグラウンドで起動する（起動済みならそれを返す）
+
+    Returns:
+        起動したサーバー、またはポートが使用中で起動できなかった場合はNone
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = REGISTRY.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            # 別のプロセス（複数起動したアプリや子プロセス）が公開済みの場合は起動しない
+            logging.warning(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return None
+        threading.Thread(target=_server.serve_forever, daemon=True, name='metrics-server').start()
+        return _server
+
+
+def start_http_server_from_env() -> ThreadingHTTPServer | None:
+    """環境変数 TABELOG_METRICS_PORT が設定されていればメトリクスのHTTPサーバーを起動する（オプトイン）"""
+    port = os.environ.get(METRICS_PORT_ENV)
+    return start_http_server(int(port)) if port else None
@@ -0,0 +1,120 @@
+import logging
+import math
+from typing import NamedTuple
+
+from rate_limit import HostRateLimiter, AdaptiveConcurrency
+from utils import convert_prefecture_to_roman, convert_genre_to_roman
+
+# 食べログの検索結果で表示できる最大ページ数と1ページあたりの店舗数
+MAX_PAGES = 60
+STORES_PER_PAGE = 20
+# 1つの検索条件で取得できる最大件数（これを超える場合はエリアで分割する）
+MAX_RESULTS = MAX_PAGES * STORES_PER_PAGE
+
+
+class Partition(NamedTuple):
+    """
+    1つの検索条件（エリア）で取得する範囲
+
+    Args:
+        area: エリアコードのパス（'' は都道府県全体、'A1301'、'A1301/A130101'）
+        pages: 取得するページ数（1〜MAX_PAGES）
+        total: 検索結果の総件数（ページに表示がない場合はNone）
+    """
+    area: str
+    pages: int
+    total: int | None
+
+
+def _fetch_full_soup(url: str, limiter: HostRateLimiter, concurrency: AdaptiveConcurrency | None):
+    """
+    リストページをページ全体で解析して返す（総件数とエリアのリンクは検索結果リストの外にあるため）
+
+    Returns:
+        BeautifulSoupオブジェクト、または取得失敗・検索結果なしの場合はNone
+    """
+    import requests
+    from bs4 import BeautifulSoup
+
+    import scraper
+
+    try:
+        content = scraper._download(url, limiter, concurrency)
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error fetching {url}: {e}")
+        return None
+    if scraper.is_no_result_page(content):
+        return None
+    features, _ = scraper.PARSER_BACKENDS[scraper._parser_backend]
+    return BeautifulSoup(content, features)
+
+
+def plan_partitions(
+    prefecture_jp: str,
+    genre_jp: str,
+    limiter: HostRateLimiter | None = None,
+    concurrency: AdaptiveConcurrency | None = None,
+    first_pages: dict | None = None,
+) -> list[Partition]:
+    """
+    都道府県・ジャンルの検索を、それぞれ MAX_PAGES ページ以内に収まるエリアごとの検索に分割する
+
+    各検索の1ページ目で総件数を確認し、MAX_RESULTS 件を超える場合はページ内のエリアのリンクから
+    1つ下の階層（都道府県 → 大エリア → 小エリア）に分けて、同じように確認する。
+    小エリアでも収まらない場合や下の階層が見つからない場合は、MAX_PAGES ページまでを取得する（警告を出す）。
+
+    Args:
+        prefecture_jp: 都道府県の漢字表記
+        genre_jp: ジャンルの漢字表記
+        limiter: アクセス間隔を制御するレートリミッター（省略時は scraper の共有リミッター）
+        concurrency: 共有する同時リクエスト数のコントローラー
+        first_pages: 指定すると、確認に使った各検索条件の1ページ目の店舗一覧（scraper.StoreListing のリスト）を
+            エリアごとに格納する（取得時に scrape_tabelog_range_concurrent の first_page に渡し、1ページ目を取得し直さない）
+
+    Returns:
+        分割した検索条件のリスト（ページ内のエリアの並び順）。検索結果がない場合は空のリスト
+    """
+    prefecture_roman = convert_prefecture_to_roman(prefecture_jp)
+    genre_roman = convert_genre_to_roman(genre_jp)
+    if not prefecture_roman:
+        logging.warning(f"Unknown prefecture: {prefecture_jp}")
+        return []
+    # scraper（requests / bs4）は分割の実行時に読み込む（UI の起動時に読み込まない）
+    import scraper
+
+    limiter = limiter or scraper._rate_limiter
+
+    partitions: list[Partition] = []
+
+    def keep_first_page(area: str, soup) -> None:
+        # 解析済みのページ全体ではなく、店舗一覧だけを保持する
+        if first_pages is not None:
+            first_pages[area] = scraper._filter_store_listings(soup, prefecture_roman)
+
+    def visit(area: str) -> None:
+        url = scraper.build_search_url(prefecture_roman, genre_roman, 1, area)
+        soup = _fetch_full_soup(url, limiter, concurrency)
+        if soup is None:
+            logging.info(f"No results for area '{area or prefecture_roman}', skipping")
+            return
+        total = scraper.extract_result_count(soup)
+        if total is not None and total <= MAX_RESULTS:
+            if total > 0:
+                partitions.append(Partition(area, max(1, math.ceil(total / STORES_PER_PAGE)), total))
+                keep_first_page(area, soup)
+            return
+        sub_areas = scraper.extract_sub_areas(soup, prefecture_roman, area)
+        if not sub_areas:
+            logging.warning(
+                f"Area '{area or prefecture_roman}' has {total if total is not None else 'unknown'} results "
+                f"and cannot be split further; only the first {MAX_PAGES} pages will be crawled"
+            )
+            partitions.append(Partition(area, MAX_PAGES, total))
+            keep_first_page(area, soup)
+            return
+        logging.info(f"Splitting area '{area or prefecture_roman}' ({total} results) into {len(sub_areas)} sub-areas")
+        for sub_area in sub_areas:
+            visit(sub_area)
+
+    visit('')
+    return partitions
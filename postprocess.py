@@ -0,0 +1,195 @@
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from records import load_frame
+from sinks import LIST_SEPARATOR, write_frame
+from utils import setup_logging
+
+# 電話番号として整形する列
+PHONE_FIELDS = ('電話番号', '予約・お問い合わせ')
+# 重複判定に使う列（正規化した値がすべてあり、すべて一致する店舗を同じ店舗とみなす）
+DEDUP_FIELDS = ('電話番号', '住所')
+# 重複をまとめる際に、各行の値を LIST_SEPARATOR で連結する列（その他の列は最初の空でない値を使う）
+JOIN_FIELDS = ('検索都道府県', '検索ジャンル', '一致した検索')
+
+# 数字に挟まれたハイフン・長音・ダッシュ類（NFKC 正規化後に残るもの）
+# pyarrow の正規表現（RE2）は後読みに対応しないため、前後の数字も含めて置き換える
+_DASH_BETWEEN_DIGITS = r'(\d)[‐‑‒–—―−ー](\d)'
+_PHONE_NUMBER = r'(?P<number>\d[\d-]{7,}\d)'
+_SEATS_NUMBER = r'(?P<seats>\d+)'
+
+
+def normalize_phone(series: pd.Series) -> pd.Series:
+    """
+    電話番号の表記を揃える（全角数字・全角ハイフン → 半角、ダッシュ類 → '-'、連続する空白 → 1つ）
+
+    数字に挟まれていないダッシュ類（「センター」の長音など）はそのまま残す。
+    """
+    normalized = series.str.normalize('NFKC')
+    # 1桁の区切り（1ー2ー3）は1回の置換で重なるため、2回置き換える
+    for _ in range(2):
+        normalized = normalized.str.replace(_DASH_BETWEEN_DIGITS, r'\1-\2', regex=True)
+    return normalized.str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def normalize_address(series: pd.Series) -> pd.Series:
+    """住所の表記を揃える（全角英数字・全角空白 → 半角、連続する空白 → 1つ）"""
+    return series.str.normalize('NFKC').str.replace(r'\s+', ' ', regex=True).str.strip()
+
+
+def parse_seats(series: pd.Series) -> pd.Series:
+    """席数の文字列（例: '30席'、'３０席（カウンター10席）'）から最初の数値を取り出す（なければ欠損値）"""
+    seats = series.str.normalize('NFKC').str.extract(_SEATS_NUMBER)['seats']
+    return pd.to_numeric(seats, errors='coerce').astype('Int64')
+
+
+def phone_key(series: pd.Series) -> pd.Series:
+    """重複判定用の電話番号（最初の番号の数字のみ。番号がなければ欠損値）"""
+    number = normalize_phone(series).str.extract(_PHONE_NUMBER)['number']
+    return number.str.replace('-', '', regex=False)
+
+
+def address_key(series: pd.Series) -> pd.Series:
+    """重複判定用の住所（空白を除いた表記。空なら欠損値）"""
+    key = normalize_address(series).str.replace(r'\s+', '', regex=True)
+    return key.mask(key == '')
+
+
+# 重複判定に使う列ごとのキーの作り方
+DEDUP_KEYS = {
+    '電話番号': phone_key,
+    '住所': address_key,
+}
+
+
+def _as_text(series: pd.Series) -> pd.Series:
+    """文字列操作ができるように、category 型の列を文字列の列にする"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object).where(series.notna(), None).astype(pd.StringDtype())
+    return series
+
+
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    店舗情報の DataFrame の表記を揃える（電話番号・予約・住所・席数。存在しない列は無視する）
+
+    席数は数値（Int64 型、数値がなければ欠損値）になる。
+
+    Returns:
+        整形した DataFrame（元の DataFrame は変更しない）
+    """
+    frame = frame.copy()
+    for column in PHONE_FIELDS:
+        if column in frame:
+            frame[column] = normalize_phone(_as_text(frame[column]))
+    if '住所' in frame:
+        frame['住所'] = normalize_address(_as_text(frame['住所']))
+    if '席数' in frame:
+        frame['席数'] = parse_seats(_as_text(frame['席数']))
+    return frame
+
+
+def _is_empty(series: pd.Series):
+    """欠損値または空文字の行（bool の ndarray）"""
+    empty = series.isna()
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        empty |= series == ''
+    return empty.to_numpy(dtype=bool)
+
+
+def _join_unique(series: pd.Series, codes, group_count: int) -> list[str]:
+    """グループごとに、連結済みの値も含めて重複を除き、出現順に LIST_SEPARATOR で連結する"""
+    items = pd.Series(series.astype(object).to_numpy()).str.split(LIST_SEPARATOR, regex=False).explode()
+    pairs = pd.DataFrame({'code': codes[items.index.to_numpy()], 'item': items.to_numpy()})
+    pairs = pairs[pairs['item'].notna() & (pairs['item'] != '')].drop_duplicates()
+    joined = [[] for _ in range(group_count)]
+    for code, item in zip(pairs['code'].to_numpy(), pairs['item'].to_numpy()):
+        joined[code].append(item)
+    return [LIST_SEPARATOR.join(group) for group in joined]
+
+
+def dedupe_frame(frame: pd.DataFrame, by=DEDUP_FIELDS, join_fields=JOIN_FIELDS) -> pd.DataFrame:
+    """
+    同じ店舗の行を1行にまとめる
+
+    by の列（電話番号・住所）の正規化した値をハッシュにして比較し、すべて一致する行を同じ店舗とみなす。
+    比較する値のいずれかが空の行はまとめない（電話番号のない、同じ住所の別の店舗をまとめないため）。まとめた行は最初の行の位置に置き、列ごとに最初の空でない値を使う。
+    join_fields の列（検索条件など）は各行の値を重複なく LIST_SEPARATOR で連結する。
+    重複のない行はそのまま残し、重複のある行だけをグループ番号と行位置の配列で集計する。
+
+    Args:
+        frame: 店舗情報の DataFrame
+        by: 重複判定に使う列（DEDUP_KEYS にある列）
+        join_fields: 値を連結する列
+
+    Returns:
+        重複をまとめた DataFrame（インデックスは 0 からの連番）
+    """
+    frame = frame.reset_index(drop=True)
+    by = [column for column in by if column in frame]
+    if not by or frame.empty:
+        return frame
+    keys = pd.DataFrame({column: DEDUP_KEYS[column](_as_text(frame[column])) for column in by})
+    has_key = keys.notna().all(axis=1)
+    hashes = pd.util.hash_pandas_object(keys, index=False)
+    duplicated = has_key & hashes.duplicated(keep=False)
+    if not duplicated.any():
+        return frame
+
+    rows = frame[duplicated]
+    # グループ番号は出現順に振られるため、各グループの最初の行の位置は return_index で求まる
+    codes, uniques = pd.factorize(hashes[duplicated])
+    _, first_rows = np.unique(codes, return_index=True)
+    merged = rows.iloc[first_rows].copy()
+    for column in rows.columns:
+        series = rows[column]
+        if column in join_fields:
+            merged[column] = _join_unique(series, codes, len(uniques))
+            continue
+        # 空でない値がある行のうち、グループごとに最初の行の値を使う
+        filled = np.flatnonzero(~_is_empty(series))
+        groups, first_filled = np.unique(codes[filled], return_index=True)
+        take = first_rows.copy()
+        take[groups] = filled[first_filled]
+        merged[column] = series.take(take).set_axis(merged.index)
+
+    result = pd.concat([frame[~duplicated], merged]).sort_index(kind='stable')
+    logging.info(f"Merged {int(duplicated.sum())} duplicate rows into {len(merged)} stores")
+    return result.reset_index(drop=True)
+
+
+def postprocess_frame(frame: pd.DataFrame, dedupe: bool = True) -> pd.DataFrame:
+    """表記を揃え（normalize_frame）、dedupe が True なら同じ店舗の行をまとめる（dedupe_frame）"""
+    frame = normalize_frame(frame)
+    return dedupe_frame(frame) if dedupe else frame.reset_index(drop=True)
+
+
+def postprocess_file(input_path: str, output_path: str, dedupe: bool = True) -> tuple[int, int]:
+    """
+    出力ファイル（.csv / .jsonl / .parquet / .sqlite）を整形して別のファイルに書き出す
+
+    Returns:
+        (入力の行数, 出力の行数)
+    """
+    frame = load_frame(input_path)
+    result = postprocess_frame(frame, dedupe=dedupe)
+    write_frame(result, output_path)
+    return len(frame), len(result)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='取得結果の表記を揃え、同じ店舗の行をまとめる')
+    parser.add_argument('input', help='入力ファイル（.csv / .jsonl / .parquet / .sqlite）')
+    parser.add_argument('--output', required=True, help='出力ファイル（.csv / .jsonl / .parquet / .sqlite）')
+    parser.add_argument('--no-dedup', action='store_true', help='表記の整形のみ行い、行をまとめない')
+    args = parser.parse_args(argv)
+    setup_logging()
+    rows_in, rows_out = postprocess_file(args.input, args.output, dedupe=not args.no_dedup)
+    print(f"Wrote {rows_out} rows to {args.output} ({rows_in - rows_out} duplicates merged)")
+
+
+if __name__ == '__main__':
+    main()
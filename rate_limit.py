@@ -0,0 +1,223 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# アクセス間隔の既定値（robots.txt および利用規約を遵守し、過剰な負荷を与えない値にする）
+# 同時リクエスト数を自動調整する場合も、ホストあたりのリクエスト数はこの値を超えない
+DEFAULT_REQUESTS_PER_SECOND = float(os.environ.get('TABELOG_REQUESTS_PER_SECOND', '1.0'))
+# 並行取得時の同時リクエスト数の上限（AdaptiveConcurrency はこの範囲で同時リクエスト数を調整する）
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+def concurrent_burst(requests_per_second: float, max_in_flight: int) -> float:
+    """
+    並行取得に使うレートリミッターのバースト許容数（同時リクエスト数の上限まで、かつ1秒分のリクエスト数まで）
+
+    リクエスト数をワーカーごとに分けた場合（バッチ）も、開始時のバーストが割り当てたレートを超えないようにする。
+    """
+    return max(1.0, min(float(max_in_flight), requests_per_second))
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレートリミッター
+
+    1リクエストごとにトークンを1つ消費し、トークンは rate 個/秒で補充される。
+    スレッドセーフで、同期 (acquire) と非同期 (acquire_async) の両方から利用できる。
+
+    Args:
+        rate: 1秒あたりに許可するリクエスト数
+        capacity: バケットの容量（瞬間的に許容するバースト数）。省略時は1
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else 1.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """トークンを1つ予約し、利用可能になるまでの待ち秒数を返す"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """トークンが得られるまでブロックする"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """トークンが得られるまでイベントループを止めずに待機する"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class HostRateLimiter:
+    """
+    ホスト単位でトークンバケットを管理するレートリミッター
+
+    Args:
+        requests_per_second: ホストごとの1秒あたりのリクエスト数
+        burst: ホストごとのバースト許容数
+    """
+
+    def __init__(self, requests_per_second: float, burst: float | None = None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.requests_per_second, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url: str) -> None:
+        self.bucket_for(url).acquire()
+
+    async def acquire_async(self, url: str) -> None:
+        await self.bucket_for(url).acquire_async()
+
+
+# 応答を「混雑」とみなすHTTPステータス（同時リクエスト数を減らす）
+BACKOFF_STATUSES = frozenset({429, 503})
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD（加算増・乗算減）で同時リクエスト数を調整するコントローラー
+
+    応答が正常で遅延も基準内なら、現在の上限と同じ件数の成功ごとに上限を1つ増やす。
+    429/503・接続エラー・5xx、または遅延（指数移動平均）が基準の latency_tolerance 倍を超えた場合は
+    上限を backoff_factor 倍に減らす（同時に返ってきた失敗で下げすぎないよう、cooldown 秒に1回まで）。
+    上限は max_limit を超えず、アクセス間隔はこれとは別に HostRateLimiter で制限される。
+    スレッドセーフで、取得スレッドから slot() で枠を確保して使う。
+
+    Args:
+        max_limit: 同時リクエスト数の上限（これを超えて増やさない）
+        initial: 開始時の同時リクエスト数
+        min_limit: 同時リクエスト数の下限
+        backoff_factor: 混雑・エラー時に上限に掛ける係数
+        latency_tolerance: 基準遅延に対して許容する倍率
+        cooldown: 上限を続けて減らすまでの最短間隔（秒）
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial: int = 2,
+        min_limit: int = 1,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        cooldown: float = 1.0,
+    ):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self._limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._successes = 0
+        self._latency_ewma: float | None = None
+        self._baseline: float | None = None
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._counters = {'increases': 0, 'decreases': 0, 'throttled': 0, 'errors': 0, 'slow': 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        """同時リクエスト数が上限未満になるまでブロックして枠を確保する"""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        """with 文で枠を確保・解放する"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, status: int | None, elapsed: float) -> None:
+        """
+        1回のリクエストの結果を反映して上限を調整する（HttpClient.get の observer として渡す）
+
+        Args:
+            status: HTTPステータス（接続エラー・タイムアウトの場合はNone）
+            elapsed: 応答までの秒数
+        """
+        with self._condition:
+            if status is None or status in BACKOFF_STATUSES or status >= 500:
+                self._counters['throttled' if status in BACKOFF_STATUSES else 'errors'] += 1
+                self._decrease()
+                return
+            self._latency_ewma = elapsed if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * elapsed
+            if self._baseline is None or self._latency_ewma < self._baseline:
+                self._baseline = self._latency_ewma
+            else:
+                # サイト全体が遅くなった場合に下限へ張り付かないよう、基準も少しずつ追従させる
+                self._baseline += (self._latency_ewma - self._baseline) * 0.01
+            if self._latency_ewma > self._baseline * self.latency_tolerance:
+                self._counters['slow'] += 1
+                self._decrease()
+                return
+            self._successes += 1
+            if self._successes >= int(self._limit) and self._limit < self.max_limit:
+                self._limit += 1
+                self._successes = 0
+                self._counters['increases'] += 1
+                self._condition.notify()
+
+    def _decrease(self) -> None:
+        """上限を乗算的に減らす（ロック取得済みで呼ぶ）"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, int(self._limit * self.backoff_factor))
+        self._successes = 0
+        self._counters['decreases'] += 1
+
+    def stats(self) -> dict:
+        """
+        コントローラーの状態を返す
+
+        Returns:
+            limit（現在の上限）, in_flight, increases, decreases, throttled（429/503）, errors, slow（遅延超過）,
+            latency_ewma（秒） の辞書
+        """
+        with self._condition:
+            stats = dict(self._counters)
+            stats.update(limit=int(self._limit), in_flight=self._in_flight, latency_ewma=self._latency_ewma)
+        return stats
+
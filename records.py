@@ -0,0 +1,229 @@
+import csv
+import json
+import os
+from array import array
+from typing import NamedTuple
+
+# 店舗情報の列名（CSV / DataFrame の列順）
+STORE_FIELDS = ('店名', 'ジャンル', '住所', '電話番号', '予約・お問い合わせ', 'ホームページ', '席数')
+
+# 値の種類が少ない列（辞書エンコードしてメモリを節約する）
+CATEGORY_FIELDS = frozenset({'ジャンル', '検索都道府県', '検索ジャンル'})
+
+
+class StoreRecord(NamedTuple):
+    """
+    1店舗分の詳細情報（STORE_FIELDS の順に並んだタプル）
+
+    辞書と違いキーを持たないため、プロセス間の受け渡しや大量件数の保持でメモリを節約できる。
+    """
+    name: str = ''
+    genre: str = ''
+    address: str = ''
+    phone: str = ''
+    reservation: str = ''
+    homepage: str = ''
+    seats: str = ''
+
+    @classmethod
+    def from_dict(cls, details: dict) -> 'StoreRecord':
+        return cls(*(details.get(field) or '' for field in STORE_FIELDS))
+
+    def as_dict(self) -> dict:
+        """列名（日本語）をキーにした辞書に変換する（extract_store_details と同じ形式）"""
+        return dict(zip(STORE_FIELDS, self))
+
+
+# リストページのみ取得する場合の列名（店舗ページの取得なしで得られる項目）
+LISTING_FIELDS = ('店名', 'ジャンル', 'エリア', '店舗URL')
+
+
+class StoreListing(NamedTuple):
+    """
+    リストページの1店舗分の表示内容（店舗ページを取得する前に分かる項目）
+
+    area は最寄り駅と距離（例: 渋谷駅 250m）で、他の都道府県の店舗には [神奈川] のような接頭辞が付く。
+    """
+    url: str
+    name: str = ''
+    area: str = ''
+    genre: str = ''
+
+    def as_dict(self) -> dict:
+        """LISTING_FIELDS をキーにした辞書に変換する"""
+        return dict(zip(LISTING_FIELDS, (self.name, self.genre, self.area, self.url)))
+
+
+class _CategoryColumn:
+    """辞書エンコードした列（値ごとの番号の配列と、番号から値への対応表）"""
+
+    __slots__ = ('codes', 'categories', '_lookup')
+
+    def __init__(self):
+        self.codes = array('i')
+        self.categories: list[str] = []
+        self._lookup: dict[str, int] = {}
+
+    def append(self, value) -> None:
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.categories)
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class ColumnarAccumulator:
+    """
+    店舗情報を列ごとのバッファに追記し、まとめて DataFrame / Arrow のテーブルに変換する
+
+    レコードの辞書のリストを経由しないため、数万件の店舗でも1件ごとの辞書のオーバーヘッドがかからない。
+    CATEGORY_FIELDS の列（ジャンルや検索条件）は辞書エンコードし、同じ文字列を1度だけ保持する。
+
+    Args:
+        fieldnames: 列名（省略時は最初のレコードから決める。StoreRecord の場合は STORE_FIELDS）
+        category_fields: 辞書エンコードする列名
+    """
+
+    def __init__(self, fieldnames: list[str] | None = None, category_fields=CATEGORY_FIELDS):
+        self.category_fields = frozenset(category_fields)
+        self.fieldnames: list[str] | None = None
+        self._columns: dict[str, list | _CategoryColumn] = {}
+        self._count = 0
+        if fieldnames:
+            self._init_columns(list(fieldnames))
+
+    def _init_columns(self, fieldnames: list[str]) -> None:
+        self.fieldnames = fieldnames
+        self._columns = {
+            name: _CategoryColumn() if name in self.category_fields else []
+            for name in fieldnames
+        }
+
+    def append(self, record) -> None:
+        """
+        1件追加する
+
+        Args:
+            record: StoreRecord か、列名をキーにした辞書
+        """
+        if isinstance(record, StoreRecord):
+            if self.fieldnames is None:
+                self._init_columns(list(STORE_FIELDS))
+            for name, value in zip(STORE_FIELDS, record):
+                self._columns[name].append(value)
+        else:
+            if self.fieldnames is None:
+                self._init_columns(list(record.keys()))
+            for name in self.fieldnames:
+                self._columns[name].append(record.get(name))
+        self._count += 1
+
+    def extend(self, records) -> 'ColumnarAccumulator':
+        for record in records:
+            self.append(record)
+        return self
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self) -> None:
+        """バッファを空にする（列名はそのまま）"""
+        if self.fieldnames is not None:
+            self._init_columns(self.fieldnames)
+        self._count = 0
+
+    def to_frame(self):
+        """
+        DataFrame に変換する
+
+        辞書エンコードした列は category 型、その他の列は pyarrow があれば Arrow の文字列型（なければ object 型）になる。
+
+        Returns:
+            pandas.DataFrame
+        """
+        import pandas as pd
+
+        try:
+            import pyarrow  # noqa: F401
+            string_dtype = pd.ArrowDtype(pyarrow.string())
+        except ImportError:
+            string_dtype = object
+        data = {}
+        for name in self.fieldnames or []:
+            column = self._columns[name]
+            if isinstance(column, _CategoryColumn):
+                data[name] = pd.Categorical.from_codes(column.codes, categories=column.categories)
+            else:
+                data[name] = pd.array(column, dtype=string_dtype)
+        return pd.DataFrame(data, columns=self.fieldnames or list(STORE_FIELDS))
+
+    def to_arrow(self):
+        """
+        pyarrow の Table に変換する（要 pyarrow。辞書エンコードした列は dictionary 型になる）
+
+        Returns:
+            pyarrow.Table
+        """
+        import pyarrow as pa
+
+        arrays = {}
+        for name in self.fieldnames or []:
+            column = self._columns[name]
+            if isinstance(column, _CategoryColumn):
+                indices = pa.array(column.codes, type=pa.int32(), mask=[c < 0 for c in column.codes])
+                arrays[name] = pa.DictionaryArray.from_arrays(indices, pa.array(column.categories, type=pa.string()))
+            else:
+                arrays[name] = pa.array(column, type=pa.string())
+        return pa.table(arrays)
+
+
+def read_records(path: str):
+    """
+    出力ファイル（.csv / .jsonl / .sqlite）の店舗情報を1件ずつ読み出す（全件をメモリに保持しない）
+
+    JSONL のリストの値（一致した検索など）は、他の形式と同じく LIST_SEPARATOR で連結した文字列にする。
+
+    Yields:
+        dict: 店舗情報の辞書（リストの値を含まない）
+
+    Raises:
+        ValueError: 未対応の拡張子の場合
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        with open(path, encoding='utf-8', newline='') as f:
+            yield from csv.DictReader(f)
+    elif ext == '.jsonl':
+        from sinks import flatten_record
+
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield flatten_record(json.loads(line))
+    elif ext == '.sqlite':
+        from result_store import ResultStore
+
+        with ResultStore(path) as store:
+            yield from store.iter_records()
+    else:
+        raise ValueError(f"Unsupported input format: {path} (choose from .csv, .jsonl, .sqlite)")
+
+
+def load_frame(path: str):
+    """
+    出力ファイル（.csv / .jsonl / .parquet / .sqlite）を DataFrame として読み込む（列の型は ColumnarAccumulator.to_frame と同じ）
+
+    Returns:
+        pandas.DataFrame
+    """
+    if os.path.splitext(path)[1].lower() == '.parquet':
+        import pandas as pd
+
+        return pd.read_parquet(path)
+    return ColumnarAccumulator().extend(read_records(path)).to_frame()
@@ -0,0 +1,110 @@
+import sqlite3
+
+from sinks import RESULT_TABLE, CsvSink, _quote
+
+# LIKE の検索語でワイルドカードとして扱われる文字をエスケープする
+_LIKE_ESCAPE = str.maketrans({'\\': '\\\\', '%': '\\%', '_': '\\_'})
+
+
+class ResultStore:
+    """
+    ジョブの取得結果（sinks.SqliteSink で書いた SQLite）をページ単位で読み出す
+
+    表示する行だけをクエリで取り出すため、結果の件数によらず画面ごとのメモリ使用量は一定になる。
+    並べ替えと絞り込み（全列の部分一致）も SQLite 側で行う。書き込み中のファイルも読み出せる（コミット済みの行のみ）。
+
+    Args:
+        path: 結果の SQLite ファイルのパス
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+
+    @property
+    def columns(self) -> list[str]:
+        """列名（テーブルがまだない場合は空のリスト）"""
+        return [row[1] for row in self._conn.execute(f'PRAGMA table_info({RESULT_TABLE})')]
+
+    def _where(self, query: str) -> tuple[str, list]:
+        """全列のいずれかに query を含む行を選ぶ条件（query が空なら条件なし）"""
+        if not query:
+            return '', []
+        pattern = f"%{query.translate(_LIKE_ESCAPE)}%"
+        columns = self.columns
+        conditions = ' OR '.join(f"{_quote(name)} LIKE ? ESCAPE '\\'" for name in columns)
+        return f' WHERE {conditions}', [pattern] * len(columns)
+
+    def count(self, query: str = '') -> int:
+        """行数（query を指定すると、いずれかの列に query を含む行の数）"""
+        if not self.columns:
+            return 0
+        where, params = self._where(query)
+        return self._conn.execute(f'SELECT COUNT(*) FROM {RESULT_TABLE}{where}', params).fetchone()[0]
+
+    def page(self, offset: int, limit: int, sort_by: str | None = None, descending: bool = False, query: str = ''):
+        """
+        1ページ分の行を DataFrame で返す
+
+        Args:
+            offset: 先頭から読み飛ばす行数
+            limit: 最大行数
+            sort_by: 並べ替える列名（None なら取得順）
+            descending: True なら降順
+            query: 絞り込む文字列（いずれかの列に部分一致する行のみ）
+
+        Returns:
+            pandas.DataFrame
+
+        Raises:
+            ValueError: sort_by が存在しない列の場合
+        """
+        import pandas as pd
+
+        columns = self.columns
+        if not columns:
+            return pd.DataFrame()
+        if sort_by is not None and sort_by not in columns:
+            raise ValueError(f"Unknown column: {sort_by}")
+        where, params = self._where(query)
+        order = 'rowid'
+        if sort_by is not None:
+            order = f"{_quote(sort_by)} {'DESC' if descending else 'ASC'}, rowid"
+        rows = self._conn.execute(
+            f'SELECT * FROM {RESULT_TABLE}{where} ORDER BY {order} LIMIT ? OFFSET ?', params + [limit, offset]
+        ).fetchall()
+        return pd.DataFrame(rows, columns=columns)
+
+    def iter_records(self):
+        """
+        全行を取得順に1件ずつ読み出す
+
+        Yields:
+            dict: 列名をキーにした辞書
+        """
+        columns = self.columns
+        if not columns:
+            return
+        for row in self._conn.execute(f'SELECT * FROM {RESULT_TABLE} ORDER BY rowid'):
+            yield dict(zip(columns, row))
+
+    def export_csv(self, path: str) -> str:
+        """
+        全行を CSV に書き出す（1行ずつ書き出し、全件をメモリに保持しない）
+
+        Returns:
+            書き出したファイルのパス
+        """
+        with CsvSink(path, fieldnames=self.columns) as sink:
+            for record in self.iter_records():
+                sink.write(record)
+        return path
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
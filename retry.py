@@ -0,0 +1,301 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from metrics import STORE_RETRIES
+from utils import setup_logging
+
+# 取得に失敗した店舗ページを実行の最後に再試行する回数と、1回目の再試行までの待ち時間（秒、回ごとに2倍）
+DEFAULT_RETRY_ATTEMPTS = 2
+DEFAULT_RETRY_BACKOFF = 5.0
+# 環境変数でパスを指定すると、再試行しても取得できなかった店舗ページを記録する
+DEAD_LETTERS_ENV = 'TABELOG_DEAD_LETTERS'
+
+
+class DeadLetter(NamedTuple):
+    url: str
+    prefecture_jp: str
+    genre_jp: str
+    attempts: int
+    first_failed_at: float
+    last_failed_at: float
+
+
+class DeadLetters:
+    """
+    取得に失敗した店舗ページの一覧（SQLite に永続化する）
+
+    店舗ページの取得に失敗した時点で記録し、後の取得（再試行・別の実行での通常の取得）で店舗情報を抽出できたら削除する。
+    実行が途中で中断されても失敗した店舗は残り、後から process_dead_letters で取得し直せる。
+    複数のプロセス（バッチのワーカー）から同じファイルを共有できる。
+
+    Args:
+        path: SQLite ファイルのパス
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letters ('
+            ' url TEXT PRIMARY KEY, prefecture_jp TEXT NOT NULL, genre_jp TEXT NOT NULL,'
+            ' attempts INTEGER NOT NULL, first_failed_at REAL NOT NULL, last_failed_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def add(self, url: str, prefecture_jp: str, genre_jp: str = '') -> None:
+        """失敗を記録する（記録済みの店舗は失敗回数を1増やす）"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO dead_letters VALUES (?, ?, ?, 1, ?, ?)'
+                ' ON CONFLICT (url) DO UPDATE SET attempts = attempts + 1, last_failed_at = excluded.last_failed_at',
+                (url, prefecture_jp, genre_jp, now, now),
+            )
+            self._conn.commit()
+
+    def remove(self, url: str) -> None:
+        """取得できた店舗を一覧から削除する"""
+        with self._lock:
+            self._conn.execute('DELETE FROM dead_letters WHERE url = ?', (url,))
+            self._conn.commit()
+
+    def urls(self) -> set[str]:
+        """記録した店舗URLの集合"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute('SELECT url FROM dead_letters')}
+
+    def entries(self, limit: int | None = None) -> list[DeadLetter]:
+        """記録した店舗を最初に失敗した順に返す"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT url, prefecture_jp, genre_jp, attempts, first_failed_at, last_failed_at'
+                ' FROM dead_letters ORDER BY first_failed_at LIMIT ?',
+                (-1 if limit is None else limit,),
+            ).fetchall()
+        return [DeadLetter(*row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM dead_letters').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_dead_letters: DeadLetters | None = None
+_default_dead_letters_loaded = False
+_default_dead_letters_lock = threading.Lock()
+
+
+def configure_dead_letters(path: str | None) -> DeadLetters | None:
+    """
+    既定の失敗一覧を設定する（path が None なら記録しない）
+
+    Returns:
+        設定したDeadLetters、または無効化した場合はNone
+    """
+    global _default_dead_letters, _default_dead_letters_loaded
+    with _default_dead_letters_lock:
+        if _default_dead_letters is not None:
+            _default_dead_letters.close()
+        _default_dead_letters = DeadLetters(path) if path else None
+        _default_dead_letters_loaded = True
+        return _default_dead_letters
+
+
+def get_dead_letters() -> DeadLetters | None:
+    """既定の失敗一覧を返す。未設定なら環境変数 TABELOG_DEAD_LETTERS を参照する（オプトイン）"""
+    global _default_dead_letters, _default_dead_letters_loaded
+    with _default_dead_letters_lock:
+        if not _default_dead_letters_loaded:
+            path = os.environ.get(DEAD_LETTERS_ENV)
+            _default_dead_letters = DeadLetters(path) if path else None
+            _default_dead_letters_loaded = True
+        return _default_dead_letters
+
+
+class RetryScheduler:
+    """
+    取得に失敗した店舗ページを記録し、実行の最後にまとめて再試行する
+
+    失敗した時点では再試行せず（取得中の他の店舗の順番を遅らせない）、全ページの取得が終わってから
+    backoff 秒・2倍… と間隔を空けて最大 attempts 回まで取得し直す。再試行も同じレートリミッターと
+    同時リクエスト数の枠を通すため、アクセス間隔は通常の取得と変わらない。
+    dead_letters を指定すると、失敗した店舗を失敗した時点で記録し、店舗情報を抽出できたら（succeeded）削除する。
+    削除は作成時に一覧にあった店舗とこの実行で失敗した店舗に限り、失敗のない取得では一覧に書き込まない。
+
+    Args:
+        prefecture_jp: 都道府県の漢字表記（失敗一覧に記録する）
+        genre_jp: ジャンルの漢字表記（失敗一覧に記録する）
+        attempts: 再試行の回数（0 なら再試行しない）
+        backoff: 1回目の再試行までの待ち時間（秒）
+        dead_letters: 失敗一覧（省略時は get_dead_letters()）
+    """
+
+    def __init__(self, prefecture_jp: str, genre_jp: str = '', attempts: int = DEFAULT_RETRY_ATTEMPTS,
+                 backoff: float = DEFAULT_RETRY_BACKOFF, dead_letters: DeadLetters | None = None):
+        self.prefecture_jp = prefecture_jp
+        self.genre_jp = genre_jp
+        self.attempts = max(0, int(attempts))
+        self.backoff = backoff
+        self.dead_letters = dead_letters if dead_letters is not None else get_dead_letters()
+        self.pending: list[tuple[int, str]] = []
+        # 失敗一覧にある（この実行で記録した、または作成時に記録済みだった）店舗URL
+        self._dead_urls: set[str] = self.dead_letters.urls() if self.dead_letters is not None else set()
+        self._lock = threading.Lock()
+
+    def failed(self, page_num: int, store_url: str) -> None:
+        """店舗ページの取得失敗を記録する（取得中のスレッドから呼んでよい）"""
+        with self._lock:
+            self.pending.append((page_num, store_url))
+            self._dead_urls.add(store_url)
+        if self.dead_letters is not None:
+            self.dead_letters.add(store_url, self.prefecture_jp, self.genre_jp)
+
+    def schedule(self, page_num: int, store_url: str) -> None:
+        """以前の実行で失敗した店舗を再試行の対象に加える（失敗一覧には記録済みのため記録しない）"""
+        with self._lock:
+            self.pending.append((page_num, store_url))
+            self._dead_urls.add(store_url)
+
+    def succeeded(self, store_url: str) -> None:
+        """店舗情報を抽出できた店舗を失敗一覧から削除する（通常の取得で抽出できた場合も呼ぶ。一覧にない店舗は何もしない）"""
+        with self._lock:
+            if store_url not in self._dead_urls:
+                return
+            self._dead_urls.discard(store_url)
+        if self.dead_letters is not None:
+            self.dead_letters.remove(store_url)
+
+    def retry(self, fetch, workers: int = 1):
+        """
+        失敗した店舗ページを再試行するジェネレーター
+
+        Args:
+            fetch: 店舗URLを受け取り、ページ（BeautifulSoup）か取得失敗時はNoneを返す関数
+            workers: 同時に再試行するスレッド数
+
+        Yields:
+            (ページ番号, 店舗URL, BeautifulSoup) のタプル（取得できた店舗のみ。
+            失敗一覧からは削除しないため、呼び出し元が店舗情報を抽出できたら succeeded を呼ぶ）
+        """
+        for attempt in range(self.attempts):
+            with self._lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return
+            delay = self.backoff * (2 ** attempt)
+            logging.warning(f"Retrying {len(pending)} failed store pages in {delay:.1f}s "
+                            f"(attempt {attempt + 1}/{self.attempts})")
+            time.sleep(delay)
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='store-retry') as executor:
+                soups = executor.map(fetch, [url for _, url in pending])
+                for (page_num, url), soup in zip(pending, soups):
+                    if soup is None:
+                        STORE_RETRIES.inc(result='failed')
+                        self.failed(page_num, url)
+                        continue
+                    STORE_RETRIES.inc(result='ok')
+                    yield page_num, url, soup
+        if self.pending:
+            logging.error(f"{len(self.pending)} store pages could not be fetched after {self.attempts} retries"
+                          + (f" (recorded in {self.dead_letters.path})" if self.dead_letters is not None else ''))
+
+
+def process_dead_letters(dead_letters: DeadLetters, limiter=None, workers: int = 1, limit: int | None = None,
+                         done_urls=()):
+    """
+    失敗一覧の店舗ページを取得し直すジェネレーター（単独のジョブとして実行する）
+
+    店舗情報を抽出できた店舗は一覧から削除し、失敗した店舗は失敗回数を増やして残す。
+    done_urls に含まれる店舗（後の実行で取得済みのもの）は取得せずに一覧から削除し、結果の重複を防ぐ。
+    住所が記録した都道府県に含まれない店舗は、通常の取得と同じく結果から除く。
+
+    Args:
+        dead_letters: 失敗一覧
+        limiter: アクセス間隔を制御するレートリミッター（省略時は scraper の共有リミッター）
+        workers: 同時に取得するスレッド数
+        limit: 取得し直す最大件数（最初に失敗した順）
+        done_urls: 取得済みの店舗URLの集合（crawl_job.processed_store_urls など）
+
+    Yields:
+        dict: 店舗情報の辞書（店舗URL 列付き）
+    """
+    import scraper
+
+    limiter = limiter or scraper._rate_limiter
+    entries = []
+    for entry in dead_letters.entries(limit):
+        if entry.url in done_urls:
+            dead_letters.remove(entry.url)
+        else:
+            entries.append(entry)
+    logging.warning(f"Processing {len(entries)} dead-lettered store pages")
+
+    def fetch(entry: DeadLetter):
+        return scraper._fetch_page_content(entry.url, limiter)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='dead-letter') as executor:
+        for entry, soup in zip(entries, executor.map(fetch, entries)):
+            store_details = scraper._extract_store(entry.url, soup)
+            if store_details is None:
+                STORE_RETRIES.inc(result='failed')
+                dead_letters.add(entry.url, entry.prefecture_jp, entry.genre_jp)
+                continue
+            STORE_RETRIES.inc(result='ok')
+            dead_letters.remove(entry.url)
+            store_details = scraper._in_prefecture(store_details, entry.prefecture_jp)
+            if store_details:
+                yield {**store_details, '店舗URL': entry.url}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description='取得に失敗した店舗ページの一覧の操作')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    show = sub.add_parser('list', help='失敗一覧を表示する')
+    show.add_argument('path', help='失敗一覧（SQLite）のパス')
+
+    process = sub.add_parser('process', help='失敗一覧の店舗ページを取得し直して書き出す')
+    process.add_argument('path', help='失敗一覧（SQLite）のパス')
+    process.add_argument('--output', required=True, help='出力ファイル（.csv / .jsonl / .parquet / .sqlite）')
+    process.add_argument('--workers', type=int, default=1, help='同時に取得するスレッド数')
+    process.add_argument('--limit', type=int, default=None, help='取得し直す最大件数')
+    process.add_argument('--jobs-dir', default=None,
+                         help='取得済みの店舗を読み出すジョブの保存先（省略時は失敗一覧と同じディレクトリ）')
+
+    args = parser.parse_args(argv)
+    setup_logging()
+    dead_letters = DeadLetters(args.path)
+    try:
+        if args.command == 'list':
+            for entry in dead_letters.entries():
+                print(f"{entry.url}\t{entry.prefecture_jp}/{entry.genre_jp or '全ジャンル'}\t{entry.attempts}")
+            return
+        from crawl_job import processed_store_urls
+        from sinks import open_sink
+
+        done_urls = processed_store_urls(args.jobs_dir or os.path.dirname(os.path.abspath(args.path)))
+        with open_sink(args.output) as sink:
+            for record in process_dead_letters(dead_letters, workers=args.workers, limit=args.limit,
+                                               done_urls=done_urls):
+                sink.write(record)
+        print(f"Wrote {sink.count} stores to {args.output} ({len(dead_letters)} still failing)")
+    finally:
+        dead_letters.close()
+
+
+if __name__ == '__main__':
+    main()
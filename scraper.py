@@ -1,19 +1,159 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import codecs
+import importlib.util
+import multiprocessing
+import os
+import re
+import sys
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import ExitStack, aclosing
+import requests
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
 import logging # logging モジュールを追加
 
-# ロギングの設定 (必要に応じて調整)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
 # utils.py から都道府県変換マップをインポートする想定
 # from .utils import PREFECTURE_MAP # プロジェクト構成による
 from utils import convert_prefecture_to_roman, convert_genre_to_roman
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlsplit
+from rate_limit import (HostRateLimiter, AdaptiveConcurrency, DEFAULT_REQUESTS_PER_SECOND, DEFAULT_MAX_IN_FLIGHT,
+                        concurrent_burst)
+from http_client import get_client
+from http_cache import get_cache, page_kind
+from archive import get_archive
+from retry import RetryScheduler, DeadLetters, DEFAULT_RETRY_ATTEMPTS, DEFAULT_RETRY_BACKOFF
+from store_index import StoreIndex, store_id_from_url
+from records import StoreRecord, StoreListing
+from metrics import PAGES, FETCH_SECONDS, RATE_LIMIT_WAIT_SECONDS, PARSE_SECONDS, EXTRACT_SECONDS, FILTER_SECONDS, STORES
+
+# 接続先（ベンチマーク等でローカルの代替サーバーに向ける場合は環境変数 TABELOG_BASE_URL で変更）
+BASE_URL = os.environ.get('TABELOG_BASE_URL', "https://tabelog.com/")
+
+# 処理中のページより先に取得しておくリストページ数
+DEFAULT_LIST_LOOKAHEAD = 1
+# 店舗ページの解析に使うワーカープロセス数（0 ならプロセスを使わず、取得したスレッドで解析する）
+DEFAULT_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+# 同期版 get_page_content が共有するホスト単位のレートリミッター（従来の1秒待機に相当）
+_rate_limiter = HostRateLimiter(DEFAULT_REQUESTS_PER_SECOND)
+
+# パーサーバックエンド: 名前 -> (BeautifulSoup のパーサー名, 必要な部分木だけをパースするか)
+PARSER_BACKENDS = {
+    'html.parser': ('html.parser', False),  # 従来どおりページ全体を標準パーサーで解析
+    'targeted': ('html.parser', True),      # 店舗ページは #contents-rstdata の部分木のみ解析
+    'lxml': ('lxml', False),                # C実装の lxml でページ全体を解析（要 lxml）
+    'lxml-targeted': ('lxml', True),        # lxml で部分木のみ解析（要 lxml）
+}
+# 既定のバックエンド（環境変数 TABELOG_PARSER で変更可能）
+DEFAULT_PARSER_BACKEND = 'targeted'
+# 部分木パースで解析する要素のID（ページ種別ごと。リストページは extract_store_urls の優先順）
+TARGET_ELEMENT_IDS = {
+    'store': ('contents-rstdata',),
+    'list': ('js-RstListWrap', 'js-rstlst-wrap'),
+}
+
+# エリアコード（大エリア 'A1301'、小エリア 'A130101'）
+AREA_CODE_PATTERNS = (re.compile(r'A\d{4}'), re.compile(r'A\d{6}'))
+# リストページのエリア表示の都道府県の接頭辞（例: [神奈川] 横浜駅 300m）
+AREA_PREFECTURE_PATTERN = re.compile(r'\[([^\]]+)\]')
+
+# 「検索結果なし」ページの判定に使う文言とクラス名
+NO_RESULT_TEXT = 'ご指定の条件に該当するお店は見つかりませんでした'
+NO_RESULT_CLASS = 'result-cassette__title--no-result'
+# クラス名の直後に「見つかりませんでした」を探す範囲（バイト数）
+NO_RESULT_WINDOW = 1024
+
+def set_parser_backend(name: str) -> None:
+    """
+    ページ解析に使うパーサーバックエンドを切り替える
+
+    Args:
+        name: PARSER_BACKENDS のキー
+
+    Raises:
+        ValueError: 未知のバックエンド、または必要なライブラリが導入されていない場合
+    """
+    global _parser_backend
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name} (choose from {', '.join(PARSER_BACKENDS)})")
+    features, _ = PARSER_BACKENDS[name]
+    if features == 'lxml' and importlib.util.find_spec('lxml') is None:
+        raise ValueError(f"Parser backend '{name}' requires lxml to be installed")
+    _parser_backend = name
+
+_parser_backend = DEFAULT_PARSER_BACKEND
+set_parser_backend(os.environ.get('TABELOG_PARSER', DEFAULT_PARSER_BACKEND))
+
+def make_soup(content: bytes, url: str) -> BeautifulSoup:
+    """
+    選択中のパーサーバックエンドでページをパースする
+
+    部分木パースが有効な場合、店舗ページは #contents-rstdata、リストページは検索結果リストの
+    ラッパーより前のバイト列を読み飛ばし、その要素だけを SoupStrainer で組み立てる
+    （extract_store_details / extract_store_urls の結果はページ全体の解析と同一）。
+    対象の要素が見つからない場合はページ全体を解析する。
+
+    Args:
+        content: レスポンス本文
+        url: ページのURL（ページ種別の判定に使う）
+
+    Returns:
+        BeautifulSoupオブジェクト
+    """
+    features, targeted = PARSER_BACKENDS[_parser_backend]
+    kind = page_kind(url)
+    with PARSE_SECONDS.time(kind=kind):
+        if targeted:
+            soup = _parse_subtree(content, features, TARGET_ELEMENT_IDS[kind])
+            if soup is not None:
+                return soup
+        return BeautifulSoup(content, features)
+
+def _parse_subtree(content: bytes, features: str, element_ids: tuple[str, ...]) -> BeautifulSoup | None:
+    """
+    指定IDの要素の部分木だけをパースする。いずれの要素も見つからない場合はNone
+    """
+    positions = [p for p in (content.find(f'id="{i}"'.encode('ascii')) for i in element_ids) if p >= 0]
+    if not positions:
+        return None
+    # 切り出すと <meta charset> が失われるため、文字コードはページ全体から先に判定しておく
+    encoding = _declared_encoding(content)
+    content = content[content.rfind(b'<', 0, min(positions)):]
+    strainer = SoupStrainer(id=list(element_ids))
+    return BeautifulSoup(content, features, parse_only=strainer, from_encoding=encoding)
+
+def _declared_encoding(content: bytes) -> str:
+    """
+    HTML内で宣言された文字コードを返す（宣言がない・未知の場合は utf-8）
+    """
+    encoding = EncodingDetector.find_declared_encoding(content, is_html=True)
+    try:
+        return codecs.lookup(encoding).name if encoding else 'utf-8'
+    except LookupError:
+        return 'utf-8'
 
-BASE_URL = "https://tabelog.com/"
+def is_no_result_page(content: bytes) -> bool:
+    """
+    リストページの本文（バイト列）が「検索結果なし」ページかどうかをパース前に判定する
+
+    Args:
+        content: レスポンス本文
 
-def build_search_url(prefecture_roman: str, genre_roman: str, page_num: int) -> str:
+    Returns:
+        検索結果なしのページならTrue
+    """
+    encoding = _declared_encoding(content)
+    # セレクタ（.result-cassette__title--no-result）に相当する判定
+    pos = content.find(NO_RESULT_CLASS.encode('ascii'))
+    if pos >= 0 and '見つかりませんでした'.encode(encoding) in content[pos:pos + NO_RESULT_WINDOW]:
+        return True
+    # ページ全体の文言による判定（フォールバック）
+    return NO_RESULT_TEXT.encode(encoding) in content
+
+def build_search_url(prefecture_roman: str, genre_roman: str, page_num: int, area: str = '') -> str:
     """
     食べログのジャンル別リストページのURLを構築する
 
@@ -21,16 +161,55 @@ def build_search_url(prefecture_roman: str, genre_roman: str, page_num: int) ->
         prefecture_roman: 都道府県のローマ字表記
         genre_roman: ジャンルのローマ字表記
         page_num: ページ番号 (1-60)
+        area: エリアコードのパス（例: 'A1301'、'A1301/A130101'。空なら都道府県全体）
 
     Returns:
         構築されたURL
     """
+    prefix = f"{BASE_URL}{prefecture_roman}/{area}/" if area else f"{BASE_URL}{prefecture_roman}/"
     if genre_roman:
-        url = f"{BASE_URL}{prefecture_roman}/rstLst/{genre_roman}/{page_num}/"
+        url = f"{prefix}rstLst/{genre_roman}/{page_num}/"
     else:
-        url = f"{BASE_URL}{prefecture_roman}/rstLst/{page_num}/"
+        url = f"{prefix}rstLst/{page_num}/"
     return url
 
+def extract_result_count(soup: BeautifulSoup) -> int | None:
+    """
+    リストページの検索結果の総件数（「1～20 件 / 全 1,234 件」の全件数）を返す。表示がない場合はNone
+    """
+    numbers = soup.select('.c-page-count__num strong')
+    if not numbers:
+        return None
+    text = numbers[-1].get_text(strip=True).replace(',', '')
+    return int(text) if text.isdigit() else None
+
+def extract_sub_areas(soup: BeautifulSoup, prefecture_roman: str, area: str = '') -> list[str]:
+    """
+    リストページのエリアのリンクから、area の1つ下の階層のエリアコードのパスを出現順に返す
+
+    都道府県全体なら大エリア（例: 'A1301'）、大エリアなら小エリア（例: 'A1301/A130101'）を返す。
+
+    Args:
+        soup: リストページのBeautifulSoupオブジェクト（ページ全体を解析したもの）
+        prefecture_roman: 都道府県のローマ字表記
+        area: 現在のエリアコードのパス
+    """
+    codes = area.split('/') if area else []
+    if len(codes) >= len(AREA_CODE_PATTERNS):
+        return []
+    pattern = AREA_CODE_PATTERNS[len(codes)]
+    child = len(codes) + 1
+    areas: dict[str, None] = {}
+    for link in soup.find_all('a', href=True):
+        path = urlsplit(urljoin(BASE_URL, link['href'])).path
+        parts = path.strip('/').split('/')
+        # /{都道府県}/{現在のエリア}/{下の階層のエリア}/... のリンクのみ（店舗ページへのリンクは除く）
+        if len(parts) <= child or parts[0] != prefecture_roman or parts[1:child] != codes:
+            continue
+        if pattern.fullmatch(parts[child]) and not store_id_from_url(path):
+            areas['/'.join(parts[1:child + 1])] = None
+    return list(areas)
+
 def get_page_content(url: str) -> BeautifulSoup | None:
     """
     指定されたURLのページコンテンツを取得し、BeautifulSoupオブジェクトとして返す
@@ -41,79 +220,126 @@ def get_page_content(url: str) -> BeautifulSoup | None:
     Returns:
         BeautifulSoupオブジェクト、またはエラー時はNone
     """
-    try:
-        # robots.txt および利用規約を遵守し、適切なアクセス間隔を設ける
-        time.sleep(1) # 例: 1秒待機
-        response = requests.get(url)
+    # robots.txt および利用規約を遵守し、適切なアクセス間隔を設ける
+    return _fetch_page_content(url, _rate_limiter)
+
+def _download(url: str, limiter: HostRateLimiter, concurrency: AdaptiveConcurrency | None = None) -> bytes:
+    """
+    ページ本文を取得する。キャッシュが有効ならTTL内のエントリを返し、期限切れは条件付きGETで再検証する
+
+    ネットワークにアクセスする場合のみ limiter でアクセス間隔を制御する（HTTP クライアントの再試行も1回ごとに制御する）。
+    concurrency を指定すると、その枠を確保してから取得し、応答の状況（429/503・遅延）を反映させる。
+
+    Raises:
+        requests.exceptions.RequestException: 取得に失敗した場合
+    """
+    kind = page_kind(url)
+    with FETCH_SECONDS.time(kind=kind):
+        cache = get_cache()
+        entry = cache.lookup(url) if cache else None
+        if entry and entry.fresh:
+            PAGES.inc(kind=kind, source='cache')
+            return entry.body
+
+        with ExitStack() as stack:
+            if concurrency:
+                with RATE_LIMIT_WAIT_SECONDS.time():
+                    stack.enter_context(concurrency.slot())
+            # アクセス間隔は、再試行を含む試行ごとに HttpClient が limiter で確保する
+            response = get_client().get(
+                url,
+                headers=entry.conditional_headers() if entry else None,
+                observer=concurrency.record if concurrency else None,
+                limiter=limiter,
+            )
+        if entry and response.status_code == 304:
+            cache.mark_revalidated(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            PAGES.inc(kind=kind, source='revalidated')
+            return entry.body
         response.raise_for_status() # HTTPエラーが発生した場合に例外を発生させる
-        soup = BeautifulSoup(response.content, 'html.parser')
+        if cache:
+            cache.store(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        archive = get_archive()
+        if archive:
+            archive.store(url, response.content)
+        PAGES.inc(kind=kind, source='network')
+        return response.content
+
+def _fetch_page_content(url: str, limiter: HostRateLimiter, concurrency: AdaptiveConcurrency | None = None) -> BeautifulSoup | None:
+    """
+    ページを取得してパースする（アクセス間隔は limiter、同時リクエスト数は concurrency で制御する）
+    """
+    try:
+        content = _download(url, limiter, concurrency)
 
-        # 「検索結果なし」ページを判定
-        # セレクタによる判定
-        no_result_element = soup.select_one('.result-cassette__title--no-result')
-        if no_result_element and "見つかりませんでした" in no_result_element.get_text():
-            logging.info(f"No results found on page (detected by element): {url}")
+        # 「検索結果なし」ページの判定はリストページのみ、パース前のバイト列で行う
+        if page_kind(url) == 'list' and is_no_result_page(content):
+            logging.info(f"No results found on page: {url}")
             return None
-        
-        # ページ全体のテキストによる判定（フォールバック）
-        if "ご指定の条件に該当するお店は見つかりませんでした" in soup.get_text():
-            logging.info(f"No results found on page (detected by text): {url}")
-            return None
-            
-        return soup
+
+        return make_soup(content, url)
     except requests.exceptions.RequestException as e:
         logging.error(f"Error fetching {url}: {e}") # print から logging.error に変更
         return None
 
-def extract_store_urls(soup: BeautifulSoup) -> list[str]:
+def extract_store_listings(soup: BeautifulSoup) -> list[StoreListing]:
     """
-    リストページから個別の店舗ページのURLを抽出する
+    リストページから店舗ごとの表示内容（店舗URL・店名・エリア・ジャンル）を抽出する
     検索結果リスト領域（#js-RstListWrap）内のみを対象にする。
 
     Args:
         soup: リストページのBeautifulSoupオブジェクト
-    
+
     Returns:
-        店舗ページのURLのリスト
+        店舗ごとの StoreListing のリスト（リストページ上の順）
     """
-    store_urls: list[str] = []
+    listings: list[StoreListing] = []
     # リスト本体のラッパー内に限定して抽出（ランキング/広告等を除外）
     wrapper = soup.select_one('#js-RstListWrap') or soup.select_one('#js-rstlst-wrap')
     links_scope = wrapper if wrapper else soup  # ラッパーが無い場合はページ全体から抽出
     for link in links_scope.select('a.list-rst__rst-name-target'):
         href = link.get('href')
-        if href:
-            abs_url = urljoin(BASE_URL, href)
-            store_urls.append(abs_url)
-    return store_urls
+        if not href:
+            continue
+        # エリアとジャンルは店舗ごとの枠（カセット）内に「渋谷駅 250m / ラーメン、つけ麺」の形で表示される
+        cassette = link.find_parent(class_='list-rst')
+        area_genre = cassette.select_one('.list-rst__area-genre') if cassette else None
+        area, _, genre = (area_genre.get_text(' ', strip=True) if area_genre else '').partition('/')
+        listings.append(StoreListing(urljoin(BASE_URL, href), link.get_text(strip=True), area.strip(), genre.strip()))
+    return listings
+
+def extract_store_urls(soup: BeautifulSoup) -> list[str]:
+    """
+    リストページから個別の店舗ページのURLを抽出する
+    検索結果リスト領域（#js-RstListWrap）内のみを対象にする。
+
+    Args:
+        soup: リストページのBeautifulSoupオブジェクト
+    
+    Returns:
+        店舗ページのURLのリスト
+    """
+    return [listing.url for listing in extract_store_listings(soup)]
 
 from typing import Optional
 
-def extract_store_details(soup: BeautifulSoup) -> Optional[dict]:
+@EXTRACT_SECONDS.time()
+def extract_store_record(soup: BeautifulSoup) -> Optional[StoreRecord]:
     """
-    店舗ページから詳細情報を抽出する
+    店舗ページから詳細情報を抽出する（辞書を作らずに StoreRecord で返す）
 
     Args:
         soup: 店舗ページのBeautifulSoupオブジェクト
 
     Returns:
-        抽出された詳細情報の辞書
+        抽出された詳細情報、または無効なページの場合はNone
     """
-    details = {
-        '店名': '',
-        'ジャンル': '',
-        '住所': '',
-        '電話番号': '',
-        '予約・お問い合わせ': '',
-        'ホームページ': '',
-        '席数': ''
-    }
-    
     table = soup.find(id='contents-rstdata')
     if not table: # 必須テーブルがない場合は無効とする
         logging.warning("contents-rstdata div not found. Skipping this store.")
         return None
 
+    name = genre = address = phone = reservation = homepage = seats = ''
     ths = table.find_all('th')
     tds = table.find_all('td')
     
@@ -122,33 +348,91 @@ def extract_store_details(soup: BeautifulSoup) -> Optional[dict]:
         td_text = td.text.strip()
 
         if th_text == '店名':
-            details['店名'] = td_text
+            name = td_text
         elif th_text == 'ジャンル':
-            details['ジャンル'] = td_text
+            genre = td_text
         elif th_text == '住所':
             # 住所は最初の改行までを取得
-            details['住所'] = td_text.replace('\u3000', ' ').split('\n')[0]
+            address = td_text.replace('\u3000', ' ').split('\n')[0]
         elif th_text == '電話番号':
-            details['電話番号'] = td_text
+            phone = td_text
         elif th_text.replace('\n', '').replace(' ', '') == '予約・お問い合わせ': # 改行と空白を除去して比較
-             details['予約・お問い合わせ'] = td_text
+             reservation = td_text
         elif th_text == 'ホームページ':
-            details['ホームページ'] = td_text
+            homepage = td_text
         elif th_text == '席数':
             # 席数は最初のpタグのテキストを抽出
             p_tag = td.find('p')
             if p_tag:
-                details['席数'] = p_tag.text.strip()
+                seats = p_tag.text.strip()
             else:
-                details['席数'] = td_text.split('\n')[0] # pタグがない場合は既存ロジックを踏襲
+                seats = td_text.split('\n')[0] # pタグがない場合は既存ロジックを踏襲
         else:
             pass # その他の項目はスキップ
             
     # 最低限の必須チェック（店名が取得できない場合は無効）
-    if not details.get('店名') or details.get('店名').strip('- ').strip() == '':
+    if not name or name.strip('- ').strip() == '':
         logging.warning("Store name not found. Skipping this store.")
         return None
-    return details
+    # ジャンルは店舗間で同じ値が多いため、同じ文字列オブジェクトを共有する
+    return StoreRecord(name, sys.intern(genre), address, phone, reservation, homepage, seats)
+
+def extract_store_details(soup: BeautifulSoup) -> Optional[dict]:
+    """
+    店舗ページから詳細情報を抽出する
+
+    Args:
+        soup: 店舗ページのBeautifulSoupオブジェクト
+
+    Returns:
+        抽出された詳細情報の辞書
+    """
+    record = extract_store_record(soup)
+    return record.as_dict() if record else None
+
+def _parse_store_page(content: bytes, url: str, backend: str) -> tuple[StoreRecord | None, float, float]:
+    """
+    店舗ページをパースして詳細情報を抽出し、解析と抽出の所要時間も返す（解析用のワーカープロセスで実行される）
+
+    ワーカープロセスで記録したメトリクスは呼び出し元に届かないため、所要時間は呼び出し元で記録する（_observe_parse）。
+    結果はキーを持たない StoreRecord で返し、プロセス間で受け渡すデータを小さくする。
+
+    Args:
+        content: レスポンス本文
+        url: 店舗ページのURL
+        backend: 使用するパーサーバックエンド（呼び出し元プロセスの設定を引き継ぐ）
+    """
+    if _parser_backend != backend:
+        set_parser_backend(backend)
+    started = time.perf_counter()
+    soup = make_soup(content, url)
+    parsed = time.perf_counter()
+    record = extract_store_record(soup)
+    return record, parsed - started, time.perf_counter() - parsed
+
+def _observe_parse(parse_seconds: float, extract_seconds: float) -> None:
+    """ワーカープロセスで行った店舗ページの解析・抽出の所要時間を記録する"""
+    PARSE_SECONDS.observe(parse_seconds, kind='store')
+    EXTRACT_SECONDS.observe(extract_seconds)
+
+_parse_pool: ProcessPoolExecutor | None = None
+_parse_pool_workers = 0
+_parse_pool_lock = threading.Lock()
+
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    店舗ページの解析に使うプロセスプールを返す（プロセス内で共有し、起動コストは初回のみ）
+
+    スレッドを使う呼び出し元（Streamlit やジョブキュー）から安全に起動できるよう、spawn で子プロセスを作る。
+    """
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_workers != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _parse_pool_workers = workers
+        return _parse_pool
 
 def scrape_tabelog(prefecture_jp: str, genre_jp: str, max_pages: int = 60):
     """
@@ -163,64 +447,196 @@ def scrape_tabelog(prefecture_jp: str, genre_jp: str, max_pages: int = 60):
     Yields:
         dict: 収集した店舗情報の辞書
     """
-    prefecture_roman = convert_prefecture_to_roman(prefecture_jp)
-    genre_roman = convert_genre_to_roman(genre_jp)
-
-    if not prefecture_roman:
-        logging.warning(f"Unknown prefecture: {prefecture_jp}")
-        return
+    yield from scrape_tabelog_range(prefecture_jp, genre_jp, 1, max_pages)
 
+def _resolve_page_range(start_page: int, end_page: int) -> range | None:
+    """
+    ページ範囲を 1〜60 に丸めて返す。不正な範囲の場合は None
+    """
+    start = max(1, int(start_page))
+    end = min(60, int(end_page))
+    if end < start:
+        logging.warning(f"Invalid page range: {start_page}..{end_page}")
+        return None
+    return range(start, end + 1)
 
-    for page_num in range(1, min(max_pages, 60) + 1):  # NOTE: URLフィルタと住所検証で無関係店舗を除外
-        search_url = build_search_url(prefecture_roman, genre_roman, page_num)
-        logging.info(f"Scraping page {page_num}: {search_url}")
+def _filter_store_listings(list_soup: BeautifulSoup, prefecture_roman: str) -> list[StoreListing]:
+    """
+    リストページから店舗の表示内容を抽出し、重複排除と都道府県ルートでの絞り込みを行う
+    """
+    listings: list[StoreListing] = []
+    seen: set[str] = set()
+    for listing in extract_store_listings(list_soup):
+        # 重複排除し、選択した都道府県に属するURLのみ許可
+        if listing.url not in seen and listing.url.startswith(f"{BASE_URL}{prefecture_roman}/"):
+            seen.add(listing.url)
+            listings.append(listing)
+    return listings
+
+def _listing_in_prefecture(listing: StoreListing, prefecture_jp: str) -> bool:
+    """
+    リストページのエリア表示から、店舗ページを取得する前に他の都道府県の店舗を除外する
 
-        list_soup = get_page_content(search_url)
-        if not list_soup:
-            logging.info(f"Failed to get content or no results found for page {page_num}. Stopping.")
-            break
+    エリアに [神奈川] のような都道府県の接頭辞がある場合のみ判定し、ない場合は店舗ページの住所で判定する。
+    """
+    m = AREA_PREFECTURE_PATTERN.match(listing.area)
+    if not prefecture_jp or not m:
+        return True
+    area_prefecture = m.group(1).strip()
+    # 接頭辞は「東京」「大阪」のように末尾の都・府・県を1文字だけ省略して表示される（京都府 → 京都）
+    short = prefecture_jp[:-1] if prefecture_jp[-1] in '都府県' else prefecture_jp
+    if area_prefecture in (prefecture_jp, short):
+        return True
+    logging.debug(f"Skipping store outside prefecture by list-page area: {listing.area} ({listing.url})")
+    STORES.inc(result='prefiltered')
+    return False
+
+def _extract_store(store_url: str, store_soup: BeautifulSoup | None, index: StoreIndex | None = None) -> Optional[dict]:
+    """
+    取得した店舗ページから詳細情報を抽出する（インデックスがあれば抽出結果を記録する）
 
-        store_urls = list(dict.fromkeys(extract_store_urls(list_soup)))  # 重複排除
-        # 都道府県ルート配下のみ許可
-        store_urls = [u for u in store_urls if u.startswith(f"{BASE_URL}{prefecture_roman}/")] 
-        if not store_urls:
-            logging.info(f"No store URLs found on page {page_num}.")
-            # ページが存在しない場合の対応 (例: 検索結果の最終ページ)
-            logging.info("Assuming end of search results.")
-            break
+    Returns:
+        店舗情報の辞書、または取得失敗・無効なページの場合はNone
+    """
+    if not store_soup:
+        logging.error(f"店舗ページの取得に失敗しました: {store_url}")
+        STORES.inc(result='failed')
+        return None
+    return _accept_store(store_url, extract_store_details(store_soup), index)
 
-        for store_url in store_urls:
-            logging.info(f"  Scraping store page: {store_url}")
-            store_soup = get_page_content(store_url)
-            if not store_soup:
-                logging.error(f"店舗ページの取得に失敗しました: {store_url}")
-                continue
-            store_details = extract_store_details(store_soup)
-            if not store_details:
-                logging.info(f"店舗ページの有効なデータが見つかりませんでした: {store_url}")
-                continue
-            # 住所に都道府県名を含むもののみ許可（無関係な候補を排除）
-            addr = (store_details.get('住所') or '').strip()
-            if prefecture_jp and (prefecture_jp not in addr):
-                logging.info(f"Filtering out store outside prefecture: {addr}")
-                continue
-            yield store_details
+def _accept_store(store_url: str, store_details: Optional[dict], index: StoreIndex | None = None) -> Optional[dict]:
+    """
+    抽出した店舗情報を検証する（インデックスがあれば抽出結果を記録する）
 
-    # ジェネレーターなので return は不要
+    Returns:
+        店舗情報の辞書、または無効なページの場合はNone
+    """
+    if not store_details:
+        logging.debug(f"店舗ページの有効なデータが見つかりませんでした: {store_url}")
+        STORES.inc(result='invalid')
+        return None
+    if index:
+        index.record(store_url, store_details)
+    return store_details
 
-def scrape_tabelog_range(prefecture_jp: str, genre_jp: str, start_page: int, end_page: int):
+def _in_prefecture(store_details: Optional[dict], prefecture_jp: str) -> Optional[dict]:
+    """
+    住所に都道府県名を含む店舗情報のみ返す（無関係な候補を排除）
+    """
+    if not store_details:
+        return None
+    with FILTER_SECONDS.time():
+        addr = (store_details.get('住所') or '').strip()
+        if prefecture_jp and (prefecture_jp not in addr):
+            logging.debug(f"Filtering out store outside prefecture: {addr}")
+            STORES.inc(result='filtered')
+            return None
+    STORES.inc(result='ok')
+    return store_details
+
+def scrape_tabelog_range(
+    prefecture_jp: str,
+    genre_jp: str,
+    start_page: int,
+    end_page: int,
+    index: StoreIndex | None = None,
+    progress=None,
+    area: str = '',
+    limiter: HostRateLimiter | None = None,
+    **scrape_kwargs,
+):
     """
     食べログから店舗情報をスクレイピングするジェネレーター関数（ページ範囲指定）
 
+    scrape_tabelog_range_concurrent と同じ処理で、アクセス間隔は既定でモジュール共有のレートリミッター
+    （1秒に1リクエスト）で制御する。
+
     Args:
         prefecture_jp: 都道府県の漢字表記
         genre_jp: ジャンルの漢字表記
         start_page: 開始ページ（1以上）
         end_page: 終了ページ（開始以上、最大60）
+        index: 指定するとインクリメンタル取得になる（鮮度内に取得済みの店舗はインデックスから返す）
+        progress: 進捗の記録先（crawl_job.CrawlJob など）。is_done(store_url) が真の店舗は取得せず、
+            店舗情報を抽出できた店舗ごとに store_done(page_num, store_url, store_details)
+            （都道府県外の店舗は store_details が None）、取得の失敗などで抽出できなかった店舗ごとに
+            store_failed(page_num, store_url)、ページごとに page_done(page_num) を呼ぶ
+        area: エリアコードのパス（例: 'A1301/A130101'。空なら都道府県全体。planner の分割で使う）
+        limiter: アクセス間隔を制御するレートリミッター（省略時はモジュール共有のリミッター）
+        scrape_kwargs: scrape_tabelog_range_concurrent に渡す追加の引数（max_in_flight, parse_workers など。
+            parse_workers の既定は 0 で、解析プロセスを使わない）
 
     Yields:
         dict: 収集した店舗情報の辞書
     """
+    yield from scrape_tabelog_range_concurrent(prefecture_jp, genre_jp, start_page, end_page, index=index,
+                                               progress=progress, limiter=limiter or _rate_limiter, area=area,
+                                               **scrape_kwargs)
+
+async def async_scrape_tabelog_range(
+    prefecture_jp: str,
+    genre_jp: str,
+    start_page: int,
+    end_page: int,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    index: StoreIndex | None = None,
+    progress=None,
+    limiter: HostRateLimiter | None = None,
+    list_lookahead: int = DEFAULT_LIST_LOOKAHEAD,
+    concurrency: AdaptiveConcurrency | None = None,
+    adaptive: bool = True,
+    area: str = '',
+    retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+    retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+    dead_letters: DeadLetters | None = None,
+    parse_workers: int = DEFAULT_PARSE_WORKERS,
+    retry_stores: list[tuple[int, str]] | None = None,
+    first_page: list[StoreListing] | None = None,
+    ordered: bool = True,
+):
+    """
+    scrape_tabelog_range の非同期版。店舗ページを並行して取得する非同期ジェネレーター
+
+    アクセス間隔は固定の待機ではなくホスト単位のトークンバケットで制御し、
+    同時に実行するリクエスト数は max_in_flight を上限に AdaptiveConcurrency で自動調整する。
+    リストページは list_lookahead ページ先まで先読みし、その店舗ページの取得も先に始める。
+    店舗ページの解析と抽出は parse_workers 個のワーカープロセスで行い（GIL を保持する解析を取得と並行させる）、
+    店舗情報は既定でリストページ上の順序どおりに yield し、ordered=False なら取得・解析が終わった順に yield する。
+    取得に失敗した店舗ページは、全ページを返し終えた後にまとめて再試行し（retry.RetryScheduler）、取得できた店舗を続けて yield する。
+    店舗情報を抽出できた店舗は、以前に失敗していれば失敗一覧から削除する。
+
+    Args:
+        prefecture_jp: 都道府県の漢字表記
+        genre_jp: ジャンルの漢字表記
+        start_page: 開始ページ（1以上）
+        end_page: 終了ページ（開始以上、最大60）
+        requests_per_second: ホストあたりの1秒間のリクエスト数
+        max_in_flight: 同時に実行するリクエスト数の上限
+        index: 指定するとインクリメンタル取得になる（鮮度内に取得済みの店舗はインデックスから返す）
+        progress: 進捗の記録先（scrape_tabelog_range と同じ）
+        limiter: 共有するレートリミッター（複数の取得を合計でレート制限する場合に指定。
+            省略時は requests_per_second で新たに作成する）
+        list_lookahead: 処理中のページより先に取得しておくリストページ数（0 なら先読みしない）
+        concurrency: 共有する同時リクエスト数のコントローラー（省略時は adaptive に従う）
+        adaptive: True なら max_in_flight を上限として同時リクエスト数を応答の状況に応じて自動調整する
+            （429/503 や遅延の増加で減らす）。False なら常に max_in_flight 件まで並行する
+        area: エリアコードのパス（scrape_tabelog_range と同じ）
+        retry_attempts: 取得に失敗した店舗ページを最後に再試行する回数（0 なら再試行しない）
+        retry_backoff: 1回目の再試行までの待ち時間（秒、回ごとに2倍）
+        dead_letters: 再試行しても取得できなかった店舗の記録先（省略時は retry.get_dead_letters()）
+        parse_workers: 店舗ページの解析に使うプロセス数（0 ならプロセスを使わず、取得したスレッドで解析する。
+            spawn で起動するため、スクリプトから呼ぶ場合は if __name__ == '__main__': の中で実行する）
+        retry_stores: 以前の実行で失敗した店舗の (ページ番号, 店舗URL) のリスト。ページ範囲の取得後の再試行に加える
+            （ページ範囲が空でも再試行だけを行う。ジョブの再開に使う）
+        first_page: 取得済みの start_page のリストページの店舗一覧（planner.plan_partitions の first_pages）。
+            指定するとそのリストページは取得しない
+        ordered: True ならリストページ上の順序どおりに返す。False なら完了した順に返し、
+            取得の遅い店舗の後ろで他の店舗を待たせない（結果の順序は実行ごとに変わる）
+
+    Yields:
+        dict: 収集した店舗情報の辞書（extract_store_details と同じ形式）
+    """
     prefecture_roman = convert_prefecture_to_roman(prefecture_jp)
     genre_roman = convert_genre_to_roman(genre_jp)
 
@@ -228,45 +644,328 @@ def scrape_tabelog_range(prefecture_jp: str, genre_jp: str, start_page: int, end
         logging.warning(f"Unknown prefecture: {prefecture_jp}")
         return
 
-    start = max(1, int(start_page))
-    end = min(60, int(end_page))
-    if end < start:
-        logging.warning(f"Invalid page range: {start_page}..{end_page}")
+    if retry_stores and start_page > end_page:
+        # 未完了のページはなく、以前に失敗した店舗の再試行だけを行う
+        pages = range(0)
+    else:
+        pages = _resolve_page_range(start_page, end_page)
+        if pages is None:
+            return
+
+    if limiter is None:
+        limiter = HostRateLimiter(requests_per_second, burst=concurrent_burst(requests_per_second, max_in_flight))
+    if concurrency is None and adaptive:
+        concurrency = AdaptiveConcurrency(max_in_flight)
+    in_flight = asyncio.Semaphore(max(1, int(max_in_flight)))
+    retries = RetryScheduler(prefecture_jp, genre_jp, retry_attempts, retry_backoff, dead_letters)
+    for page_num, store_url in retry_stores or ():
+        retries.schedule(page_num, store_url)
+    pool = get_parse_pool(parse_workers) if parse_workers > 0 else None
+    loop = asyncio.get_running_loop()
+
+    async def fetch_store(page_num: int, store_url: str) -> Optional[dict]:
+        # キャッシュヒット時は待機しないよう、アクセス間隔の制御はネットワーク取得の直前で行う
+        if pool is None:
+            async with in_flight:
+                store_soup = await asyncio.to_thread(_fetch_page_content, store_url, limiter, concurrency)
+            if store_soup is None:
+                retries.failed(page_num, store_url)
+            return _extract_store(store_url, store_soup, index)
+        async with in_flight:
+            try:
+                content = await asyncio.to_thread(_download, store_url, limiter, concurrency)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error fetching {store_url}: {e}")
+                content = None
+        if content is None:
+            retries.failed(page_num, store_url)
+            return _extract_store(store_url, None)
+        # 解析はワーカープロセスで行い、同時リクエスト数の枠は解析の間に次の取得へ回す
+        record, parse_seconds, extract_seconds = await loop.run_in_executor(
+            pool, _parse_store_page, content, store_url, _parser_backend)
+        _observe_parse(parse_seconds, extract_seconds)
+        return _accept_store(store_url, record.as_dict() if record else None, index)
+
+    async def scrape_store(page_num: int, store_url: str) -> tuple[Optional[dict], bool]:
+        # (都道府県内の店舗情報, 店舗情報を抽出できたか) を返す
+        logging.debug(f"  Scraping store page: {store_url}")
+        store_details = index.get_fresh(store_url) if index else None
+        if store_details is None:
+            store_details = await fetch_store(page_num, store_url)
+        else:
+            STORES.inc(result='index')
+        return _in_prefecture(store_details, prefecture_jp), store_details is not None
+
+    def store_finished(page_num: int, store_url: str, store_details: Optional[dict], extracted: bool) -> None:
+        # 抽出できた店舗のみ処理済みとし、以前の失敗の記録を消す
+        if extracted:
+            retries.succeeded(store_url)
+        if not progress:
+            return
+        if extracted:
+            progress.store_done(page_num, store_url, store_details)
+        else:
+            progress.store_failed(page_num, store_url)
+
+    # 消費中のページに加えて list_lookahead ページ先までリストページを取得してよい
+    # リストページの取得（discover_pages）と店舗の返却の間は、同じ数までの有限のキューでつなぐ
+    ahead = asyncio.Semaphore(1 + max(0, int(list_lookahead)))
+    found: asyncio.Queue = asyncio.Queue(maxsize=1 + max(0, int(list_lookahead)))
+    pending: set[asyncio.Task] = set()
+
+    async def discover_pages():
+        # リストページは順に取得し、店舗情報を yield している間に次のページを先読みする
+        try:
+            for page_num in pages:  # NOTE: URLフィルタと住所検証で無関係店舗を除外
+                await ahead.acquire()
+                search_url = build_search_url(prefecture_roman, genre_roman, page_num, area)
+                logging.debug(f"Scraping page {page_num}: {search_url}")
+
+                if first_page is not None and page_num == pages.start:
+                    # 分割の確認で取得済みのリストページは取得し直さない
+                    listings = first_page
+                else:
+                    # 店舗ページの取得待ちの後ろに並ばないよう、リストページは同時リクエスト数の枠の外で取得する
+                    list_soup = await asyncio.to_thread(_fetch_page_content, search_url, limiter, concurrency)
+                    if not list_soup:
+                        logging.info(f"Failed to get content or no results found for page {page_num}. Stopping.")
+                        break
+                    listings = _filter_store_listings(list_soup, prefecture_roman)
+                if not listings:
+                    logging.info(f"No store URLs found on page {page_num}.")
+                    logging.info("Assuming end of search results.")
+                    break
+                store_urls = [l.url for l in listings if _listing_in_prefecture(l, prefecture_jp)]
+
+                if progress:
+                    store_urls = [u for u in store_urls if not progress.is_done(u)]
+                # 先読みした時点で店舗ページの取得を始め、ページの境目で取得が途切れないようにする
+                page_tasks = [asyncio.create_task(scrape_store(page_num, u)) for u in store_urls]
+                pending.update(page_tasks)
+                await found.put((page_num, store_urls, page_tasks))
+        except Exception as e:
+            await found.put(e)
+            return
+        # 最終ページ（検索結果なし）に達したら、それより前のページを返し終えた時点で終了する
+        await found.put(None)
+
+    async def next_page():
+        # 次のページの (ページ番号, 店舗URL, タスク)。全ページを取得し終えたら None
+        item = await found.get()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    def page_finished(page_num: int) -> None:
+        if progress:
+            progress.page_done(page_num)
+        ahead.release()
+
+    async def stores_in_order():
+        # リストページ上の順序どおりに返す
+        while (item := await next_page()) is not None:
+            page_num, store_urls, page_tasks = item
+            for store_url, task in zip(store_urls, page_tasks):
+                store_details, extracted = await task
+                pending.discard(task)
+                store_finished(page_num, store_url, store_details, extracted)
+                if store_details:
+                    yield store_details
+            page_finished(page_num)
+
+    async def stores_as_completed():
+        # 取得・解析が終わった店舗から順に返す。ページの完了は、中断後の再開位置がずれないよう
+        # 前のページがすべて終わってからページ順に記録する
+        outstanding: dict[asyncio.Task, tuple[int, str]] = {}
+        remaining: dict[int, int] = {}
+        unfinished_pages: deque[int] = deque()
+        getter = asyncio.create_task(next_page())
+        try:
+            while getter is not None or outstanding:
+                done, _ = await asyncio.wait({*outstanding, *([getter] if getter else [])},
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    item, getter = getter.result(), None
+                    if item is not None:
+                        page_num, store_urls, page_tasks = item
+                        unfinished_pages.append(page_num)
+                        remaining[page_num] = len(page_tasks)
+                        outstanding.update((task, (page_num, u)) for u, task in zip(store_urls, page_tasks))
+                        getter = asyncio.create_task(next_page())
+                for task in done & outstanding.keys():
+                    page_num, store_url = outstanding.pop(task)
+                    pending.discard(task)
+                    remaining[page_num] -= 1
+                    store_details, extracted = task.result()
+                    store_finished(page_num, store_url, store_details, extracted)
+                    if store_details:
+                        yield store_details
+                while unfinished_pages and remaining[unfinished_pages[0]] == 0:
+                    page_finished(unfinished_pages.popleft())
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    feeder = asyncio.create_task(discover_pages())
+    try:
+        async with aclosing(stores_in_order() if ordered else stores_as_completed()) as stores:
+            async for store_details in stores:
+                yield store_details
+
+        # 取得に失敗した店舗ページは、全ページを返し終えてから間隔を空けて取得し直す
+        retried = retries.retry(lambda url: _fetch_page_content(url, limiter, concurrency), workers=max_in_flight)
+        while (result := await asyncio.to_thread(next, retried, None)) is not None:
+            page_num, store_url, store_soup = result
+            extracted = _extract_store(store_url, store_soup, index)
+            store_details = _in_prefecture(extracted, prefecture_jp)
+            store_finished(page_num, store_url, store_details, extracted is not None)
+            if store_details:
+                yield store_details
+    finally:
+        # 途中で中断された場合に、先読み中のページと取得中のタスクを片付ける
+        feeder.cancel()
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(feeder, *pending, return_exceptions=True)
+
+def scrape_tabelog_range_concurrent(
+    prefecture_jp: str,
+    genre_jp: str,
+    start_page: int,
+    end_page: int,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    index: StoreIndex | None = None,
+    progress=None,
+    limiter: HostRateLimiter | None = None,
+    list_lookahead: int = DEFAULT_LIST_LOOKAHEAD,
+    concurrency: AdaptiveConcurrency | None = None,
+    adaptive: bool = True,
+    area: str = '',
+    retry_attempts: int = DEFAULT_RETRY_ATTEMPTS,
+    retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+    dead_letters: DeadLetters | None = None,
+    parse_workers: int = 0,
+    retry_stores: list[tuple[int, str]] | None = None,
+    first_page: list[StoreListing] | None = None,
+    ordered: bool = True,
+):
+    """
+    async_scrape_tabelog_range を通常のジェネレーターとして利用するためのラッパー
+
+    引数と yield する値は async_scrape_tabelog_range と同じ。
+    scrape_tabelog_range と同様に for 文で消費できる。
+    ただし parse_workers の既定は 0（解析プロセスを使わない）で、if __name__ == '__main__': のないスクリプトからも呼べる。
+    解析プロセスを使う場合は parse_workers=DEFAULT_PARSE_WORKERS などを指定する。
+    """
+    loop = asyncio.new_event_loop()
+    agen = async_scrape_tabelog_range(
+        prefecture_jp, genre_jp, start_page, end_page,
+        requests_per_second=requests_per_second,
+        max_in_flight=max_in_flight,
+        index=index,
+        progress=progress,
+        limiter=limiter,
+        list_lookahead=list_lookahead,
+        concurrency=concurrency,
+        adaptive=adaptive,
+        area=area,
+        retry_attempts=retry_attempts,
+        retry_backoff=retry_backoff,
+        dead_letters=dead_letters,
+        parse_workers=parse_workers,
+        retry_stores=retry_stores,
+        first_page=first_page,
+        ordered=ordered,
+    )
+    try:
+        while True:
+            try:
+                store_details = loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+            yield store_details
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+def scrape_tabelog_list(
+    prefecture_jp: str,
+    genre_jp: str,
+    start_page: int,
+    end_page: int,
+    requests_per_second: float = DEFAULT_REQUESTS_PER_SECOND,
+    progress=None,
+    limiter: HostRateLimiter | None = None,
+    concurrency: AdaptiveConcurrency | None = None,
+    area: str = '',
+    first_page: list[StoreListing] | None = None,
+):
+    """
+    リストページだけを取得し、リストに表示される項目を返すジェネレーター関数（店舗ページは取得しない）
+
+    1ページで最大20店舗分が得られるため、店舗ページも取得する scrape_tabelog_range に比べてリクエスト数は約 1/20 になる。
+    住所がないため、都道府県の絞り込みは店舗URLとエリア表示でのみ行う。
+
+    Args:
+        prefecture_jp: 都道府県の漢字表記
+        genre_jp: ジャンルの漢字表記
+        start_page: 開始ページ（1以上）
+        end_page: 終了ページ（開始以上、最大60）
+        requests_per_second: ホストあたりの1秒間のリクエスト数
+        progress: 進捗の記録先（scrape_tabelog_range と同じ）
+        limiter: 共有するレートリミッター（省略時は requests_per_second で新たに作成する）
+        concurrency: 共有する同時リクエスト数のコントローラー
+        area: エリアコードのパス（scrape_tabelog_range と同じ）
+        first_page: 取得済みの start_page のリストページの店舗一覧（scrape_tabelog_range_concurrent と同じ）
+
+    Yields:
+        dict: 店名・ジャンル・エリア・店舗URL の辞書（records.LISTING_FIELDS）
+    """
+    prefecture_roman = convert_prefecture_to_roman(prefecture_jp)
+    genre_roman = convert_genre_to_roman(genre_jp)
+
+    if not prefecture_roman:
+        logging.warning(f"Unknown prefecture: {prefecture_jp}")
         return
 
-    for page_num in range(start, end + 1):  # NOTE: URLフィルタと住所検証で無関係店舗を除外
-        search_url = build_search_url(prefecture_roman, genre_roman, page_num)
-        logging.info(f"Scraping page {page_num}: {search_url}")
+    pages = _resolve_page_range(start_page, end_page)
+    if pages is None:
+        return
 
-        list_soup = get_page_content(search_url)
-        if not list_soup:
-            logging.info(f"Failed to get content or no results found for page {page_num}. Stopping.")
-            break
+    if limiter is None:
+        limiter = HostRateLimiter(requests_per_second)
 
-        store_urls = list(dict.fromkeys(extract_store_urls(list_soup)))  # 重複排除
-        # 選択した都道府県に属するURLのみ許可
-        store_urls = [u for u in store_urls if u.startswith(f"{BASE_URL}{prefecture_roman}/")] 
-        if not store_urls:
+    for page_num in pages:
+        if first_page is not None and page_num == pages.start:
+            # 分割の確認で取得済みのリストページは取得し直さない
+            listings = first_page
+        else:
+            search_url = build_search_url(prefecture_roman, genre_roman, page_num, area)
+            logging.debug(f"Scraping list page {page_num}: {search_url}")
+            list_soup = _fetch_page_content(search_url, limiter, concurrency)
+            if not list_soup:
+                logging.info(f"Failed to get content or no results found for page {page_num}. Stopping.")
+                break
+            listings = _filter_store_listings(list_soup, prefecture_roman)
+        if not listings:
             logging.info(f"No store URLs found on page {page_num}.")
             logging.info("Assuming end of search results.")
             break
 
-        for store_url in store_urls:
-            logging.info(f"  Scraping store page: {store_url}")
-            store_soup = get_page_content(store_url)
-            if not store_soup:
-                logging.error(f"店舗ページの取得に失敗しました: {store_url}")
-                continue
-            store_details = extract_store_details(store_soup)
-            if not store_details:
-                logging.info(f"店舗ページの有効なデータが見つかりませんでした: {store_url}")
+        for listing in listings:
+            if progress and progress.is_done(listing.url):
                 continue
-            # 住所に都道府県名を含むもののみ許可（無関係な候補を排除）
-            addr = (store_details.get('住所') or '').strip()
-            if prefecture_jp and (prefecture_jp not in addr):
-                logging.info(f"Filtering out store outside prefecture: {addr}")
-                continue
-            yield store_details
+            record = listing.as_dict() if _listing_in_prefecture(listing, prefecture_jp) else None
+            if record:
+                STORES.inc(result='ok')
+            if progress:
+                progress.store_done(page_num, listing.url, record)
+            if record:
+                yield record
+        if progress:
+            progress.page_done(page_num)
 
 if __name__ == '__main__':
     # テスト実行用のコードなど
@@ -276,4 +975,4 @@ if __name__ == '__main__':
     # data_list = list(data_generator) # ジェネレーターからリストに変換
     # df = pd.DataFrame(data_list)
     # print(df)
-    pass
\ No newline at end of file
+    pass
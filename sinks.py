@@ -0,0 +1,253 @@
+import csv
+import json
+import os
+import sqlite3
+
+from records import ColumnarAccumulator
+
+# Parquet の1行グループあたりの行数
+DEFAULT_ROW_GROUP_SIZE = 5000
+# SQLite 出力のテーブル名と、何行ごとにコミットするか（コミット済みの行は実行中でも読める）
+RESULT_TABLE = 'results'
+DEFAULT_COMMIT_ROWS = 100
+# CSV / Parquet でリストの値（一致した検索など）を1つの文字列にする際の区切り
+LIST_SEPARATOR = ' | '
+
+
+def flatten_record(record: dict) -> dict:
+    """リストの値を LIST_SEPARATOR で連結した文字列にする（JSONL 以外の出力用）"""
+    if not any(isinstance(value, list) for value in record.values()):
+        return record
+    return {key: LIST_SEPARATOR.join(value) if isinstance(value, list) else value for key, value in record.items()}
+
+
+def _quote(name: str) -> str:
+    """SQLite の識別子（列名）として引用符で囲む"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class CsvSink:
+    """
+    店舗情報を1行ずつCSVに追記する出力先
+
+    列は最初のレコードのキー順で決まる。出力形式は DataFrame.to_csv(index=False) と同じ（UTF-8、LF改行）。
+
+    Args:
+        path: 出力ファイルのパス
+        fieldnames: 列名（省略時は最初のレコードから決める）
+    """
+
+    def __init__(self, path: str, fieldnames: list[str] | None = None):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8', newline='')
+        self._writer = None
+
+    def write(self, record: dict) -> None:
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(record.keys())
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, lineterminator='\n')
+            self._writer.writeheader()
+        self._writer.writerow(flatten_record(record))
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class JsonlSink:
+    """
+    店舗情報を1行1レコードのJSONで追記する出力先
+
+    Args:
+        path: 出力ファイルのパス
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, record: dict) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class ParquetSink:
+    """
+    店舗情報を行グループ単位でParquetに書き出す出力先（要 pyarrow）
+
+    row_group_size 行たまるごとに1つの行グループとして書き出すため、メモリ使用量は一定に保たれる。
+    列は文字列型で、ジャンルなど値の種類が少ない列（records.CATEGORY_FIELDS）は辞書エンコードする。
+    列名は最初のレコードのキー順で決まる。
+
+    Args:
+        path: 出力ファイルのパス
+        row_group_size: 1行グループあたりの行数
+    """
+
+    def __init__(self, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError('Parquet output requires pyarrow to be installed') from e
+        self.path = path
+        self.row_group_size = row_group_size
+        self.count = 0
+        self._buffer = ColumnarAccumulator()
+        self._writer = None
+
+    @property
+    def fieldnames(self) -> list[str] | None:
+        return self._buffer.fieldnames
+
+    def write(self, record: dict) -> None:
+        self._buffer.append(flatten_record(record))
+        self.count += 1
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        import pyarrow.parquet as pq
+
+        if not len(self._buffer):
+            return
+        table = self._buffer.to_arrow()
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+        self._buffer.clear()
+
+    def close(self) -> None:
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SqliteSink:
+    """
+    店舗情報を SQLite のテーブル（RESULT_TABLE）に追記する出力先
+
+    列は最初のレコードのキー順で決まり、行の順序は rowid で保たれる。
+    commit_rows 行ごとにコミットするため、書き込み中でも result_store.ResultStore から読み出せる。
+    既存のファイルに書く場合はテーブルを作り直す（CsvSink がファイルを上書きするのと同じ）。
+
+    Args:
+        path: 出力ファイルのパス
+        fieldnames: 列名（省略時は最初のレコードから決める）
+        commit_rows: 何行ごとにコミットするか
+    """
+
+    def __init__(self, path: str, fieldnames: list[str] | None = None, commit_rows: int = DEFAULT_COMMIT_ROWS):
+        self.path = path
+        self.fieldnames = fieldnames
+        self.commit_rows = commit_rows
+        self.count = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'DROP TABLE IF EXISTS {RESULT_TABLE}')
+        self._conn.commit()
+        self._insert: str | None = None
+
+    def write(self, record: dict) -> None:
+        if self._insert is None:
+            self.fieldnames = self.fieldnames or list(record.keys())
+            columns = ', '.join(_quote(name) for name in self.fieldnames)
+            self._conn.execute(f'CREATE TABLE {RESULT_TABLE} ({columns})')
+            self._insert = f"INSERT INTO {RESULT_TABLE} VALUES ({', '.join('?' * len(self.fieldnames))})"
+        record = flatten_record(record)
+        self._conn.execute(self._insert, [record.get(name) for name in self.fieldnames])
+        self.count += 1
+        if self.count % self.commit_rows == 0:
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+SINKS = {
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.parquet': ParquetSink,
+    '.sqlite': SqliteSink,
+}
+
+
+def open_sink(path: str):
+    """
+    拡張子（.csv / .jsonl / .parquet / .sqlite）に応じた出力先を開く
+
+    Raises:
+        ValueError: 未対応の拡張子の場合
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in SINKS:
+        raise ValueError(f"Unsupported output format: {path} (choose from {', '.join(SINKS)})")
+    return SINKS[ext](path)
+
+
+def write_frame(frame, path: str) -> None:
+    """
+    DataFrame を拡張子（.csv / .jsonl / .parquet / .sqlite）に応じた形式で書き出す（各出力先と同じ形式）
+
+    Raises:
+        ValueError: 未対応の拡張子の場合
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        frame.to_csv(path, index=False, encoding='utf-8', lineterminator='\n')
+    elif ext == '.jsonl':
+        frame.to_json(path, orient='records', lines=True, force_ascii=False)
+    elif ext == '.parquet':
+        frame.to_parquet(path, index=False)
+    elif ext == '.sqlite':
+        with sqlite3.connect(path) as conn:
+            frame.to_sql(RESULT_TABLE, conn, if_exists='replace', index=False)
+        conn.close()
+    else:
+        raise ValueError(f"Unsupported output format: {path} (choose from {', '.join(SINKS)})")
+
+
+def write_records(records, sink):
+    """
+    レコードを出力先に書き込みながら、そのまま yield する（進捗表示と書き込みを同時に行うため）
+
+    Args:
+        records: 店舗情報の辞書を返すイテラブル（scrape_tabelog_range など）
+        sink: 出力先
+
+    Yields:
+        dict: 書き込んだ店舗情報の辞書
+    """
+    for record in records:
+        sink.write(record)
+        yield record
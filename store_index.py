@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+# 店舗を再取得するまでの既定の鮮度（秒）。週次の定期実行では前回分をそのまま使う
+DEFAULT_FRESHNESS = 7 * 24 * 60 * 60
+
+# 店舗ページのパス末尾の店舗ID（例: /tokyo/A1301/A130101/13xxxxxx/）
+_STORE_ID_RE = re.compile(r'/(\d{8})/?$')
+
+
+def store_id_from_url(url: str) -> str | None:
+    """
+    店舗ページのURLから食べログの店舗IDを取り出す
+
+    Args:
+        url: 店舗ページのURL（パスのみでもよい）
+
+    Returns:
+        店舗ID、または店舗ページのURLでない場合はNone
+    """
+    m = _STORE_ID_RE.search(urlsplit(url).path)
+    return m.group(1) if m else None
+
+
+def content_hash(details: dict) -> str:
+    """抽出した店舗情報のハッシュ（項目の順序に依存しない）"""
+    payload = json.dumps(details, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class StoreIndex:
+    """
+    店舗IDをキーに、最終取得時刻・抽出結果・そのハッシュを保存する永続インデックス
+
+    インクリメンタル取得で使う。鮮度（freshness）内に取得済みの店舗は店舗ページを取得せず、
+    インデックスに保存した抽出結果をそのまま返す。
+
+    Args:
+        path: SQLiteファイルのパス
+        freshness: 再取得までの秒数
+    """
+
+    def __init__(self, path: str, freshness: float = DEFAULT_FRESHNESS):
+        self.path = path
+        self.freshness = freshness
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS stores ('
+            ' store_id TEXT PRIMARY KEY, url TEXT NOT NULL, fetched_at REAL NOT NULL,'
+            ' content_hash TEXT NOT NULL, details TEXT NOT NULL)'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._counters = {'served': 0, 'fetched': 0, 'changed': 0}
+
+    def get_fresh(self, url: str) -> dict | None:
+        """
+        鮮度内に取得済みの店舗なら保存済みの抽出結果を返す
+
+        Returns:
+            店舗情報の辞書、または未取得・鮮度切れの場合はNone
+        """
+        store_id = store_id_from_url(url)
+        if not store_id:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fetched_at, details FROM stores WHERE store_id = ?', (store_id,)
+            ).fetchone()
+            if row is None or time.time() - row[0] >= self.freshness:
+                return None
+            self._counters['served'] += 1
+        return json.loads(row[1])
+
+    def record(self, url: str, details: dict) -> bool:
+        """
+        取得した店舗の抽出結果を保存する
+
+        Returns:
+            前回から内容が変わった（または新規の）場合はTrue
+        """
+        store_id = store_id_from_url(url)
+        if not store_id:
+            return False
+        digest = content_hash(details)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT content_hash FROM stores WHERE store_id = ?', (store_id,)
+            ).fetchone()
+            changed = row is None or row[0] != digest
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stores (store_id, url, fetched_at, content_hash, details)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (store_id, url, time.time(), digest, json.dumps(details, ensure_ascii=False)),
+            )
+            self._conn.commit()
+            self._counters['fetched'] += 1
+            if changed:
+                self._counters['changed'] += 1
+        return changed
+
+    def stats(self) -> dict:
+        """
+        インデックスの統計を返す
+
+        Returns:
+            served（インデックスから返した店舗数）, fetched（取得して保存した店舗数）,
+            changed（新規・内容変更の店舗数）, stores（保存済みの店舗数）の辞書
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['stores'] = self._conn.execute('SELECT COUNT(*) FROM stores').fetchone()[0]
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SeenStores:
+    """
+    実行全体（複数のジャンル・ページ範囲の検索）で共有する、店舗IDをキーにした取得担当の集合
+
+    最初にその店舗を見つけたジョブだけが店舗ページを取得し、他のジョブは一致したことだけを記録して取得しない。
+    店舗ごとに一致した検索条件を記録順に保持するため、出力時に「どの検索に一致したか」の一覧を付けられる。
+    SQLiteに保存するため、バッチのワーカープロセス間でも共有でき、再実行時も同じジョブが担当を引き継ぐ。
+
+    Args:
+        path: SQLiteファイルのパス（None ならプロセス内のメモリのみ）
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path or ':memory:', check_same_thread=False, timeout=30)
+        if path:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS owners (store_id TEXT PRIMARY KEY, owner TEXT NOT NULL)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS matches ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT, store_id TEXT NOT NULL, search TEXT NOT NULL,'
+            ' UNIQUE (store_id, search))'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._counters = {'claimed': 0, 'skipped': 0}
+
+    def claim(self, url: str, owner: str, search: str) -> bool:
+        """
+        店舗を owner（ジョブID）の担当にし、search に一致したことを記録する
+
+        Returns:
+            owner が店舗ページを取得すべき場合はTrue（他のジョブが担当済みならFalse）
+        """
+        store_id = store_id_from_url(url)
+        if not store_id:
+            return True
+        with self._lock:
+            self._conn.execute('INSERT OR IGNORE INTO owners (store_id, owner) VALUES (?, ?)', (store_id, owner))
+            self._conn.execute('INSERT OR IGNORE INTO matches (store_id, search) VALUES (?, ?)', (store_id, search))
+            self._conn.commit()
+            row = self._conn.execute('SELECT owner FROM owners WHERE store_id = ?', (store_id,)).fetchone()
+            claimed = row[0] == owner
+            self._counters['claimed' if claimed else 'skipped'] += 1
+        return claimed
+
+    def searches(self, url: str) -> list[str]:
+        """店舗が一致した検索条件の一覧（記録順）"""
+        store_id = store_id_from_url(url)
+        if not store_id:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT search FROM matches WHERE store_id = ? ORDER BY seq', (store_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            claimed（担当として取得した店舗数）, skipped（他のジョブの担当のため取得しなかった店舗数）,
+            stores（記録済みの店舗数）の辞書（claimed / skipped はこのインスタンスでの件数）
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['stores'] = self._conn.execute('SELECT COUNT(*) FROM owners').fetchone()[0]
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,41 @@
+import pytest
+
+from batch import build_matrix, select_shard, unit_id
+from rate_limit import concurrent_burst
+from utils import GENRE_MAP, PREFECTURE_MAP
+
+MATRIX = build_matrix(list(PREFECTURE_MAP)[:7], list(GENRE_MAP)[:3], 1, 2)
+
+
+@pytest.mark.parametrize('shard_count', [1, 2, 3, 4, 5, len(MATRIX), len(MATRIX) + 3])
+def test_shards_partition_matrix(shard_count):
+    shards = [select_shard(MATRIX, i, shard_count) for i in range(1, shard_count + 1)]
+    ids = [unit_id(unit) for shard in shards for unit in shard]
+    # 重複も漏れもなく、全シャードを合わせると元のジョブ一覧になる
+    assert len(ids) == len(set(ids)) == len(MATRIX)
+    assert set(ids) == {unit_id(unit) for unit in MATRIX}
+    # ジョブ数はシャード間で高々1件しか違わない
+    sizes = [len(shard) for shard in shards]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_shards_are_deterministic():
+    shuffled = build_matrix(list(reversed(list(PREFECTURE_MAP)[:7])), list(reversed(list(GENRE_MAP)[:3])), 1, 2)
+    assert shuffled == MATRIX
+    assert select_shard(shuffled, 2, 3) == select_shard(MATRIX, 2, 3)
+
+
+@pytest.mark.parametrize('shard_index, shard_count', [(0, 3), (4, 3), (1, 0)])
+def test_select_shard_rejects_invalid_index(shard_index, shard_count):
+    with pytest.raises(ValueError):
+        select_shard(MATRIX, shard_index, shard_count)
+
+
+@pytest.mark.parametrize('rps, max_in_flight, expected', [
+    (0.125, 4, 1.0),
+    (1.0, 4, 1.0),
+    (3.0, 4, 3.0),
+    (50.0, 4, 4.0),
+])
+def test_concurrent_burst(rps, max_in_flight, expected):
+    assert concurrent_burst(rps, max_in_flight) == expected
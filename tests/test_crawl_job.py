@@ -0,0 +1,73 @@
+import itertools
+import os
+
+import pytest
+
+import scraper
+from bench.server import BenchServer
+from crawl_job import STATUS_DONE, STATUS_RUNNING, CrawlJob
+from http_cache import page_kind
+
+RUN_KWARGS = {'requests_per_second': 500, 'parse_workers': 0}
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """ベンチ用サーバーに向け、取得した店舗ページのURLを記録する"""
+    downloaded = []
+    download = scraper._download
+
+    def counting_download(url, *args, **kwargs):
+        if page_kind(url) == 'store':
+            downloaded.append(url)
+        return download(url, *args, **kwargs)
+
+    with BenchServer(num_pages=3, latency=0.0, jitter=0.0) as server:
+        monkeypatch.setattr(scraper, 'BASE_URL', server.base_url)
+        monkeypatch.setattr(scraper, '_download', counting_download)
+        yield downloaded
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_resume_after_interruption(tmp_path, downloads, ordered):
+    job = CrawlJob.create('東京都', 'ラーメン', 1, 3, jobs_dir=str(tmp_path))
+    run = job.run(ordered=ordered, **RUN_KWARGS)
+    first = list(itertools.islice(run, 25))
+    run.close()
+
+    job = CrawlJob.load(job.job_dir)
+    assert job.status == STATUS_RUNNING
+    assert len(job.processed_urls) >= 25
+    processed = set(job.processed_urls)
+    fetched_before = len(downloads)
+
+    records = list(job.run(ordered=ordered, **RUN_KWARGS))
+
+    # 中断前に処理済みの店舗は取得し直さず、記録から返す
+    assert not processed & set(downloads[fetched_before:])
+    names = [record['店名'] for record in records]
+    assert len(names) == len(set(names)) == 60
+    assert {record['店名'] for record in first} <= set(names)
+    job = CrawlJob.load(job.job_dir)
+    assert job.status == STATUS_DONE
+    assert job.record_count == 60
+    assert len({url for url, _ in job.iter_store_records()}) == 60
+
+
+def test_load_truncates_incomplete_last_line(tmp_path, downloads):
+    job = CrawlJob.create('東京都', 'ラーメン', 1, 1, jobs_dir=str(tmp_path))
+    run = job.run(**RUN_KWARGS)
+    list(itertools.islice(run, 5))
+    run.close()
+    progress_path = os.path.join(job.job_dir, 'progress.jsonl')
+    valid_size = os.path.getsize(progress_path)
+    with open(progress_path, 'ab') as f:
+        f.write(b'{"type": "store", "page": 1, "url": "https://tabelog.com/to')
+
+    job = CrawlJob.load(job.job_dir)
+
+    assert os.path.getsize(progress_path) == valid_size
+    assert len(job.processed_urls) >= 5
+    records = list(job.run(**RUN_KWARGS))
+    assert len({record['店名'] for record in records}) == len(records) == 20
+    assert CrawlJob.load(job.job_dir).status == STATUS_DONE
@@ -0,0 +1,113 @@
+import zlib
+
+import pytest
+
+import http_cache
+import scraper
+from http_cache import DEFAULT_TTLS, HttpCache, configure_cache
+from rate_limit import HostRateLimiter
+
+LIST_URL = 'https://tabelog.com/tokyo/rstLst/ramen/1/'
+STORE_URL = 'https://tabelog.com/tokyo/A1301/A130101/13000001/'
+
+
+class FakeClock:
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_cache, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def default_cache(monkeypatch, tmp_path):
+    """既定キャッシュを一時ファイルで有効化し、テスト後に元へ戻す"""
+    monkeypatch.setattr(http_cache, '_default_cache', None)
+    monkeypatch.setattr(http_cache, '_default_cache_loaded', False)
+    cache = configure_cache(str(tmp_path / 'cache.sqlite'), ttls={'store': 0})
+    yield cache
+    cache.close()
+
+
+def test_ttl_depends_on_page_kind(tmp_path, clock):
+    cache = HttpCache(str(tmp_path / 'cache.sqlite'))
+    cache.store(LIST_URL, b'list')
+    cache.store(STORE_URL, b'store')
+
+    clock.now += DEFAULT_TTLS['list'] + 1
+    # リストページはTTL切れ（再検証が必要）、店舗ページはTTL内
+    assert cache.lookup(LIST_URL).fresh is False
+    assert cache.lookup(STORE_URL).fresh is True
+
+    clock.now += DEFAULT_TTLS['store']
+    assert cache.lookup(STORE_URL).fresh is False
+    assert cache.lookup(STORE_URL).body == b'store'
+    cache.close()
+
+
+def test_conditional_headers(tmp_path):
+    cache = HttpCache(str(tmp_path / 'cache.sqlite'))
+    cache.store(STORE_URL, b'store', etag='"v1"', last_modified='Wed, 21 Oct 2015 07:28:00 GMT')
+    cache.store(LIST_URL, b'list')
+
+    assert cache.lookup(STORE_URL).conditional_headers() == {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT',
+    }
+    assert cache.lookup(LIST_URL).conditional_headers() == {}
+    cache.close()
+
+
+def test_download_revalidates_stale_entry_with_304(http_server, default_cache):
+    body = '<html><body>店舗</body></html>'.encode('utf-8')
+
+    def respond(path, headers):
+        if headers.get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b''
+        return 200, {'ETag': '"v1"'}, body
+
+    http_server.respond = respond
+    url = f'{http_server.base_url}/tokyo/A1301/A130101/13000001/'
+    limiter = HostRateLimiter(1000)
+
+    assert scraper._download(url, limiter) == body
+    # TTL 0 のため2回目は条件付きGETで再検証し、304 ならキャッシュの本文を返す
+    assert scraper._download(url, limiter) == body
+
+    assert len(http_server.requests) == 2
+    assert 'If-None-Match' not in http_server.requests[0][1]
+    assert http_server.requests[1][1]['If-None-Match'] == '"v1"'
+    stats = default_cache.stats()
+    assert stats['stores'] == 1
+    assert stats['revalidated'] == 1
+
+
+def test_evicts_least_recently_accessed_by_compressed_size(tmp_path, clock):
+    bodies = {f'{STORE_URL}{i}/': bytes(range(256)) * 4 for i in range(3)}
+    size = len(zlib.compress(next(iter(bodies.values()))))
+    # 2件分だけ収まる上限（サイズは圧縮後の本文で数える）
+    cache = HttpCache(str(tmp_path / 'cache.sqlite'), max_bytes=2 * size)
+    first, second, third = bodies
+
+    cache.store(first, bodies[first])
+    clock.now += 1
+    cache.store(second, bodies[second])
+    clock.now += 1
+    cache.lookup(first)  # 参照したエントリは残る
+    clock.now += 1
+    cache.store(third, bodies[third])
+
+    assert cache.lookup(second) is None
+    assert cache.lookup(first).body == bodies[first]
+    assert cache.lookup(third).body == bodies[third]
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['total_bytes'] == 2 * size
+    cache.close()
@@ -0,0 +1,97 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+import http_client
+from http_client import HttpClient, parse_retry_after
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.urls = []
+
+    def acquire(self, url: str) -> None:
+        self.urls.append(url)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # 再試行の待機は記録するだけで実際には眠らない
+    sleeps = []
+    monkeypatch.setattr(http_client, 'time', SimpleNamespace(monotonic=time.monotonic, time=time.time,
+                                                             sleep=sleeps.append))
+    return sleeps
+
+
+def test_parse_retry_after_seconds():
+    assert parse_retry_after('120') == 120.0
+    assert parse_retry_after(' 3 ') == 3.0
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(30, abs=2)
+    # 過去の日時は待たない
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+
+
+@pytest.mark.parametrize('value', [None, '', 'soon', '-1', '1.5'])
+def test_parse_retry_after_invalid(value):
+    assert parse_retry_after(value) is None
+
+
+def test_retries_429_after_retry_after(http_server, sleeps):
+    script = iter([(429, {'Retry-After': '2'}, b'slow down'), (200, {}, b'ok')])
+    http_server.respond = lambda path, headers: next(script)
+    client = HttpClient(max_retries=3)
+    limiter = CountingLimiter()
+    statuses = []
+
+    url = f'{http_server.base_url}/tokyo/rstLst/1/'
+    response = client.get(url, observer=lambda status, elapsed: statuses.append(status), limiter=limiter)
+
+    assert response.status_code == 200
+    assert response.content == b'ok'
+    assert sleeps == [2.0]
+    # 再試行もレートリミッターを通す
+    assert limiter.urls == [url, url]
+    assert statuses == [429, 200]
+    assert client.stats()['retries'] == 1
+    client.close()
+
+
+def test_retry_after_is_capped_by_backoff_max(http_server, sleeps):
+    script = iter([(503, {'Retry-After': '3600'}, b''), (200, {}, b'ok')])
+    http_server.respond = lambda path, headers: next(script)
+    client = HttpClient(backoff_max=10.0)
+
+    assert client.get(f'{http_server.base_url}/').status_code == 200
+    assert sleeps == [10.0]
+    client.close()
+
+
+def test_returns_last_response_when_retries_exhausted(http_server, sleeps):
+    http_server.respond = lambda path, headers: (503, {}, b'unavailable')
+    client = HttpClient(max_retries=2, backoff_base=0.5)
+
+    response = client.get(f'{http_server.base_url}/')
+
+    assert response.status_code == 503
+    assert len(http_server.requests) == 3
+    # Retry-After がなければフルジッターの指数バックオフ
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+    client.close()
+
+
+def test_does_not_retry_client_errors(http_server, sleeps):
+    http_server.respond = lambda path, headers: (404, {}, b'')
+    client = HttpClient()
+
+    assert client.get(f'{http_server.base_url}/').status_code == 404
+    assert len(http_server.requests) == 1
+    assert sleeps == []
+    client.close()
@@ -0,0 +1,67 @@
+import importlib.util
+
+import pytest
+from bs4 import BeautifulSoup
+
+import scraper
+from bench.corpus import Corpus, synthetic_list_page, synthetic_store_page
+
+LIST_URL = 'https://tabelog.com/tokyo/rstLst/ramen/1/'
+STORE_URL = 'https://tabelog.com/tokyo/A1301/A130101/13000001/'
+
+BACKENDS = [
+    name for name, (features, _) in scraper.PARSER_BACKENDS.items()
+    if features != 'lxml' or importlib.util.find_spec('lxml') is not None
+]
+
+
+def _shift_jis(page: bytes) -> bytes:
+    """合成ページを Shift_JIS で宣言・符号化し直したもの（部分木の切り出しで文字コードが失われないことの確認用）"""
+    text = page.decode('utf-8').replace('charset="utf-8"', 'charset="Shift_JIS"')
+    return text.replace('～', '〜').encode('shift_jis')  # 全角チルダは Shift_JIS にない
+
+
+def _store_pages() -> list[bytes]:
+    corpus = Corpus()
+    pages = [synthetic_store_page('tokyo', '13000001'), synthetic_store_page('osaka', '27000042')]
+    pages.append(_shift_jis(pages[0]))
+    return pages + list(corpus.store_pages.values())
+
+
+def _list_pages() -> list[bytes]:
+    corpus = Corpus()
+    pages = [synthetic_list_page('tokyo', 1, 60), synthetic_list_page('kyoto', 3)]
+    pages.append(_shift_jis(pages[0]))
+    return pages + corpus.list_pages
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    scraper.set_parser_backend(request.param)
+    yield request.param
+    scraper.set_parser_backend(scraper.DEFAULT_PARSER_BACKEND)
+
+
+@pytest.mark.parametrize('page', _store_pages())
+def test_store_page_matches_full_parse(backend, page):
+    expected = scraper.extract_store_details(BeautifulSoup(page, 'html.parser'))
+    assert expected is not None
+    assert scraper.extract_store_details(scraper.make_soup(page, STORE_URL)) == expected
+
+
+@pytest.mark.parametrize('page', _list_pages())
+def test_list_page_matches_full_parse(backend, page):
+    expected = scraper.extract_store_listings(BeautifulSoup(page, 'html.parser'))
+    assert len(expected) == 20
+    assert scraper.extract_store_listings(scraper.make_soup(page, LIST_URL)) == expected
+
+
+def test_targeted_parse_falls_back_to_full_page():
+    # 対象の要素がないページはページ全体を解析する
+    page = b'<html><body><p class="rstinfo-table__address">x</p></body></html>'
+    scraper.set_parser_backend('targeted')
+    try:
+        soup = scraper.make_soup(page, STORE_URL)
+    finally:
+        scraper.set_parser_backend(scraper.DEFAULT_PARSER_BACKEND)
+    assert soup.select_one('.rstinfo-table__address') is not None
@@ -0,0 +1,53 @@
+import json
+
+import pandas as pd
+
+from postprocess import dedupe_frame, normalize_frame, postprocess_file
+
+
+def _frame(rows):
+    return pd.DataFrame(rows, columns=['店名', '電話番号', '住所', '検索ジャンル'])
+
+
+def test_dedupe_merges_same_phone_and_address():
+    frame = normalize_frame(_frame([
+        ['らーめん一番', '03-1234-5678', '東京都千代田区１－２－３', 'ラーメン'],
+        ['らーめん一番', '０３－１２３４－５６７８', '東京都千代田区1-2-3', 'つけ麺'],
+    ]))
+    result = dedupe_frame(frame)
+    assert len(result) == 1
+    assert result.loc[0, '検索ジャンル'] == 'ラーメン | つけ麺'
+
+
+def test_dedupe_keeps_shops_without_phone_at_same_address():
+    # 同じビルに入る別の店舗（電話番号なし）はまとめない
+    frame = normalize_frame(_frame([
+        ['居酒屋A', None, '東京都新宿区西新宿1-1-1 ビル2F', '居酒屋'],
+        ['バーB', None, '東京都新宿区西新宿1-1-1 ビル2F', 'バー'],
+    ]))
+    result = dedupe_frame(frame)
+    assert result['店名'].tolist() == ['居酒屋A', 'バーB']
+
+
+def test_dedupe_keeps_shops_with_same_phone_and_different_address():
+    frame = normalize_frame(_frame([
+        ['チェーン本店', '0120-000-000', '東京都港区1-1-1', '焼肉'],
+        ['チェーン支店', '0120-000-000', '東京都港区2-2-2', '焼肉'],
+    ]))
+    assert len(dedupe_frame(frame)) == 2
+
+
+def test_postprocess_file_flattens_list_columns(tmp_path):
+    # バッチのシャード（JSONL）は一致した検索をリストで持つ
+    input_path = tmp_path / 'shard.jsonl'
+    rows = [
+        {'店名': '焼き鳥A', '電話番号': '03-1111-2222', '住所': '東京都渋谷区1-1', '一致した検索': ['東京都/居酒屋', '東京都/焼き鳥']},
+        {'店名': '焼き鳥A', '電話番号': '03-1111-2222', '住所': '東京都渋谷区1-1', '一致した検索': ['東京都/焼き鳥']},
+        {'店名': 'バーB', '電話番号': '03-3333-4444', '住所': '東京都渋谷区2-2', '一致した検索': ['東京都/バー']},
+    ]
+    input_path.write_text(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows), encoding='utf-8')
+    output_path = tmp_path / 'clean.csv'
+
+    assert postprocess_file(str(input_path), str(output_path)) == (3, 2)
+    result = pd.read_csv(output_path)
+    assert result['一致した検索'].tolist() == ['東京都/居酒屋 | 東京都/焼き鳥', '東京都/バー']
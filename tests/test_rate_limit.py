@@ -0,0 +1,125 @@
+import pytest
+
+import rate_limit
+from rate_limit import AdaptiveConcurrency, HostRateLimiter, TokenBucket
+
+
+class FakeClock:
+    """time.monotonic / time.sleep の代わりに使う時計（sleep で時刻を進める）"""
+
+    def __init__(self, start: float = 1000.0):
+        self.now = start
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def test_bucket_allows_burst_then_waits_one_interval(clock):
+    bucket = TokenBucket(rate=4, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.25)]
+
+
+@pytest.mark.parametrize('rate, capacity, count', [
+    (1, None, 5),
+    (2, 1, 11),
+    (10, 4, 50),
+])
+def test_bucket_sustained_rate(clock, rate, capacity, count):
+    # バースト分を除いた (count - capacity) 件は 1/rate 秒ずつ待たされる
+    bucket = TokenBucket(rate=rate, capacity=capacity)
+    started = clock.now
+    for _ in range(count):
+        bucket.acquire()
+    assert clock.now - started == pytest.approx((count - (capacity or 1)) / rate)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=2)
+    bucket.acquire()
+    bucket.acquire()
+    # 長く空いても容量を超えて溜まらない
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_host_limiter_keeps_one_bucket_per_host(clock):
+    limiter = HostRateLimiter(requests_per_second=1)
+    limiter.acquire('https://tabelog.com/tokyo/rstLst/1/')
+    limiter.acquire('https://example.com/')
+    assert clock.sleeps == []
+    limiter.acquire('https://tabelog.com/tokyo/A1301/A130101/13000001/')
+    assert clock.sleeps == [pytest.approx(1.0)]
+    assert limiter.bucket_for('https://tabelog.com/') is limiter.bucket_for('https://tabelog.com/osaka/')
+
+
+def test_adaptive_increases_after_limit_successes(clock):
+    concurrency = AdaptiveConcurrency(max_limit=4, initial=2)
+    limits = []
+    for _ in range(12):
+        concurrency.record(200, 0.1)
+        limits.append(concurrency.limit)
+    # 上限と同じ件数の成功ごとに1つ増え、max_limit で止まる
+    assert limits == [2, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4]
+    assert concurrency.stats()['increases'] == 2
+
+
+@pytest.mark.parametrize('status', [429, 503, 500, None])
+def test_adaptive_halves_on_backoff(clock, status):
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=8)
+    concurrency.record(status, 0.1)
+    assert concurrency.limit == 4
+
+
+def test_adaptive_respects_min_limit(clock):
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=8, min_limit=3)
+    for expected in (4, 3, 3):
+        concurrency.record(429, 0.1)
+        assert concurrency.limit == expected
+        clock.now += concurrency.cooldown
+
+
+def test_adaptive_decreases_once_per_cooldown(clock):
+    concurrency = AdaptiveConcurrency(max_limit=16, initial=16, cooldown=1.0)
+    # 同時に返ってきた 429 では1回だけ減らす
+    for _ in range(5):
+        concurrency.record(429, 0.1)
+    assert concurrency.limit == 8
+    clock.now += 0.5
+    concurrency.record(429, 0.1)
+    assert concurrency.limit == 8
+    clock.now += 0.5
+    concurrency.record(429, 0.1)
+    assert concurrency.limit == 4
+    assert concurrency.stats()['throttled'] == 7
+
+
+def test_adaptive_decreases_when_latency_exceeds_baseline(clock):
+    concurrency = AdaptiveConcurrency(max_limit=8, initial=8, latency_tolerance=2.0)
+    for _ in range(4):
+        concurrency.record(200, 0.1)
+    concurrency.record(200, 5.0)
+    assert concurrency.limit == 4
+    assert concurrency.stats()['slow'] == 1
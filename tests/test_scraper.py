@@ -0,0 +1,52 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from bench.corpus import no_result_page, synthetic_list_page, synthetic_store_page
+from records import StoreListing
+from scraper import NO_RESULT_CLASS, NO_RESULT_TEXT, _listing_in_prefecture, is_no_result_page
+
+
+def _listing(area: str) -> StoreListing:
+    return StoreListing(url='https://tabelog.com/kyoto/A2601/A260201/26000001/', name='店舗', area=area)
+
+
+@pytest.mark.parametrize('prefecture_jp, area, expected', [
+    ('京都府', '[京都] 烏丸駅 250m', True),
+    ('京都府', '[大阪] 梅田駅 100m', False),
+    ('東京都', '[東京] 渋谷駅 250m', True),
+    ('東京都', '[神奈川] 川崎駅 300m', False),
+    ('神奈川県', '[神奈川] 川崎駅 300m', True),
+    ('大阪府', '[大阪] 梅田駅 100m', True),
+    ('北海道', '[北海道] 札幌駅 500m', True),
+    ('東京都', '渋谷駅 250m', True),  # 接頭辞がなければ店舗ページの住所で判定する
+])
+def test_listing_in_prefecture(prefecture_jp, area, expected):
+    assert _listing_in_prefecture(_listing(area), prefecture_jp) is expected
+
+
+def _soup_is_no_result(content: bytes) -> bool:
+    """パース後のページで行っていた従来の「検索結果なし」判定"""
+    soup = BeautifulSoup(content, 'html.parser')
+    element = soup.select_one(f'.{NO_RESULT_CLASS}')
+    if element and '見つかりませんでした' in element.get_text():
+        return True
+    return NO_RESULT_TEXT in soup.get_text()
+
+
+def _page(body: str, encoding: str = 'utf-8') -> bytes:
+    return f'<html><head><meta charset="{encoding}"></head><body>{body}</body></html>'.encode(encoding)
+
+
+@pytest.mark.parametrize('content, expected', [
+    (no_result_page(), True),
+    (_page(f'<div class="{NO_RESULT_CLASS}"><p>{NO_RESULT_TEXT}</p></div>', 'shift_jis'), True),
+    (_page(f'<div class="{NO_RESULT_CLASS}"><p>お店は見つかりませんでした</p></div>', 'euc-jp'), True),
+    (_page(f'<p>{NO_RESULT_TEXT}</p>'), True),  # クラス名がなくても文言で判定する
+    (_page(f'<div class="{NO_RESULT_CLASS}"><p>条件を変更してください</p></div>'), False),
+    (_page('<p>見つかりませんでした</p>'), False),
+    (synthetic_list_page('tokyo', 1, 60), False),
+    (synthetic_store_page('tokyo', '13000001'), False),
+])
+def test_no_result_check_agrees_with_soup(content, expected):
+    assert _soup_is_no_result(content) is expected
+    assert is_no_result_page(content) is expected
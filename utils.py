@@ -1,3 +1,5 @@
+import logging
+
 # 都道府県変換テーブル
 PREFECTURE_MAP = {
     '北海道': 'hokkaido',
@@ -116,3 +118,19 @@ def convert_genre_to_roman(genre_jp: str) -> str:
     ジャンルの漢字表記をローマ字表記に変換する
     """
     return GENRE_MAP.get(genre_jp, '')
+
+# 逆引きマップ（ローマ字表記 -> 漢字表記）。URL のクエリから選択を復元する際に使う
+PREFECTURE_BY_ROMAN = {v: k for k, v in PREFECTURE_MAP.items()}
+GENRE_BY_ROMAN = {v: k for k, v in GENRE_MAP.items()}
+
+# ログの出力形式
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+def setup_logging(level: int = logging.INFO) -> None:
+    """
+    ログの出力形式とレベルを設定する（アプリや CLI の起動時に呼ぶ。出力先が設定済みなら形式は変えない）
+
+    モジュールの import 時には設定しないため、ライブラリとして利用する側の設定を上書きしない。
+    """
+    logging.basicConfig(format=LOG_FORMAT)
+    logging.getLogger().setLevel(level)